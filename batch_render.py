@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+"""
+多进程批量渲染 - 将大量大纲文件分发到进程池生成义脉树枝图
+工作进程只导入tree_engine，不加载PyQt5
+"""
+
+import json
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Dict, Iterable, Iterator, List, Optional, TextIO, Tuple
+
+from tree_engine import TreeParseError, iter_file_lines, render_to_file
+
+# 单个任务：(输入文件, 输出文件, 编码)
+Job = Tuple[str, str, str]
+
+STATUS_OK = "ok"
+STATUS_PARSE_ERROR = "parse_error"
+STATUS_IO_ERROR = "io_error"
+
+
+def render_job(job: Job) -> Dict:
+    """在工作进程中渲染单个文件，返回可写入清单的结果"""
+    input_path, output_path, encoding = job
+    result = {
+        'input': input_path,
+        'output': output_path,
+        'status': STATUS_OK,
+        'roots': 0,
+        'error': None,
+    }
+    start = time.perf_counter()
+    try:
+        result['roots'] = render_to_file(iter_file_lines(input_path, encoding), output_path, encoding)
+    except TreeParseError as e:
+        result['status'] = STATUS_PARSE_ERROR
+        result['error'] = str(e)
+    except (OSError, UnicodeDecodeError) as e:
+        result['status'] = STATUS_IO_ERROR
+        result['error'] = str(e)
+    result['seconds'] = round(time.perf_counter() - start, 6)
+    return result
+
+
+def render_chunk(jobs: List[Job]) -> List[Dict]:
+    """在工作进程中依次渲染一组文件"""
+    return [render_job(job) for job in jobs]
+
+
+def iter_batch(jobs: Iterable[Job], workers: Optional[int] = None, chunksize: int = 16,
+               ordered: bool = True) -> Iterator[Dict]:
+    """用进程池批量渲染，逐个返回结果
+
+    ordered为True时按输入顺序返回；为False时哪一组先完成就先返回，
+    适合只关心整体进度的场景。chunksize为每次发给工作进程的文件数。
+    workers为0时在当前进程中依次渲染（与bulk_import.iter_rendered相同）。
+    """
+    if workers == 0:
+        yield from map(render_job, jobs)
+        return
+
+    jobs = list(jobs)
+    chunksize = max(1, chunksize)
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        if ordered:
+            yield from executor.map(render_job, jobs, chunksize=chunksize)
+            return
+
+        futures = [executor.submit(render_chunk, jobs[i:i + chunksize])
+                   for i in range(0, len(jobs), chunksize)]
+        for future in as_completed(futures):
+            yield from future.result()
+
+
+def write_manifest(results: Iterable[Dict], manifest: Optional[TextIO] = None) -> Dict[str, int]:
+    """将结果逐行写入JSON Lines清单（可为None），返回各状态的文件数"""
+    counts = {STATUS_OK: 0, STATUS_PARSE_ERROR: 0, STATUS_IO_ERROR: 0}
+    for result in results:
+        counts[result['status']] += 1
+        if manifest is not None:
+            manifest.write(json.dumps(result, ensure_ascii=False) + "\n")
+            manifest.flush()
+    return counts
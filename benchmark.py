@@ -0,0 +1,831 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+义脉树枝图性能基准脚本
+
+用法：
+    python benchmark.py            # 运行全部基准
+    python benchmark.py layout     # 只运行指定基准
+"""
+
+import glob
+import json
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from batch_render import iter_batch
+from bulk_import import import_outlines
+from database import PAGE_SIZE, DatabaseManager
+from diagram_export import FORMAT_JSONL, FORMAT_ZIP, diagram_record, export_diagrams
+from text_width import display_width, display_widths
+from tree_engine import (FULLWIDTH_TABLE, IncrementalRenderer, SubtreeMemo, TextTreeNode, _build_tree,
+                         convert_to_fullwidth, parse_lines, parse_lines_compact, render, render_stream)
+
+
+def make_chain_outline(total_nodes, chain_depth=200):
+    """生成由多条长链组成的大纲：根节点下挂若干条深度为chain_depth的链，
+    链上每个节点另带一个叶子，使链上节点都不是单行子树"""
+    lines = ["根"]
+    while len(lines) < total_nodes:
+        for depth in range(1, chain_depth + 1):
+            lines.append("-" * depth + "叶")
+            lines.append("-" * depth + "节点")
+            if len(lines) >= total_nodes:
+                break
+    return lines
+
+
+def make_mixed_outline(total_nodes):
+    """生成常见形态的大纲：多个根节点，每个根下分三层展开，标签有重复"""
+    lines = []
+    while len(lines) < total_nodes:
+        lines.append(f"专题{len(lines) % 100}")
+        for a in range(10):
+            lines.append(f"-章节{a}")
+            for b in range(10):
+                lines.append(f"--小节{b}")
+                for c in range(3):
+                    lines.append(f"---要点{c}")
+    return lines[:total_nodes]
+
+
+def make_fanout_outline(total_nodes):
+    """生成宽扇出大纲：一个根节点下直接挂total_nodes-1个叶子"""
+    return ["根"] + ["-分支"] * (total_nodes - 1)
+
+
+def iter_deep_chain(depth):
+    """逐行生成一条深度为depth的单链（另加一个兄弟节点使根节点可绘制），不在内存中保存整份输入"""
+    yield "根"
+    for level in range(1, depth + 1):
+        yield "-" * level + "链"
+    yield "-尾"
+
+
+def legacy_convert_to_fullwidth(text):
+    """旧版逐字符查表的全角转换，仅作对比基线"""
+    conversion_map = {chr(code): chr(code + 0xFEE0) for code in range(0x21, 0x7F)}
+    result = []
+    for char in text:
+        result.append(conversion_map.get(char, char))
+    return ''.join(result)
+
+
+def legacy_display_width(s):
+    """原ymtree.py中逐字符比较7个码位区间的宽度计算，作为对照"""
+    width = 0
+    for char in s:
+        if ('\u4e00' <= char <= '\u9fff' or '\u3000' <= char <= '\u303f' or '\uff00' <= char <= '\uffef' or
+                '\u2e80' <= char <= '\u2eff' or '\u2f00' <= char <= '\u2fdf' or
+                '\u3040' <= char <= '\u309f' or '\u30a0' <= char <= '\u30ff'):
+            width += 2
+        else:
+            width += 1
+    return width
+
+
+def timed(func, *args, repeat=3):
+    """返回多次运行中的最短耗时（秒）和最后一次的结果"""
+    best = None
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(*args)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def bench_layout():
+    """解析+布局在长链大纲上的扩展性，每节点耗时应基本恒定"""
+    print("== 布局扩展性（长链大纲） ==")
+    print(f"{'节点数':>10} {'解析+布局(s)':>14} {'绘制(s)':>10} {'每节点(us)':>12}")
+    for total in (1_000, 10_000, 100_000):
+        lines = make_chain_outline(total)
+        parse_time, roots = timed(parse_lines, lines)
+        print_time, _ = timed(lambda: [root.print_tree() for root in roots])
+        per_node = (parse_time + print_time) / total * 1e6
+        print(f"{total:>10} {parse_time:>14.3f} {print_time:>10.3f} {per_node:>12.2f}")
+
+
+def bench_fanout():
+    """宽扇出节点的绘制耗时，应随子节点数线性增长"""
+    print("== 宽扇出绘制 ==")
+    print(f"{'子节点数':>10} {'绘制(s)':>10} {'每节点(us)':>12}")
+    for total in (1_000, 10_000, 100_000):
+        roots = parse_lines(make_fanout_outline(total))
+        print_time, _ = timed(roots[0].print_tree)
+        print(f"{total - 1:>10} {print_time:>10.3f} {print_time / total * 1e6:>12.2f}")
+
+
+def bench_fullwidth():
+    """全角转换：旧版逐字符查表 与 str.translate 对比（共100万字符）"""
+    print("== 全角转换（100万字符） ==")
+    labels = []
+    total_chars = 0
+    while total_chars < 1_000_000:
+        labels.append(f"Node-{len(labels) % 5000}: abc (x+y)")
+        total_chars += len(labels[-1])
+
+    legacy_time, legacy = timed(lambda: [legacy_convert_to_fullwidth(label) for label in labels])
+    convert_to_fullwidth.cache_clear()
+    translate_time, converted = timed(lambda: [label.translate(FULLWIDTH_TABLE) for label in labels])
+    convert_to_fullwidth.cache_clear()
+    cached_time, cached = timed(lambda: [convert_to_fullwidth(label) for label in labels])
+    assert legacy == converted == cached
+
+    print(f"字符数：{total_chars}，标签数：{len(labels)}（5000种不同标签）")
+    print(f"{'旧版逐字符查表':<16} {legacy_time:>8.3f}s")
+    print(f"{'str.translate':<16} {translate_time:>8.3f}s  ({legacy_time / translate_time:.1f}x)")
+    print(f"{'translate+缓存':<16} {cached_time:>8.3f}s  ({legacy_time / cached_time:.1f}x)")
+
+
+def bench_deep(depth=50_000, budget_mb=64):
+    """压力测试：渲染50000层深的单链，检查不触发RecursionError且峰值内存不超预算"""
+    print(f"== 深链压力测试（深度{depth}，内存预算{budget_mb}MB） ==")
+    tracemalloc.start()
+    start = time.perf_counter()
+    roots = parse_lines(iter_deep_chain(depth))
+    output = roots[0].print_tree()
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    peak_mb = peak / 1024 / 1024
+    status = "通过" if peak_mb <= budget_mb else "超出预算"
+    print(f"耗时 {elapsed:.2f}s，峰值内存 {peak_mb:.1f}MB，输出 {len(output)} 字符：{status}")
+    return peak_mb <= budget_mb
+
+
+def bench_memory(total=1_000_000):
+    """对象存储与紧凑数组存储的峰值内存对比"""
+    print(f"== 存储内存对比（{total}行） ==")
+    lines = make_mixed_outline(total)
+    results = {}
+    for name, parse in (("TextTreeNode对象", parse_lines), ("CompactTree数组", parse_lines_compact)):
+        tracemalloc.start()
+        start = time.perf_counter()
+        store = parse(lines)
+        elapsed = time.perf_counter() - start
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        results[name] = current
+        print(f"{name:<16} 常驻 {current / 1024 / 1024:>8.1f}MB  峰值 {peak / 1024 / 1024:>8.1f}MB  解析 {elapsed:.2f}s")
+        del store
+    object_size, compact_size = results.values()
+    print(f"紧凑存储常驻内存为对象存储的 {compact_size / object_size:.1%}")
+
+
+def bench_stream(total=200_000):
+    """整体渲染与流式渲染的峰值内存对比（多根节点输入）"""
+    print(f"== 流式渲染（{total}行，多根节点） ==")
+    lines = make_mixed_outline(total)
+
+    tracemalloc.start()
+    start = time.perf_counter()
+    output = render("\n".join(lines))
+    whole_time = time.perf_counter() - start
+    _, whole_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del output
+
+    tracemalloc.start()
+    start = time.perf_counter()
+    with open(os.devnull, 'w', encoding='utf-8') as devnull:
+        render_stream(iter(lines), devnull)
+    stream_time = time.perf_counter() - start
+    _, stream_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    print(f"{'render':<14} 峰值 {whole_peak / 1024 / 1024:>8.1f}MB  {whole_time:.2f}s")
+    print(f"{'render_stream':<14} 峰值 {stream_peak / 1024 / 1024:>8.1f}MB  {stream_time:.2f}s")
+
+
+def bench_batch(file_count=400, lines_per_file=2_000):
+    """多进程批量渲染从1个进程到CPU核数的扩展性"""
+    cpu_count = os.cpu_count() or 1
+    worker_counts = sorted({1, cpu_count} | {n for n in (2, 4, 8, 16, 32) if n < cpu_count})
+    print(f"== 批量渲染扩展性（{file_count}个文件，每个{lines_per_file}行，{cpu_count}核） ==")
+
+    with tempfile.TemporaryDirectory() as workdir:
+        content = "\n".join(make_mixed_outline(lines_per_file)) + "\n"
+        jobs = []
+        for i in range(file_count):
+            input_path = os.path.join(workdir, f"outline{i}.txt")
+            with open(input_path, 'w', encoding='utf-8') as f:
+                f.write(content)
+            jobs.append((input_path, input_path + ".out", 'utf-8'))
+
+        baseline = None
+        print(f"{'进程数':>6} {'耗时(s)':>10} {'文件/秒':>10} {'加速比':>8}")
+        for workers in worker_counts:
+            start = time.perf_counter()
+            results = list(iter_batch(jobs, workers=workers, chunksize=8))
+            elapsed = time.perf_counter() - start
+            assert all(result['status'] == 'ok' for result in results)
+            baseline = baseline or elapsed
+            print(f"{workers:>6} {elapsed:>10.2f} {file_count / elapsed:>10.1f} {baseline / elapsed:>8.2f}")
+
+
+def bench_incremental(total=20_000):
+    """编辑一行后重新生成：整体渲染 与 增量渲染对比"""
+    print(f"== 增量渲染（{total}行，修改一个标签） ==")
+    lines = make_mixed_outline(total)
+    text = "\n".join(lines)
+    edited_lines = list(lines)
+    edited_lines[total // 2] = edited_lines[total // 2] + "（改）"
+    edited = "\n".join(edited_lines)
+
+    full_time, expected = timed(render, edited)
+
+    renderer = IncrementalRenderer()
+    renderer.render(text)
+    start = time.perf_counter()
+    output = renderer.render(edited)
+    incremental_time = time.perf_counter() - start
+    assert output == expected
+
+    print(f"{'整体渲染':<10} {full_time:>8.3f}s")
+    print(f"{'增量渲染':<10} {incremental_time:>8.3f}s  "
+          f"（重新解析 {renderer.rendered_roots} 棵根树，复用 {renderer.reused_roots} 棵）")
+
+
+def make_boilerplate_outline(total_nodes, copies=10):
+    """生成重复子树较多的大纲：每个根节点下重复挂copies份相同的三叉四层样板分支"""
+    boilerplate = []
+    pending = [(2, i) for i in reversed(range(3))]
+    while pending:
+        depth, index = pending.pop()
+        boilerplate.append("-" * depth + f"样板条目第{index}项说明")
+        if depth < 5:
+            pending.extend((depth + 1, i) for i in reversed(range(3)))
+
+    lines = []
+    while len(lines) < total_nodes:
+        lines.append(f"专题{len(lines)}")
+        for _ in range(copies):
+            lines.append("-样板分支")
+            lines.extend(boilerplate)
+    return lines
+
+
+def bench_memo(total=100_000):
+    """重复子树较多的大纲：普通渲染 与 子树缓存渲染对比"""
+    print(f"== 重复子树缓存（{total}行） ==")
+    lines = make_boilerplate_outline(total)
+    text = "\n".join(lines)
+
+    def layout_and_print(memo):
+        roots = _build_tree(lines, TextTreeNode)
+        start = time.perf_counter()
+        for root in roots:
+            root.compute(memo)
+        outputs = [root.print_tree(memo) for root in roots]
+        return time.perf_counter() - start, outputs
+
+    plain_time, expected = timed(render, text)
+    memo_time, output = timed(lambda: render(text, memoize=True))
+    assert output == expected
+    plain_stage, expected_blocks = min(layout_and_print(None) for _ in range(3))
+    memo_stage, blocks = min(layout_and_print(SubtreeMemo()) for _ in range(3))
+    assert blocks == expected_blocks
+
+    print(f"{'':<10} {'整体(s)':>10} {'布局+绘制(s)':>14}")
+    print(f"{'普通渲染':<10} {plain_time:>10.3f} {plain_stage:>14.3f}")
+    print(f"{'子树缓存':<10} {memo_time:>10.3f} {memo_stage:>14.3f}  "
+          f"（整体 {plain_time / memo_time:.1f}x，布局+绘制 {plain_stage / memo_stage:.1f}x）")
+
+
+def bench_width(total=1_000_000):
+    """大量标签的显示宽度：原逐字符区间比较 与 查表/批量计算对比"""
+    print(f"== 显示宽度（{total}个标签） ==")
+    samples = ("Introduction", "第一章 义脉树枝图", "计算机科学（CS）导论", "Chapter 3：树与图",
+               "全角ＡＢＣ与半角abc", "ひらがなとカタカナ", "v1.2.3-beta")
+    labels = [samples[i % len(samples)] + str(i) for i in range(total)]
+
+    legacy_time, expected = timed(lambda: [legacy_display_width(label) for label in labels], repeat=1)
+    single_time, single = timed(lambda: [display_width(label) for label in labels], repeat=1)
+    batch_time, batch = timed(lambda: display_widths(labels, use_numpy=False), repeat=1)
+    assert single == batch == expected
+
+    print(f"{'逐字符区间比较':<14} {legacy_time:>8.3f}s")
+    print(f"{'display_width':<14} {single_time:>8.3f}s  （{legacy_time / single_time:.1f}x）")
+    try:
+        import numpy  # noqa: F401
+    except ImportError:
+        print("未安装NumPy，跳过向量化批量计算")
+        return
+    numpy_time, vectorized = timed(lambda: display_widths(labels), repeat=1)
+    assert vectorized == expected
+    print(f"{'display_widths':<14} {numpy_time:>8.3f}s  （NumPy，{legacy_time / numpy_time:.1f}x）")
+
+
+def legacy_update_diagram_content(db_path, diagram_id, content, result):
+    """原DatabaseManager的做法：每次操作单独建连、提交后关闭"""
+    conn = sqlite3.connect(db_path)
+    cursor = conn.cursor()
+    cursor.execute(
+        "UPDATE tree_diagrams SET content = ?, result = ?, updated_at = CURRENT_TIMESTAMP WHERE id = ?",
+        (content, result, diagram_id)
+    )
+    conn.commit()
+    conn.close()
+
+
+def bench_database(total=10_000):
+    """逐条更新图表内容：每次建连（回滚日志）与长连接（WAL）对比"""
+    print(f"== 数据库逐条更新（{total}次） ==")
+    content = "\n".join(make_mixed_outline(20))
+    result = render(content)
+
+    with tempfile.TemporaryDirectory() as workdir:
+        legacy_path = os.path.join(workdir, "legacy.db")
+        legacy_db = DatabaseManager(legacy_path)
+        legacy_id = legacy_db.save_tree_diagram("基准", None, content, result)
+        legacy_db.close()
+        # 恢复为默认的回滚日志模式，模拟改动之前的数据库
+        conn = sqlite3.connect(legacy_path)
+        conn.execute("PRAGMA journal_mode=DELETE")
+        conn.close()
+
+        start = time.perf_counter()
+        for i in range(total):
+            legacy_update_diagram_content(legacy_path, legacy_id, content, result + str(i))
+        legacy_time = time.perf_counter() - start
+
+        db = DatabaseManager(os.path.join(workdir, "wal.db"))
+        diagram_id = db.save_tree_diagram("基准", None, content, result)
+        start = time.perf_counter()
+        for i in range(total):
+            db.update_diagram_content(diagram_id, content, result + str(i))
+        persistent_time = time.perf_counter() - start
+        db.close()
+
+    print(f"{'每次建连':<10} {legacy_time:>8.2f}s  {total / legacy_time:>10.0f}次/秒")
+    print(f"{'长连接+WAL':<10} {persistent_time:>8.2f}s  {total / persistent_time:>10.0f}次/秒  "
+          f"（{legacy_time / persistent_time:.1f}x）")
+
+
+def bench_indexes(total=1_000_000, topic_count=1_000):
+    """图表列表查询：确认按专题筛选和全部列表都走索引，并与无索引时对比"""
+    print(f"== 图表列表索引（{total}个图表，{topic_count}个专题） ==")
+    with tempfile.TemporaryDirectory() as workdir:
+        db = DatabaseManager(os.path.join(workdir, "indexes.db"))
+        for listing_topic in (None, 1):
+            plan = db.explain_listing(listing_topic)
+            print(f"{'按专题' if listing_topic else '全部'}：{'；'.join(plan)}")
+            if "USING INDEX" not in plan[0] or any("TEMP B-TREE" in detail for detail in plan):
+                print("查询计划没有使用索引")
+                return False
+
+        with db._cursor() as cursor:
+            cursor.executemany("INSERT INTO topics (name) VALUES (?)",
+                               ((f"专题{i}",) for i in range(topic_count)))
+            cursor.executemany(
+                "INSERT INTO tree_diagrams (name, topic_id, content, result, sort_order, created_at) "
+                "VALUES (?, ?, ?, ?, ?, datetime('2024-01-01', ? || ' seconds'))",
+                ((f"图表{i}", i % topic_count + 1, "根\n-枝", "根─枝", i % 7, i) for i in range(total))
+            )
+
+        def first_page():
+            sql, params = db._listing_query()
+            with db._cursor() as cursor:
+                return cursor.execute(sql, params).fetchmany(100)
+
+        def measure():
+            page_time, page = timed(first_page)
+            topic_time, diagrams = timed(db.get_tree_diagrams, topic_count // 2)
+            return page_time, topic_time, [row[0] for row in page] + [d['id'] for d in diagrams]
+
+        indexed = measure()
+        with db._cursor() as cursor:
+            cursor.execute("DROP INDEX idx_tree_diagrams_topic_page")
+            cursor.execute("DROP INDEX idx_tree_diagrams_page")
+        scanned = measure()
+        db.close()
+    assert indexed[2] == scanned[2]
+
+    print(f"{'':<8} {'全部列表首页(s)':>16} {'单个专题(s)':>14}")
+    print(f"{'无索引':<8} {scanned[0]:>16.4f} {scanned[1]:>14.4f}")
+    print(f"{'有索引':<8} {indexed[0]:>16.4f} {indexed[1]:>14.4f}  "
+          f"（首页 {scanned[0] / indexed[0]:.0f}x，专题 {scanned[1] / indexed[1]:.0f}x）")
+
+
+def bench_search(total=1_000_000, vocabulary_size=5_000):
+    """全文检索：100万个图表中按罕见词、常见词、短词检索第一页"""
+    print(f"== 全文检索（{total}个图表） ==")
+    characters = "天地玄黄宇宙洪荒日月盈昃辰宿列张寒来暑往秋收冬藏闰余成岁律吕调阳云腾致雨露结为霜金生丽水玉出昆冈"
+    vocabulary = [characters[i % 47] + characters[i // 47 % 47] + characters[i // 2209 % 47] + str(i)
+                  for i in range(vocabulary_size)]
+
+    def make_row(i):
+        # 词频大致服从齐夫分布：小编号的词很常见，大编号的词很少见
+        words = [vocabulary[(i * 7919 + k * 104729) % (1 + (i + k) % vocabulary_size)] for k in range(6)]
+        content = words[0] + "\n" + "\n".join("-" + word for word in words[1:])
+        return (f"图表{i} {words[0]}", (i % 20) + 1, content, content.replace("\n-", "─"))
+
+    with tempfile.TemporaryDirectory() as workdir:
+        db = DatabaseManager(os.path.join(workdir, "search.db"))
+        start = time.perf_counter()
+        with db._cursor() as cursor:
+            cursor.executemany("INSERT INTO topics (name) VALUES (?)", ((f"专题{i}",) for i in range(20)))
+            cursor.executemany("INSERT INTO tree_diagrams (name, topic_id, content, result) VALUES (?, ?, ?, ?)",
+                               (make_row(i) for i in range(total)))
+        print(f"写入并建立全文索引 {time.perf_counter() - start:.1f}s，"
+              f"数据库 {os.path.getsize(os.path.join(workdir, 'search.db')) / 1024 / 1024:.0f}MB")
+
+        queries = (
+            ("罕见词", f"图表{total // 2 + 1}", None),
+            ("常见词", vocabulary[1], None),
+            ("两个词", vocabulary[3] + " " + vocabulary[5], None),
+            ("按专题", vocabulary[2], 3),
+            ("短词", "天地", None),
+            ("单字", "宇", None),
+            ("罕见短词", "稀有", None),
+            ("短词按专题", "天地", 3),
+            ("长词加短词", vocabulary[1] + " 玄", None),
+        )
+        print(f"{'':<10} {'检索词':<16} {'第一页(s)':>10} {'结果数':>8}")
+        for label, query, topic_id in queries:
+            elapsed, results = timed(db.search_diagrams, query, topic_id)
+            print(f"{label:<10} {query:<16} {elapsed:>10.4f} {len(results):>8}")
+
+        # 改动前短词逐行LIKE匹配：没有匹配时要扫描全表
+        with db._cursor() as cursor:
+            elapsed, _ = timed(lambda: cursor.execute(
+                "SELECT id FROM tree_diagrams WHERE name LIKE ? OR content LIKE ? OR result LIKE ? LIMIT ?",
+                ("%稀有%",) * 3 + (PAGE_SIZE,)).fetchall())
+        print(f"{'LIKE扫描':<10} {'稀有':<16} {elapsed:>10.4f}")
+        db.close()
+
+
+def legacy_populate_table(table, diagrams):
+    """原HistoryDialog的做法：每次变动后为每一行重建单元格和带样式表的按钮控件"""
+    from PyQt5.QtGui import QColor
+    from PyQt5.QtWidgets import QHBoxLayout, QPushButton, QTableWidgetItem, QWidget
+
+    table.setRowCount(len(diagrams))
+    for i, diagram in enumerate(diagrams):
+        for column, key in enumerate(('name', 'topic_name', 'created_at')):
+            item = QTableWidgetItem(diagram[key])
+            item.setForeground(QColor("#8B4513"))
+            item.setBackground(QColor("#f5f5dc" if i % 2 == 0 else "#faf0e6"))
+            table.setItem(i, column, item)
+        widget = QWidget()
+        widget.setStyleSheet("background-color: transparent; border: none;")
+        layout = QHBoxLayout(widget)
+        for text, color in (("查看", "#f5deb3"), ("删除", "#f4a460")):
+            button = QPushButton(text)
+            button.setStyleSheet(f"QPushButton {{ background: {color}; border-radius: 6px; font-size: 16px; }}"
+                                 "QPushButton:hover { border-color: #daa520; }")
+            layout.addWidget(button)
+        table.setCellWidget(i, 3, widget)
+
+
+def bench_history(total=10_000, deletions=100):
+    """我的树枝图列表中逐个删除图表：整表重建 与 只移除一行对比"""
+    try:
+        from PyQt5.QtCore import QModelIndex
+        from PyQt5.QtWidgets import QApplication, QTableWidget
+    except ImportError:
+        print("未安装PyQt5，跳过")
+        return
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    app = QApplication.instance() or QApplication([])
+    from ymtree import HistoryDialog
+
+    print(f"== 列表删除（{total}行中删除{deletions}行） ==")
+    with tempfile.TemporaryDirectory() as workdir:
+        db = DatabaseManager(os.path.join(workdir, "history.db"))
+        with db._cursor() as cursor:
+            cursor.executemany("INSERT INTO tree_diagrams (name, content, result) VALUES (?, ?, ?)",
+                               ((f"图表{i}", "根\n-枝", "根─枝") for i in range(total)))
+
+        # 原做法：QTableWidget每删除一行就重建全部行，耗时太长，只测几次后按比例估算
+        legacy_deletions = 3
+        diagrams = db.get_diagram_summaries()
+        table = QTableWidget(0, 4)
+        table.show()
+        legacy_populate_table(table, diagrams)
+        start = time.perf_counter()
+        for _ in range(legacy_deletions):
+            diagrams.pop(len(diagrams) // 2)
+            legacy_populate_table(table, diagrams)
+            app.processEvents()
+        legacy_time = (time.perf_counter() - start) / legacy_deletions * deletions
+        table.close()
+
+        dialog = HistoryDialog(None, db)
+        dialog.show()
+        model = dialog.model
+
+        def load_all():
+            while model.canFetchMore(QModelIndex()):
+                model.fetchMore(QModelIndex())
+            app.processEvents()
+
+        def delete_rows(remove):
+            start = time.perf_counter()
+            for _ in range(deletions):
+                row = model.rowCount() // 2
+                db.delete_diagram(model.diagrams[row]['id'])
+                remove(row)
+                app.processEvents()
+            return time.perf_counter() - start
+
+        def reload(row):
+            loaded = model.rowCount() - 1
+            model.load(model.topic_id, model.search_text)
+            while model.rowCount() < loaded and model.canFetchMore(QModelIndex()):
+                model.fetchMore(QModelIndex())
+
+        load_all()
+        reload_time = delete_rows(reload)
+        load_all()
+        remove_time = delete_rows(model.remove_diagram)
+        assert model.rowCount() == total - deletions * 2
+        dialog.close()
+        db.close()
+
+    print(f"{'QTableWidget整表重建':<22} {legacy_time:>8.2f}s  （按{legacy_deletions}次估算）")
+    print(f"{'模型重置并重新读取':<22} {reload_time:>8.2f}s")
+    print(f"{'模型只移除一行':<22} {remove_time:>8.3f}s  "
+          f"（比整表重建快 {legacy_time / remove_time:.0f}x，每次 {remove_time / deletions * 1000:.2f}ms）")
+
+
+def bench_populate(total=2_000):
+    """填充我的树枝图列表：逐行创建控件和样式表 与 共享样式表加缓存的字体画刷对比"""
+    try:
+        from PyQt5.QtCore import QModelIndex
+        from PyQt5.QtWidgets import QApplication, QTableWidget
+    except ImportError:
+        print("未安装PyQt5，跳过")
+        return
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    app = QApplication.instance() or QApplication([])
+    from ymtree import HistoryDialog, history_row_style, history_style_sheet
+
+    print(f"== 列表填充（{total}行，含一次绘制） ==")
+    with tempfile.TemporaryDirectory() as workdir:
+        db = DatabaseManager(os.path.join(workdir, "populate.db"))
+        with db._cursor() as cursor:
+            cursor.executemany("INSERT INTO tree_diagrams (name, content, result) VALUES (?, ?, ?)",
+                               ((f"图表{i}", "根\n-枝", "根─枝") for i in range(total)))
+        diagrams = db.get_diagram_summaries()
+
+        table = QTableWidget(0, 4)
+        table.show()
+        start = time.perf_counter()
+        legacy_populate_table(table, diagrams)
+        app.processEvents()
+        table.grab()
+        legacy_time = time.perf_counter() - start
+        table.close()
+
+        dialog = HistoryDialog(None, db)
+        dialog.show()
+        model = dialog.model
+        history_row_style.cache_clear()
+        start = time.perf_counter()
+        dialog.load_diagrams()
+        while model.canFetchMore(QModelIndex()):
+            model.fetchMore(QModelIndex())
+        app.processEvents()
+        dialog.table.grab()
+        model_time = time.perf_counter() - start
+        assert model.rowCount() == total
+
+        # 切换字号：只替换一次对话框样式表，行字体和画刷按(字号, 奇偶)取缓存
+        original_size = dialog.table_font_combo.currentData()
+        start = time.perf_counter()
+        for font_size in (24, 28, original_size):
+            dialog.table_font_combo.setCurrentIndex(dialog.table_font_combo.findData(font_size))
+            app.processEvents()
+            dialog.table.grab()
+        resize_time = (time.perf_counter() - start) / 3
+        cache = history_row_style.cache_info()
+        dialog.close()
+        db.close()
+
+    print(f"{'逐行控件和样式表':<18} {legacy_time:>8.3f}s")
+    print(f"{'共享样式表和缓存':<18} {model_time:>8.3f}s  （快 {legacy_time / model_time:.0f}x）")
+    print(f"{'切换字号（每次）':<18} {resize_time:>8.3f}s")
+    print(f"行样式缓存：命中 {cache.hits} 次，创建 {cache.misses} 组；"
+          f"样式表缓存 {history_style_sheet.cache_info().currsize} 份")
+
+
+def bench_writeback(diagram_count=50, edits=20_000):
+    """频繁修改少量图表（自动保存、改名、颜色、排序）：逐条提交 与 延迟写入合并提交对比"""
+    print(f"== 延迟写入（{diagram_count}个图表上{edits}次修改） ==")
+    content = "\n".join(make_mixed_outline(200))
+
+    def edit_all(db, ids):
+        start = time.perf_counter()
+        for i in range(edits):
+            diagram_id = ids[i % len(ids)]
+            kind = i % 4
+            if kind == 0:
+                db.update_diagram_content(diagram_id, content + f"\n版本{i}", f"结果{i}")
+            elif kind == 1:
+                db.update_diagram_name(diagram_id, f"图表{i}")
+            elif kind == 2:
+                db.update_diagram_color(diagram_id, f"#{i % 0xFFFFFF:06x}")
+            else:
+                db.update_diagram_sort_order(diagram_id, i)
+        db.flush()
+        return time.perf_counter() - start
+
+    with tempfile.TemporaryDirectory() as workdir:
+        timings = {}
+        snapshots = {}
+        for write_behind in (False, True):
+            db_path = os.path.join(workdir, f"writeback_{write_behind}.db")
+            db = DatabaseManager(db_path, write_behind=write_behind)
+            ids = [db.save_tree_diagram(f"图表{i}", None, content, "") for i in range(diagram_count)]
+            timings[write_behind] = edit_all(db, ids)
+            snapshots[write_behind] = [(d['name'], d['color_tag'], d['sort_order'], d['result'])
+                                       for d in db.get_tree_diagrams()]
+            db.close()
+        assert snapshots[False] == snapshots[True], "延迟写入的最终结果与逐条提交不一致"
+
+        # 读取能看到尚未写入的修改，且不会让修改提前写入；不存在的图表返回False
+        db_path = os.path.join(workdir, "consistency.db")
+        db = DatabaseManager(db_path, write_behind=True, flush_interval=60)
+        diagram_id = db.save_tree_diagram("旧名", None, "根", "根")
+        db.update_diagram_name(diagram_id, "新名")
+        db.update_diagram_content(diagram_id, "新根\n-甲\n-乙", "新根")
+        assert db.get_diagram_summaries()[0]['name'] == "新名"
+        assert db.get_diagram_body(diagram_id)['result'] == "新根"
+        assert db._pending, "读取不应写入排队的修改"
+        assert not db.update_diagram_color(diagram_id + 1, "#ff0000")
+
+        # 同一数据库上的另一个实例不会补写或删除仍在运行的实例的日志，两者都能正常关闭
+        other = DatabaseManager(db_path, write_behind=True)
+        assert os.path.exists(db.journal_path), "另一个实例删除了正在使用的日志"
+        assert other.get_diagram_body(diagram_id)['result'] == "根"
+        other.update_diagram_color(diagram_id, "#00ff00")
+        other.close()
+        db.flush()
+        assert other.journal_path != db.journal_path
+
+        # 模拟崩溃：排队的修改未写入就丢弃连接，重新打开时从日志补写
+        db.update_diagram_content(diagram_id, "根\n-枝", "根─枝")
+        db.update_diagram_sort_order(diagram_id, 7)
+        db._flush_timer.cancel()
+        db._conn.close()
+        db._conn = None
+        db._journal.close()
+        db = DatabaseManager(db_path)
+        recovered = db.get_tree_diagrams()[0]
+        assert (recovered['content'], recovered['sort_order'], recovered['color_tag']) == \
+            ("根\n-枝", 7, "#00ff00"), "日志补写失败"
+        assert not glob.glob(glob.escape(db_path) + "-pending*")
+        db.close()
+        # 日志已被删除时关闭不报错
+        db = DatabaseManager(db_path, write_behind=True)
+        db.update_diagram_name(diagram_id, "再改")
+        os.remove(db.journal_path)
+        db.close()
+
+    print(f"{'逐条提交':<10} {timings[False]:>8.3f}s  （{edits / timings[False]:>9.0f} 次/s）")
+    print(f"{'延迟写入':<10} {timings[True]:>8.3f}s  （{edits / timings[True]:>9.0f} 次/s，"
+          f"快 {timings[False] / timings[True]:.1f}x）")
+    print("读取一致性、多实例日志、崩溃后日志补写：通过")
+
+
+def bench_import(total=50_000, legacy_sample=2_000):
+    """批量导入大纲：逐条save_tree_diagram 与 大批次executemany、暂缓索引、多进程渲染对比，
+    并验证中断后从断点继续"""
+    print(f"== 批量导入（{total}个大纲） ==")
+    outline = make_mixed_outline(60)
+    records = [(f"大纲{i}", f"专题{i % 50}", "\n".join([f"根{i}"] + outline[1:])) for i in range(total)]
+
+    with tempfile.TemporaryDirectory() as workdir:
+        # 原做法：每条单独渲染、单独提交，只测一部分后按比例估算
+        db = DatabaseManager(os.path.join(workdir, "legacy.db"))
+        topic_ids = {}
+        start = time.perf_counter()
+        for name, topic, content in records[:legacy_sample]:
+            if topic not in topic_ids:
+                topic_ids[topic] = db.create_topic(topic)
+            db.save_tree_diagram(name, topic_ids[topic], content, render(content))
+        legacy_rate = legacy_sample / (time.perf_counter() - start)
+        db.close()
+
+        rates = {}
+        for label, workers in (("单进程", 0), ("多进程", None)):
+            db = DatabaseManager(os.path.join(workdir, f"import_{workers}.db"))
+            stats = import_outlines(db, records, workers=workers)
+            assert stats['imported'] == total and not stats['failed']
+            assert len(db.search_diagrams(f"根{total - 1}")) == 1, "新导入的行没有进入全文索引"
+            rates[label] = stats['rows_per_second']
+            db.close()
+
+        # 中断：第3批提交后抛出异常，索引应已恢复；用同一断点名继续，行数不重复不遗漏
+        class Interrupted(Exception):
+            pass
+
+        def interrupt(stats):
+            if stats['imported'] >= 3 * 1000:
+                raise Interrupted
+
+        db = DatabaseManager(os.path.join(workdir, "resume.db"))
+        try:
+            import_outlines(db, records[:10_000], batch_size=1000, checkpoint="archive", progress=interrupt)
+        except Interrupted:
+            pass
+        assert db.get_import_checkpoint("archive") == 3000
+        assert db._conn.execute("SELECT COUNT(*) FROM deferred_schema").fetchone()[0] == 0
+        stats = import_outlines(db, records[:10_000], batch_size=1000, checkpoint="archive")
+        assert stats['skipped'] == 3000 and stats['imported'] == 7000
+        names = [row[0] for row in db._conn.execute("SELECT name FROM tree_diagrams ORDER BY id")]
+        assert names == [name for name, _, _ in records[:10_000]], "断点续传后数据不一致"
+        db.close()
+
+    print(f"{'逐条保存':<8} {legacy_rate:>10.0f} 行/秒  （按{legacy_sample}条估算）")
+    for label, rate in rates.items():
+        print(f"{label:<8} {rate:>10.0f} 行/秒  （{rate / legacy_rate:.1f}x，含重建索引）")
+    print("中断后从断点继续：通过")
+
+
+def bench_export(total=100_000):
+    """导出整个图表库：get_tree_diagrams一次读入 与 fetchmany逐批流式导出对比（耗时和内存峰值）"""
+    print(f"== 图表库导出（{total}个图表） ==")
+    content = "\n".join(make_mixed_outline(40))
+    result = render(content)
+
+    with tempfile.TemporaryDirectory() as workdir:
+        db = DatabaseManager(os.path.join(workdir, "export.db"))
+        with db.deferred_indexes():
+            for start in range(0, total, 10_000):
+                db.insert_diagrams((f"图表{i}", None, content, result) for i in range(start, min(total, start + 10_000)))
+
+        def legacy_export(path):
+            with open(path, 'w', encoding='utf-8') as f:
+                for diagram in db.get_tree_diagrams():
+                    f.write(json.dumps(diagram_record(diagram), ensure_ascii=False) + "\n")
+
+        def measure(func, *args):
+            tracemalloc.start()
+            start = time.perf_counter()
+            func(*args)
+            elapsed = time.perf_counter() - start
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            return elapsed, peak
+
+        results = [
+            ("一次读入 JSONL", measure(legacy_export, os.path.join(workdir, "legacy.jsonl"))),
+            ("流式 JSONL", measure(export_diagrams, db, os.path.join(workdir, "all.jsonl"), FORMAT_JSONL)),
+            ("流式 ZIP", measure(export_diagrams, db, os.path.join(workdir, "all.zip"), FORMAT_ZIP)),
+        ]
+        with open(os.path.join(workdir, "all.jsonl"), encoding='utf-8') as f:
+            assert sum(1 for _ in f) == total
+        db.close()
+
+    print(f"{'':<14} {'耗时(s)':>8} {'内存峰值(MB)':>14}")
+    for label, (elapsed, peak) in results:
+        print(f"{label:<14} {elapsed:>8.2f} {peak / 1024 / 1024:>14.1f}")
+
+
+BENCHMARKS = {
+    'layout': bench_layout,
+    'fanout': bench_fanout,
+    'fullwidth': bench_fullwidth,
+    'deep': bench_deep,
+    'memory': bench_memory,
+    'stream': bench_stream,
+    'batch': bench_batch,
+    'incremental': bench_incremental,
+    'memo': bench_memo,
+    'width': bench_width,
+    'database': bench_database,
+    'indexes': bench_indexes,
+    'search': bench_search,
+    'history': bench_history,
+    'populate': bench_populate,
+    'writeback': bench_writeback,
+    'import': bench_import,
+    'export': bench_export,
+}
+
+
+def main(argv):
+    names = argv or list(BENCHMARKS)
+    failed = False
+    for name in names:
+        if name not in BENCHMARKS:
+            print(f"未知的基准：{name}，可选：{', '.join(BENCHMARKS)}")
+            return 2
+        if BENCHMARKS[name]() is False:
+            failed = True
+        print()
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,115 @@
+# -*- coding: utf-8 -*-
+"""
+批量导入 - 把大量已有的大纲生成义脉树枝图后写入数据库
+渲染可分发到进程池，写入按大批次在一个事务中executemany，索引在导入结束后一次性重建；
+可记录断点，中断后从断点继续
+"""
+
+import os
+import time
+from contextlib import nullcontext
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from typing import Callable, Dict, Iterable, Iterator, Optional, Tuple
+
+from database import DatabaseManager
+from tree_engine import TreeParseError, render
+
+# 一条输入：(名称, 专题名称或None, 大纲文本)
+Record = Tuple[str, Optional[str], str]
+
+# 每个事务插入的行数
+BATCH_SIZE = 5000
+
+
+def render_record(record: Record) -> Tuple[str, Optional[str], str, Optional[str], Optional[str]]:
+    """生成一条输入的树枝图，返回(名称, 专题, 大纲, 结果, 错误信息)；解析失败时结果为None"""
+    name, topic, content = record
+    try:
+        return name, topic, content, render(content), None
+    except TreeParseError as e:
+        return name, topic, content, None, str(e)
+
+
+def iter_rendered(records: Iterable[Record], workers: Optional[int] = 0,
+                  chunksize: int = 64) -> Iterator[tuple]:
+    """按输入顺序逐条返回render_record的结果
+
+    workers为0时在当前进程中渲染；否则用进程池（None表示CPU核数）。
+    每次只向进程池提交有限的一段输入，输入再多内存占用也不会增长。
+    """
+    if workers == 0:
+        yield from map(render_record, records)
+        return
+
+    records = iter(records)
+    window = chunksize * (workers or os.cpu_count() or 1) * 4
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        while True:
+            chunk = list(islice(records, window))
+            if not chunk:
+                break
+            yield from executor.map(render_record, chunk, chunksize=chunksize)
+
+
+def iter_outline_files(directory: str, encoding: str = 'utf-8') -> Iterator[Record]:
+    """按固定顺序读取目录中的*.txt大纲：文件名（不含扩展名）作为名称，
+    所在的第一级子目录作为专题，直接放在目录下的文件不设专题"""
+    for root, dirs, files in os.walk(directory):
+        dirs.sort()
+        relative = os.path.relpath(root, directory)
+        topic = None if relative == os.curdir else relative.split(os.sep)[0]
+        for filename in sorted(files):
+            if filename.endswith(".txt") and not filename.endswith(".tree.txt"):
+                with open(os.path.join(root, filename), encoding=encoding) as f:
+                    yield os.path.splitext(filename)[0], topic, f.read()
+
+
+def import_outlines(db: DatabaseManager, records: Iterable[Record], workers: Optional[int] = 0,
+                    batch_size: int = BATCH_SIZE, checkpoint: Optional[str] = None,
+                    defer_indexes: bool = True,
+                    progress: Optional[Callable[[Dict], None]] = None) -> Dict:
+    """批量导入，返回统计：导入行数、跳过（断点之前）条数、失败列表、耗时和每秒行数
+
+    checkpoint为断点名时，每批插入与已处理的输入条数在同一事务中提交；
+    用同一断点名再次调用会跳过已处理的输入（输入顺序须与上次相同）。
+    progress在每批提交后以当前统计调用一次。
+    """
+    start = time.perf_counter()
+    skipped = db.get_import_checkpoint(checkpoint) if checkpoint else 0
+    stats = {'imported': 0, 'skipped': skipped, 'failed': [], 'seconds': 0.0, 'rows_per_second': 0.0}
+    topic_ids = {}
+    position = committed = skipped
+
+    def commit(batch):
+        nonlocal committed
+        names = {topic for _, topic, _, _ in batch if topic and topic not in topic_ids}
+        if names:
+            topic_ids.update(db.get_topic_ids(names))
+        rows = [(name, topic_ids.get(topic), content, result) for name, topic, content, result in batch]
+        stats['imported'] += db.insert_diagrams(rows, (checkpoint, position) if checkpoint else None)
+        committed = position
+        stats['seconds'] = time.perf_counter() - start
+        stats['rows_per_second'] = stats['imported'] / stats['seconds'] if stats['seconds'] else 0.0
+        if progress is not None:
+            progress(stats)
+
+    with db.deferred_indexes() if defer_indexes else nullcontext():
+        batch = []
+        for name, topic, content, result, error in iter_rendered(islice(records, skipped, None), workers):
+            position += 1
+            if error is not None:
+                stats['failed'].append({'position': position, 'name': name, 'error': error})
+            else:
+                batch.append((name, topic, content, result))
+            if len(batch) >= batch_size:
+                commit(batch)
+                batch = []
+        # 最后一批；输入末尾全部解析失败时也要把断点推进到末尾
+        if batch or (checkpoint and position > committed):
+            commit(batch)
+
+    # 包括重建索引的总耗时
+    stats['seconds'] = time.perf_counter() - start
+    stats['rows_per_second'] = stats['imported'] / stats['seconds'] if stats['seconds'] else 0.0
+    return stats
@@ -1,18 +1,464 @@
 import sqlite3
 import os
-from datetime import datetime
-from typing import List, Dict, Optional, Tuple
+import glob
+import json
+import re
+import threading
+import uuid
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+# 图表列表的排序：(列, 字典中的键, 方向)，最后以id保证顺序唯一
+LISTING_ORDER = (
+    ('td.sort_order', 'sort_order', 'ASC'),
+    ('td.created_at', 'created_at', 'DESC'),
+    ('td.id', 'id', 'DESC'),
+)
+
+# 每次分页读取的行数
+PAGE_SIZE = 200
+
+# 列表只读取的元数据列（content和result位置为NULL，与_diagram_from_row的列序一致）
+SUMMARY_COLUMNS = """td.id, td.name, NULL, NULL, td.created_at, td.updated_at,
+                     t.name as topic_name, td.color_tag, td.sort_order, td.topic_id"""
+
+# 全文检索使用三元组分词，中文不需要分词也能按任意子串匹配；
+# 少于3个字的检索词改用短词索引（见search_grams）
+SEARCH_MIN_TERM_LENGTH = 3
+
+# 连续的文字和数字（短词索引只收录这些字符）
+WORD_RUN = re.compile(r"[^\W_]+")
+
+
+def search_grams(text: str) -> str:
+    """短词索引的内容：每段连续的文字和数字中，每个字与其后一个字组成一项（段末的字单独一项），
+    以空格分隔交给unicode61分词。两个字的检索词即为其中一项，一个字的检索词按前缀匹配。
+    由DatabaseManager在写入时计算（见_refresh_grams），数据库结构中不引用此函数"""
+    grams = []
+    for run in WORD_RUN.findall(text):
+        grams.extend(run[i:i + 2] for i in range(len(run)))
+    return " ".join(grams)
+
+
+# 延迟写入模式下可以排队的列（拼接进UPDATE语句，只允许这些列名）
+DEFERRED_COLUMNS = ('name', 'content', 'result', 'topic_id', 'color_tag', 'sort_order', 'updated_at')
+
+# 读取时须先写入的排队列：图表列表按专题筛选、按排序值排序；
+# 检索还要匹配名称和正文。其余列（颜色、更新时间等）直接叠加到读取结果上
+LISTING_COLUMNS = ('topic_id', 'sort_order')
+SEARCH_COLUMNS = ('name', 'content', 'result', 'topic_id', 'sort_order')
+
+# 延迟写入的默认间隔（秒）
+FLUSH_INTERVAL = 2.0
+
+# 延迟写入日志文件名的后缀：每个DatabaseManager各用一个（数据库路径 + 后缀 + 随机串）
+JOURNAL_SUFFIX = "-pending"
+
+
+def _try_lock(file) -> bool:
+    """以不等待的方式对已打开的文件加排他锁，文件已被其他进程或连接锁住时返回False；
+    文件关闭（包括进程退出）时锁自动释放"""
+    try:
+        if fcntl is not None:
+            fcntl.flock(file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        else:
+            # Windows锁定从当前位置开始的字节，锁住第一个字节即可（可以超出文件末尾）
+            file.seek(0)
+            msvcrt.locking(file.fileno(), msvcrt.LK_NBLCK, 1)
+        return True
+    except OSError:
+        return False
+
+
+def _same_file(file, path: str) -> bool:
+    """已打开的文件是否仍是path处的文件（加锁之前可能已被其他实例当作遗留日志删除）"""
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return False
+    opened = os.fstat(file.fileno())
+    return (stat.st_dev, stat.st_ino) == (opened.st_dev, opened.st_ino)
+
+
+def _remove_quietly(path: str):
+    # 可能已被另一个实例补写后删除，或在Windows上正被另一个实例打开，都留给之后处理
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
 
 class DatabaseManager:
-    def __init__(self, db_path: str = "ymtree.db"):
+    def __init__(self, db_path: str = "ymtree.db", write_behind: bool = False,
+                 flush_interval: float = FLUSH_INTERVAL):
+        """write_behind为True时，修改图表内容、名称、专题、颜色和排序先放入内存队列，
+        同一图表的多次修改按列合并（后写覆盖先写），每隔flush_interval秒、
+        下一次写数据库时或调用flush()/close()时在一个事务中写入；
+        读取时把队列中的值叠加到查询结果上，只有筛选或排序依赖排队的列时才先写入"""
         self.db_path = db_path
+        self.write_behind = write_behind
+        self.flush_interval = flush_interval
+        # 整个程序共用一个长连接，省去每次操作的建连开销；
+        # 连接会被预览窗口和后台线程使用，用锁串行化访问
+        self._lock = threading.RLock()
+        self._conn = self._connect()
+
+        # 延迟写入队列：图表id -> {列名: 值}；同时追加到本实例独占（加锁）的日志文件，
+        # 程序崩溃后下次启动时补写。第一次排队修改时才创建日志
+        self._pending = {}
+        self._flush_timer = None
+        self._journal = None
+        self.journal_path = None
+
         self.init_database()
-    
+        self._replay_journal()
+        self._restore_deferred_indexes()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, check_same_thread=False, cached_statements=256)
+        # WAL模式下写事务只追加日志，读写互不阻塞；synchronous=NORMAL只在检查点时fsync，
+        # 断电可能丢失最近提交的事务，但不会损坏数据库
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    @contextmanager
+    def _cursor(self, flush_columns: Iterable[str] = DEFERRED_COLUMNS):
+        """在共享连接上取得游标，正常结束时提交，出错时回滚
+        （相同的SQL语句由连接的语句缓存复用，不会重复编译）
+
+        排队的修改涉及flush_columns中的列时，先在同一事务中写入，之后的语句都能看到它们。
+        写操作使用默认值（总是先写入）；读操作只传入筛选和排序用到的列，其余列用_overlay叠加。
+        """
+        with self._lock:
+            if self._conn is None:
+                raise sqlite3.ProgrammingError("数据库连接已关闭")
+            cursor = self._conn.cursor()
+            flushing = self._pending_touches(flush_columns)
+            try:
+                if flushing:
+                    self._apply_pending(cursor)
+                yield cursor
+                if self._conn.in_transaction:
+                    # 本事务改过图表时，在同一事务中更新短词索引
+                    self._refresh_grams(cursor)
+                self._conn.commit()
+            except BaseException:
+                # 回滚后排队的修改仍保留在队列和日志中，下次再写
+                self._conn.rollback()
+                raise
+            finally:
+                cursor.close()
+            if flushing:
+                self._clear_pending()
+
+    def close(self):
+        """写入排队的修改后关闭连接（程序退出时调用），同时把WAL日志合并回数据库文件"""
+        with self._lock:
+            if self._conn is not None:
+                self.flush()
+                self._conn.close()
+                self._conn = None
+            if self._journal is not None:
+                # 关闭后锁即释放；修改都已写入时不留下日志文件，否则留给下次启动补写
+                self._journal.close()
+                self._journal = None
+                if not self._pending:
+                    _remove_quietly(self.journal_path)
+
+    def flush(self) -> int:
+        """立即在一个事务中写入所有排队的修改，返回写入的图表数"""
+        with self._lock:
+            count = len(self._pending)
+            if count:
+                with self._cursor():
+                    pass
+            return count
+
+    def _pending_touches(self, columns: Iterable[str]) -> bool:
+        """队列中是否有对columns中任一列的修改"""
+        columns = set(columns)
+        return any(not columns.isdisjoint(values) for values in self._pending.values())
+
+    def _overlay(self, diagram: Dict) -> Dict:
+        """把队列中对该图表的修改叠加到读取结果上（只覆盖结果中已有的键）"""
+        for column, value in self._pending.get(diagram['id'], {}).items():
+            if column in diagram:
+                diagram[column] = value
+        return diagram
+
+    def _apply_pending(self, cursor):
+        """把队列中的修改按列组合分组，每组用一条executemany写入"""
+        groups = {}
+        for diagram_id, values in self._pending.items():
+            columns = tuple(sorted(values))
+            groups.setdefault(columns, []).append(
+                tuple(values[column] for column in columns) + (diagram_id,)
+            )
+        for columns, rows in groups.items():
+            assignments = ", ".join(f"{column} = ?" for column in columns)
+            cursor.executemany(f"UPDATE tree_diagrams SET {assignments} WHERE id = ?", rows)
+
+    def _clear_pending(self):
+        self._pending.clear()
+        if self._flush_timer is not None:
+            self._flush_timer.cancel()
+            self._flush_timer = None
+        if self._journal is not None:
+            self._journal.seek(0)
+            self._journal.truncate()
+
+    def _defer(self, diagram_id: int, **values) -> bool:
+        """把对一个图表的修改放入队列并记入日志；图表不存在时返回False"""
+        with self._lock:
+            if self._conn is None:
+                raise sqlite3.ProgrammingError("数据库连接已关闭")
+            if diagram_id not in self._pending and self._conn.execute(
+                    "SELECT 1 FROM tree_diagrams WHERE id = ?", (diagram_id,)).fetchone() is None:
+                return False
+
+            if self.db_path != ":memory:":
+                if self._journal is None:
+                    self._open_journal()
+                # 写入操作系统缓冲区即可：程序崩溃不会丢失，与WAL下synchronous=NORMAL的保证相同
+                self._journal.write(json.dumps([diagram_id, values], ensure_ascii=False) + "\n")
+                self._journal.flush()
+
+            self._pending.setdefault(diagram_id, {}).update(values)
+            if self._flush_timer is None:
+                self._flush_timer = threading.Timer(self.flush_interval, self._flush_on_timer)
+                self._flush_timer.daemon = True
+                self._flush_timer.start()
+            return True
+
+    def _flush_on_timer(self):
+        with self._lock:
+            self._flush_timer = None
+            if self._conn is not None:
+                try:
+                    self.flush()
+                except sqlite3.Error:
+                    pass  # 修改仍在队列和日志中，下次读写或关闭时再写
+
+    def _open_journal(self):
+        """创建并锁住本实例的日志文件。另一个实例启动时可能恰好把刚创建、尚未加锁的文件
+        当作遗留日志锁住或删除，此时换一个文件名重来"""
+        while True:
+            path = f"{self.db_path}{JOURNAL_SUFFIX}-{uuid.uuid4().hex[:12]}"
+            journal = open(path, 'a', encoding='utf-8')
+            if _try_lock(journal) and _same_file(journal, path):
+                self._journal, self.journal_path = journal, path
+                return
+            journal.close()
+
+    def _replay_journal(self):
+        """补写以前未写入数据库的修改（程序崩溃时留下的日志）
+
+        只处理能加锁的日志：其他仍在运行的实例锁着自己的日志，不会被读取或删除
+        """
+        if self.db_path == ":memory:":
+            return
+        # 多个实例都留下日志时按修改时间先后补写，同一列以最后写的为准
+        modified = {}
+        for path in glob.glob(glob.escape(self.db_path + JOURNAL_SUFFIX) + "*"):
+            try:
+                modified[path] = os.path.getmtime(path)
+            except OSError:
+                pass
+        replayed = []
+        try:
+            for path in sorted(modified, key=modified.get):
+                try:
+                    journal = open(path, encoding='utf-8')
+                except OSError:
+                    continue
+                if not _try_lock(journal):
+                    journal.close()
+                    continue
+                replayed.append((path, journal))
+                for line in journal:
+                    try:
+                        diagram_id, values = json.loads(line)
+                    except ValueError:
+                        break  # 崩溃时写了一半的最后一行
+                    values = {column: value for column, value in values.items() if column in DEFERRED_COLUMNS}
+                    if values:
+                        self._pending.setdefault(diagram_id, {}).update(values)
+            # 重复补写也没有问题：记录的都是最终值（包括更新时间）
+            with self._cursor():
+                pass
+        finally:
+            for path, journal in replayed:
+                journal.close()
+        for path, _ in replayed:
+            _remove_quietly(path)
+
+    @staticmethod
+    def _timestamp() -> str:
+        """与CURRENT_TIMESTAMP相同格式的当前UTC时间，延迟写入时记录修改发生的时间"""
+        return datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+
     def init_database(self):
-        """初始化数据库，创建必要的表"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
+        """初始化数据库：按顺序执行尚未执行的结构迁移，已执行到的版本号记录在PRAGMA user_version中"""
+        migrations = [
+            self._create_tables,            # 版本1：建表（兼容没有版本号的旧数据库）
+            self._create_listing_indexes,   # 版本2：图表列表和分页读取的复合索引
+            self._create_search_index,      # 版本3：名称、大纲和生成结果的全文索引
+            self._create_sort_indexes,      # 版本4：按创建时间排序的索引
+            self._create_import_tables,     # 版本5：批量导入的断点和暂缓的索引
+            self._create_short_term_index,  # 版本6：一两个字的检索词使用的短词索引
+        ]
+        with self._cursor() as cursor:
+            version = cursor.execute("PRAGMA user_version").fetchone()[0]
+            for number, migrate in enumerate(migrations[version:], version + 1):
+                migrate(cursor)
+                cursor.execute(f"PRAGMA user_version = {number}")
+
+    def _create_listing_indexes(self, cursor):
+        # 与图表列表的两种查询一一对应：按专题筛选再排序、全部图表排序，
+        # 有了索引后按索引顺序读取即可，不再全表扫描并临时排序。
+        # 分页按(sort_order, created_at, id)定位上一页末尾，id作为最后的排序键保证顺序唯一；
+        # 键中不能有NULL，旧数据中缺失的排序值按0处理（与界面显示一致）
+        cursor.execute("UPDATE tree_diagrams SET sort_order = 0 WHERE sort_order IS NULL")
+        cursor.execute(
+            "CREATE INDEX IF NOT EXISTS idx_tree_diagrams_topic_page "
+            "ON tree_diagrams (topic_id, sort_order ASC, created_at DESC, id DESC)"
+        )
+        cursor.execute(
+            "CREATE INDEX IF NOT EXISTS idx_tree_diagrams_page "
+            "ON tree_diagrams (sort_order ASC, created_at DESC, id DESC)"
+        )
+
+    def _create_search_index(self, cursor):
+        # 外部内容表：索引中不重复保存正文，由触发器与tree_diagrams保持同步
+        try:
+            cursor.execute(
+                "CREATE VIRTUAL TABLE IF NOT EXISTS diagram_search USING fts5("
+                "name, content, result, content='tree_diagrams', content_rowid='id', tokenize='trigram')"
+            )
+        except sqlite3.OperationalError:
+            # SQLite 3.34之前没有三元组分词，退回默认分词（中文只能整段匹配）
+            cursor.execute(
+                "CREATE VIRTUAL TABLE IF NOT EXISTS diagram_search USING fts5("
+                "name, content, result, content='tree_diagrams', content_rowid='id')"
+            )
+        cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS tree_diagrams_search_insert AFTER INSERT ON tree_diagrams BEGIN
+                INSERT INTO diagram_search (rowid, name, content, result)
+                VALUES (new.id, new.name, new.content, new.result);
+            END
+        ''')
+        cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS tree_diagrams_search_delete AFTER DELETE ON tree_diagrams BEGIN
+                INSERT INTO diagram_search (diagram_search, rowid, name, content, result)
+                VALUES ('delete', old.id, old.name, old.content, old.result);
+            END
+        ''')
+        # 只有名称、内容、结果变化时才更新索引，改颜色、排序不受影响
+        cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS tree_diagrams_search_update
+            AFTER UPDATE OF name, content, result ON tree_diagrams BEGIN
+                INSERT INTO diagram_search (diagram_search, rowid, name, content, result)
+                VALUES ('delete', old.id, old.name, old.content, old.result);
+                INSERT INTO diagram_search (rowid, name, content, result)
+                VALUES (new.id, new.name, new.content, new.result);
+            END
+        ''')
+        cursor.execute("INSERT INTO diagram_search (diagram_search) VALUES ('rebuild')")
+
+    def _create_sort_indexes(self, cursor):
+        # 按专题排序时按专题逐个分页，专题已被删除的图表视为未分类
+        cursor.execute(
+            "UPDATE tree_diagrams SET topic_id = NULL "
+            "WHERE topic_id IS NOT NULL AND topic_id NOT IN (SELECT id FROM topics)"
+        )
+        cursor.execute(
+            "CREATE INDEX IF NOT EXISTS idx_tree_diagrams_created ON tree_diagrams (created_at, id)"
+        )
+        cursor.execute(
+            "CREATE INDEX IF NOT EXISTS idx_tree_diagrams_topic_created ON tree_diagrams (topic_id, created_at, id)"
+        )
+
+    def _create_import_tables(self, cursor):
+        # 批量导入的断点：已处理的输入条数，与插入的数据在同一事务中更新
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS import_checkpoints (
+                name TEXT PRIMARY KEY,
+                position INTEGER NOT NULL,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+        # 批量导入期间暂时删除的索引，导入中断时下次打开数据库再恢复
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS deferred_schema (
+                name TEXT PRIMARY KEY,
+                sql TEXT NOT NULL
+            )
+        ''')
+
+    def _create_short_term_index(self, cursor):
+        # 无内容表：只保存倒排索引，删除一行时须给出当初写入的项
+        cursor.execute(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS diagram_grams USING fts5(grams, content='', prefix='1')"
+        )
+        # 短词由Python计算，触发器只用纯SQL记下哪些图表变了、索引中现有的是哪段文字
+        # （old_text为NULL表示索引中还没有该图表），任何连接都能照常写入tree_diagrams；
+        # DatabaseManager在写事务提交前和短词检索前按此表更新索引（_refresh_grams）
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS diagram_grams_stale (
+                id INTEGER PRIMARY KEY,
+                old_text TEXT
+            )
+        ''')
+        # INSERT OR IGNORE保留第一次记下的文字：更新之前，索引中的仍是那一段
+        old_text = "old.name || ' ' || old.content || ' ' || old.result"
+        cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS tree_diagrams_grams_insert AFTER INSERT ON tree_diagrams BEGIN
+                INSERT OR IGNORE INTO diagram_grams_stale (id, old_text) VALUES (new.id, NULL);
+            END
+        ''')
+        cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS tree_diagrams_grams_delete AFTER DELETE ON tree_diagrams BEGIN
+                INSERT OR IGNORE INTO diagram_grams_stale (id, old_text) VALUES (old.id, {old_text});
+            END
+        ''')
+        cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS tree_diagrams_grams_update
+            AFTER UPDATE OF name, content, result ON tree_diagrams BEGIN
+                INSERT OR IGNORE INTO diagram_grams_stale (id, old_text) VALUES (old.id, {old_text});
+            END
+        ''')
+        cursor.execute("INSERT OR IGNORE INTO diagram_grams_stale (id) SELECT id FROM tree_diagrams")
+
+    def _refresh_grams(self, cursor, batch_size: int = 1000):
+        """按diagram_grams_stale把短词索引更新到tree_diagrams的当前内容：
+        删去索引中原有的项，写入现在的项（已删除的图表只删不写）"""
+        while True:
+            rows = cursor.execute(
+                "SELECT s.id, s.old_text, td.name || ' ' || td.content || ' ' || td.result "
+                "FROM diagram_grams_stale s LEFT JOIN tree_diagrams td ON td.id = s.id "
+                "ORDER BY s.id LIMIT ?", (batch_size,)
+            ).fetchall()
+            if not rows:
+                return
+            cursor.executemany(
+                "INSERT INTO diagram_grams (diagram_grams, rowid, grams) VALUES ('delete', ?, ?)",
+                [(diagram_id, search_grams(old)) for diagram_id, old, _ in rows if old is not None]
+            )
+            cursor.executemany(
+                "INSERT INTO diagram_grams (rowid, grams) VALUES (?, ?)",
+                [(diagram_id, search_grams(new)) for diagram_id, _, new in rows if new is not None]
+            )
+            cursor.execute("DELETE FROM diagram_grams_stale WHERE id <= ?", (rows[-1][0],))
+
+    def _create_tables(self, cursor):
         # 创建专题表
         cursor.execute('''
             CREATE TABLE IF NOT EXISTS topics (
@@ -62,252 +508,526 @@ class DatabaseManager:
             cursor.execute("ALTER TABLE tree_diagrams ADD COLUMN sort_order INTEGER DEFAULT 0")
         except sqlite3.OperationalError:
             pass  # 字段已存在
-        
-        conn.commit()
-        conn.close()
     
     def create_topic(self, name: str, description: str = "") -> int:
         """创建新专题"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
         try:
-            cursor.execute(
-                "INSERT INTO topics (name, description) VALUES (?, ?)",
-                (name, description)
-            )
-            topic_id = cursor.lastrowid
-            conn.commit()
-            return topic_id
+            with self._cursor() as cursor:
+                cursor.execute(
+                    "INSERT INTO topics (name, description) VALUES (?, ?)",
+                    (name, description)
+                )
+                return cursor.lastrowid
         except sqlite3.IntegrityError:
             raise ValueError(f"专题名称 '{name}' 已存在")
-        finally:
-            conn.close()
     
     def get_topics(self) -> List[Dict]:
         """获取所有专题"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+        with self._cursor(()) as cursor:
+            cursor.execute("SELECT id, name, description, created_at FROM topics ORDER BY name")
+            topics = []
+            for row in cursor.fetchall():
+                topics.append({
+                    'id': row[0],
+                    'name': row[1],
+                    'description': row[2],
+                    'created_at': row[3]
+                })
         
-        cursor.execute("SELECT id, name, description, created_at FROM topics ORDER BY name")
-        topics = []
-        for row in cursor.fetchall():
-            topics.append({
-                'id': row[0],
-                'name': row[1],
-                'description': row[2],
-                'created_at': row[3]
-            })
-        
-        conn.close()
         return topics
     
     def create_level(self, topic_id: int, level_order: int, level_name: str, level_description: str = "") -> int:
         """为专题创建层级"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
         try:
-            cursor.execute(
-                "INSERT INTO levels (topic_id, level_order, level_name, level_description) VALUES (?, ?, ?, ?)",
-                (topic_id, level_order, level_name, level_description)
-            )
-            level_id = cursor.lastrowid
-            conn.commit()
-            return level_id
+            with self._cursor() as cursor:
+                cursor.execute(
+                    "INSERT INTO levels (topic_id, level_order, level_name, level_description) VALUES (?, ?, ?, ?)",
+                    (topic_id, level_order, level_name, level_description)
+                )
+                return cursor.lastrowid
         except sqlite3.IntegrityError:
             raise ValueError(f"层级顺序 {level_order} 在该专题中已存在")
-        finally:
-            conn.close()
     
     def get_levels_by_topic(self, topic_id: int) -> List[Dict]:
         """获取专题的所有层级"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute(
-            "SELECT id, level_order, level_name, level_description FROM levels WHERE topic_id = ? ORDER BY level_order",
-            (topic_id,)
-        )
-        levels = []
-        for row in cursor.fetchall():
-            levels.append({
-                'id': row[0],
-                'level_order': row[1],
-                'level_name': row[2],
-                'level_description': row[3]
-            })
+        with self._cursor(()) as cursor:
+            cursor.execute(
+                "SELECT id, level_order, level_name, level_description FROM levels WHERE topic_id = ? ORDER BY level_order",
+                (topic_id,)
+            )
+            levels = []
+            for row in cursor.fetchall():
+                levels.append({
+                    'id': row[0],
+                    'level_order': row[1],
+                    'level_name': row[2],
+                    'level_description': row[3]
+                })
         
-        conn.close()
         return levels
     
     def save_tree_diagram(self, name: str, topic_id: Optional[int], content: str, result: str) -> int:
         """保存树状图"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute(
-            "INSERT INTO tree_diagrams (name, topic_id, content, result) VALUES (?, ?, ?, ?)",
-            (name, topic_id, content, result)
-        )
-        diagram_id = cursor.lastrowid
-        conn.commit()
-        conn.close()
-        return diagram_id
+        with self._cursor() as cursor:
+            cursor.execute(
+                "INSERT INTO tree_diagrams (name, topic_id, content, result) VALUES (?, ?, ?, ?)",
+                (name, topic_id, content, result)
+            )
+            return cursor.lastrowid
     
-    def get_tree_diagrams(self, topic_id: Optional[int] = None) -> List[Dict]:
-        """获取树状图列表"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        if topic_id:
+    def get_topic_ids(self, names: Iterable[str]) -> Dict[str, int]:
+        """按名称取得专题id，不存在的专题自动创建（批量导入时使用）"""
+        names = list(dict.fromkeys(names))
+        if not names:
+            return {}
+        with self._cursor() as cursor:
+            cursor.executemany("INSERT OR IGNORE INTO topics (name) VALUES (?)", ((name,) for name in names))
+            topic_ids = {}
+            # 分批查询，避免超过SQLite的参数个数上限
+            for start in range(0, len(names), 500):
+                chunk = names[start:start + 500]
+                placeholders = ", ".join("?" * len(chunk))
+                cursor.execute(f"SELECT name, id FROM topics WHERE name IN ({placeholders})", chunk)
+                topic_ids.update(cursor.fetchall())
+        return topic_ids
+
+    def insert_diagrams(self, rows: Iterable[Tuple[str, Optional[int], str, str]],
+                        checkpoint: Optional[Tuple[str, int]] = None) -> int:
+        """在一个事务中插入多个树状图（名称, 专题id, 内容, 结果），返回插入的行数
+
+        checkpoint为(断点名, 已处理的输入条数)时在同一事务中记录断点，
+        中断后从断点继续不会重复插入或遗漏
+        """
+        with self._cursor() as cursor:
+            cursor.executemany(
+                "INSERT INTO tree_diagrams (name, topic_id, content, result) VALUES (?, ?, ?, ?)", rows
+            )
+            count = cursor.rowcount
+            if checkpoint is not None:
+                cursor.execute(
+                    "INSERT OR REPLACE INTO import_checkpoints (name, position, updated_at) "
+                    "VALUES (?, ?, CURRENT_TIMESTAMP)", checkpoint
+                )
+        return count
+
+    def get_import_checkpoint(self, name: str) -> int:
+        """断点记录的已处理输入条数，没有记录时为0"""
+        with self._cursor() as cursor:
+            row = cursor.execute("SELECT position FROM import_checkpoints WHERE name = ?", (name,)).fetchone()
+        return row[0] if row else 0
+
+    def clear_import_checkpoint(self, name: str):
+        with self._cursor() as cursor:
+            cursor.execute("DELETE FROM import_checkpoints WHERE name = ?", (name,))
+
+    @contextmanager
+    def deferred_indexes(self):
+        """批量插入期间暂时删除tree_diagrams的二级B树索引，结束时重建
+
+        每插入一行都要更新5个B树索引，最后一次性建索引要快得多。全文检索和短词索引的触发器保留，
+        导入期间界面上的改名、删除和修改照常同步到检索索引。删除前把定义记入deferred_schema，
+        进程中途被终止时下次打开数据库会自动恢复。
+        """
+        with self._cursor() as cursor:
             cursor.execute(
-                """SELECT td.id, td.name, td.content, td.result, td.created_at, td.updated_at, 
-                          t.name as topic_name, td.color_tag, td.sort_order
-                   FROM tree_diagrams td
-                   LEFT JOIN topics t ON td.topic_id = t.id
-                   WHERE td.topic_id = ?
-                   ORDER BY td.sort_order ASC, td.created_at DESC""",
-                (topic_id,)
+                "SELECT name, sql FROM sqlite_master WHERE tbl_name = 'tree_diagrams' "
+                "AND type = 'index' AND sql IS NOT NULL"
             )
+            indexes = cursor.fetchall()
+            cursor.executemany("INSERT OR IGNORE INTO deferred_schema (name, sql) VALUES (?, ?)", indexes)
+            for name, _ in indexes:
+                cursor.execute(f"DROP INDEX {name}")
+        try:
+            yield
+        finally:
+            self._restore_deferred_indexes()
+
+    def _restore_deferred_indexes(self):
+        with self._cursor() as cursor:
+            for _, sql in cursor.execute("SELECT name, sql FROM deferred_schema").fetchall():
+                cursor.execute(sql)
+            cursor.execute("DELETE FROM deferred_schema")
+
+    def _listing_query(self, topic_id: Optional[int] = None, with_body: bool = True) -> Tuple[str, tuple]:
+        """图表列表使用的SQL和参数（也供检查查询计划使用）；with_body为False时不读取content和result"""
+        body_columns = "td.content, td.result" if with_body else "NULL, NULL"
+        sql = f"""SELECT td.id, td.name, {body_columns}, td.created_at, td.updated_at, 
+                        t.name as topic_name, td.color_tag, td.sort_order, td.topic_id
+                 FROM tree_diagrams td
+                 LEFT JOIN topics t ON td.topic_id = t.id"""
+        if topic_id:
+            return sql + """
+                 WHERE td.topic_id = ?
+                 ORDER BY td.sort_order ASC, td.created_at DESC""", (topic_id,)
+        return sql + """
+                 ORDER BY td.sort_order ASC, td.created_at DESC""", ()
+
+    def explain_listing(self, topic_id: Optional[int] = None) -> List[str]:
+        """返回图表列表查询的EXPLAIN QUERY PLAN明细，用于确认查询走了索引"""
+        sql, params = self._listing_query(topic_id)
+        with self._cursor() as cursor:
+            cursor.execute("EXPLAIN QUERY PLAN " + sql, params)
+            return [row[-1] for row in cursor.fetchall()]
+
+    @staticmethod
+    def _diagram_from_row(row, with_body: bool = True) -> Dict:
+        diagram = {
+            'id': row[0],
+            'name': row[1],
+            'created_at': row[4],
+            'updated_at': row[5],
+            'topic_name': row[6] or "未分类",
+            'color_tag': row[7] or '#FFFFFF',
+            'sort_order': row[8] or 0,
+            'topic_id': row[9]
+        }
+        if with_body:
+            diagram['content'] = row[2]
+            diagram['result'] = row[3]
+        return diagram
+    
+    def get_tree_diagrams(self, topic_id: Optional[int] = None) -> List[Dict]:
+        """获取树状图列表（包含输入内容和生成结果）"""
+        with self._cursor(LISTING_COLUMNS) as cursor:
+            cursor.execute(*self._listing_query(topic_id))
+            return [self._overlay(self._diagram_from_row(row)) for row in cursor.fetchall()]
+
+    def get_diagram_summaries(self, topic_id: Optional[int] = None) -> List[Dict]:
+        """获取树状图列表，只含名称、专题、时间等元数据，不读取content和result；
+        需要正文时用get_diagram_body按需读取"""
+        with self._cursor(LISTING_COLUMNS) as cursor:
+            cursor.execute(*self._listing_query(topic_id, with_body=False))
+            return [self._overlay(self._diagram_from_row(row, with_body=False)) for row in cursor.fetchall()]
+
+    def iter_diagrams(self, topic_id: Optional[int] = None, created_from: Optional[str] = None,
+                      created_before: Optional[str] = None, batch_size: int = 500) -> Iterator[Dict]:
+        """按创建时间顺序逐个返回树状图（包含输入内容和生成结果），用于导出
+
+        created_from/created_before与created_at按字符串比较（如"2024-01-01"），前者含、后者不含。
+        在单独的连接上只执行一次查询，用fetchmany分批取行，内存占用与图表总数无关；
+        遍历期间看到的是开始时的同一快照，程序仍可正常读写数据库。
+        """
+        conditions = []
+        params = []
+        if topic_id is not None:
+            conditions.append("td.topic_id = ?")
+            params.append(topic_id)
+        if created_from is not None:
+            conditions.append("td.created_at >= ?")
+            params.append(created_from)
+        if created_before is not None:
+            conditions.append("td.created_at < ?")
+            params.append(created_before)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        # 由(专题, 创建时间, id)或(创建时间, id)索引直接按顺序取出，不需要排序
+        sql = f"""SELECT td.id, td.name, td.content, td.result, td.created_at, td.updated_at,
+                         t.name as topic_name, td.color_tag, td.sort_order, td.topic_id
+                  FROM tree_diagrams td
+                  LEFT JOIN topics t ON td.topic_id = t.id
+                  {where}
+                  ORDER BY td.created_at, td.id"""
+
+        # 先写入排队的修改，导出的内容与界面上看到的一致
+        self.flush()
+        if self.db_path == ":memory:":
+            # 内存数据库无法再开连接，遍历期间占用共享连接
+            with self._lock:
+                yield from self._iter_rows(self._conn, sql, params, batch_size)
+            return
+        conn = sqlite3.connect(self.db_path)
+        try:
+            conn.execute("PRAGMA query_only = ON")
+            yield from self._iter_rows(conn, sql, params, batch_size)
+        finally:
+            conn.close()
+
+    def _iter_rows(self, conn, sql, params, batch_size):
+        cursor = conn.execute(sql, params)
+        try:
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                for row in rows:
+                    yield self._diagram_from_row(row)
+        finally:
+            cursor.close()
+
+    def get_diagram_page(self, topic_id: Optional[int] = None, after: Optional[Dict] = None,
+                         limit: int = PAGE_SIZE, sort_key: Optional[str] = None,
+                         descending: bool = False) -> List[Dict]:
+        """按键集分页读取图表元数据：返回排在after（上一页最后一个图表）之后的至多limit个图表
+
+        sort_key为None时按列表默认顺序；为'created_at'或'topic_name'时按该列排序（descending为降序），
+        同一值内的顺序固定不变，翻页时不会重复或遗漏。不使用OFFSET，翻到第几页耗时都相同。
+        """
+        if sort_key == 'topic_name' and not topic_id:
+            return self._get_page_by_topic(after, limit, descending)
+
+        conditions = ["td.topic_id = ?"] if topic_id else []
+        params = [topic_id] if topic_id else []
+        with self._cursor(LISTING_COLUMNS) as cursor:
+            return self._keyset_page(cursor, self._sort_order(sort_key, descending),
+                                     conditions, params, after, limit)
+
+    @staticmethod
+    def _sort_order(sort_key: Optional[str], descending: bool = False) -> Tuple:
+        if sort_key == 'created_at':
+            direction = 'DESC' if descending else 'ASC'
+            return (('td.created_at', 'created_at', direction), ('td.id', 'id', direction))
+        # 按专题排序时同一专题内沿用默认顺序
+        return LISTING_ORDER
+
+    def _get_page_by_topic(self, after: Optional[Dict], limit: int, descending: bool) -> List[Dict]:
+        """按专题名称排序的分页：专题按名称依次处理，每个专题内用(topic_id, ...)索引分页，
+        不需要对整张表按连接出来的专题名称排序"""
+        groups = [(topic['name'], topic['id']) for topic in self.get_topics()] + [("未分类", None)]
+        groups.sort(key=lambda group: group[0], reverse=descending)
+        topic_ids = [topic_id for _, topic_id in groups]
+
+        start = 0
+        if after is not None:
+            start = topic_ids.index(after['topic_id']) if after['topic_id'] in topic_ids else len(topic_ids)
+
+        diagrams = []
+        with self._cursor(LISTING_COLUMNS) as cursor:
+            for position in range(start, len(topic_ids)):
+                if len(diagrams) >= limit:
+                    break
+                topic_id = topic_ids[position]
+                if topic_id is None:
+                    conditions, params = ["td.topic_id IS NULL"], []
+                else:
+                    conditions, params = ["td.topic_id = ?"], [topic_id]
+                group_after = after if position == start else None
+                diagrams.extend(self._keyset_page(cursor, LISTING_ORDER, conditions, params,
+                                                  group_after, limit - len(diagrams)))
+        return diagrams
+
+    def _keyset_page(self, cursor, order: Tuple, base_conditions: List[str], base_params: List,
+                     after: Optional[Dict], limit: int) -> List[Dict]:
+        """按order（(列, 键, 方向)序列，最后一项须唯一）读取after之后的至多limit行
+
+        排序键方向可能不一致，无法用一个行值比较表示，因此按"前k个键相等、第k+1个键更靠后"
+        拆成几段依次查询，每段都是一次索引范围扫描。
+        """
+        columns = f"""SELECT {SUMMARY_COLUMNS}
+                      FROM tree_diagrams td
+                      LEFT JOIN topics t ON td.topic_id = t.id"""
+        order_by = ", ".join(f"{column} {direction}" for column, _, direction in order)
+
+        if after is None:
+            segments = [([], [])]
         else:
+            segments = []
+            for depth in reversed(range(len(order))):
+                conditions = [f"{column} = ?" for column, _, _ in order[:depth]]
+                params = [after[key] for _, key, _ in order[:depth]]
+                column, key, direction = order[depth]
+                conditions.append(f"{column} {'>' if direction == 'ASC' else '<'} ?")
+                params.append(after[key])
+                segments.append((conditions, params))
+
+        diagrams = []
+        for conditions, params in segments:
+            if len(diagrams) >= limit:
+                break
+            where = " AND ".join(base_conditions + conditions)
             cursor.execute(
-                """SELECT td.id, td.name, td.content, td.result, td.created_at, td.updated_at, 
-                          t.name as topic_name, td.color_tag, td.sort_order
-                   FROM tree_diagrams td
-                   LEFT JOIN topics t ON td.topic_id = t.id
-                   ORDER BY td.sort_order ASC, td.created_at DESC"""
+                f"{columns} {'WHERE ' + where if where else ''} ORDER BY {order_by} LIMIT ?",
+                base_params + params + [limit - len(diagrams)]
             )
-        
-        diagrams = []
-        for row in cursor.fetchall():
-            diagrams.append({
-                'id': row[0],
-                'name': row[1],
-                'content': row[2],
-                'result': row[3],
-                'created_at': row[4],
-                'updated_at': row[5],
-                'topic_name': row[6] or "未分类",
-                'color_tag': row[7] or '#FFFFFF',
-                'sort_order': row[8] or 0
-            })
-        
-        conn.close()
+            diagrams.extend(self._overlay(self._diagram_from_row(row, with_body=False))
+                            for row in cursor.fetchall())
+        return diagrams
+
+    def search_diagrams(self, query: str, topic_id: Optional[int] = None, limit: int = PAGE_SIZE,
+                        offset: int = 0, highlight: Tuple[str, str] = ('【', '】'),
+                        sort_key: Optional[str] = None, descending: bool = False) -> List[Dict]:
+        """全文检索图表名称、大纲和生成结果，分页返回图表元数据
+
+        空格分隔的多个词须同时出现。每个结果带有'snippet'：匹配最好的一段文字，命中处用highlight标出。
+        不少于3个字的词使用三元组全文索引，按BM25相关度排序；一两个字的词使用短词索引，
+        只含短词时按新建在前的顺序返回（短词索引不保存正文，只匹配其中的文字和数字，标点忽略）。
+        sort_key不为None时改按该列排序（同get_diagram_page）。
+        """
+        long_terms = [term for term in query.split() if len(term) >= SEARCH_MIN_TERM_LENGTH]
+        short_terms = [piece for term in query.split() if len(term) < SEARCH_MIN_TERM_LENGTH
+                       for piece in WORD_RUN.findall(term)]
+        if not long_terms and not short_terms:
+            return []
+        # 每个短词作为短语（一个字时按前缀）匹配短词索引中的项
+        gram_match = " ".join(f'"{term}"' if len(term) == 2 else f'"{term}" *' for term in short_terms)
+        topic_condition = " AND td.topic_id = ?" if topic_id else ""
+        topic_params = [topic_id] if topic_id else []
+        listing_order = ", ".join(f"{column} {direction}" for column, _, direction in LISTING_ORDER)
+        if sort_key is None:
+            order_by = None
+        elif sort_key == 'topic_name':
+            order_by = f"COALESCE(t.name, '未分类') {'DESC' if descending else 'ASC'}, {listing_order}"
+        else:
+            order_by = ", ".join(f"{column} {direction}"
+                                 for column, _, direction in self._sort_order(sort_key, descending))
+
+        with self._cursor(SEARCH_COLUMNS) as cursor:
+            if short_terms:
+                # 其他程序直接写入tree_diagrams时只记下了变化，检索前补上
+                self._refresh_grams(cursor)
+            if long_terms:
+                # 每个词加引号作为短语，避免用户输入被当作FTS5查询语法
+                match = " ".join('"' + term.replace('"', '""') + '"' for term in long_terms)
+                gram_condition = ""
+                gram_params = []
+                if short_terms:
+                    gram_condition = " AND td.id IN (SELECT rowid FROM diagram_grams WHERE diagram_grams MATCH ?)"
+                    gram_params = [gram_match]
+                cursor.execute(
+                    f"""SELECT {SUMMARY_COLUMNS}, snippet(diagram_search, -1, ?, ?, '…', 16)
+                        FROM diagram_search
+                        JOIN tree_diagrams td ON td.id = diagram_search.rowid
+                        LEFT JOIN topics t ON td.topic_id = t.id
+                        WHERE diagram_search MATCH ?{gram_condition}{topic_condition}
+                        ORDER BY {order_by or "diagram_search.rank"}
+                        LIMIT ? OFFSET ?""",
+                    [highlight[0], highlight[1], match] + gram_params + topic_params + [limit, offset]
+                )
+                rows = [(row, row[-1]) for row in cursor.fetchall()]
+            else:
+                # 按索引的rowid倒序逐个取出，凑够一页即停止，不需要先找出全部匹配再排序
+                cursor.execute(
+                    f"""SELECT {SUMMARY_COLUMNS}, td.name, td.content, td.result
+                        FROM diagram_grams
+                        JOIN tree_diagrams td ON td.id = diagram_grams.rowid
+                        LEFT JOIN topics t ON td.topic_id = t.id
+                        WHERE diagram_grams MATCH ?{topic_condition}
+                        ORDER BY {order_by or "diagram_grams.rowid DESC"}
+                        LIMIT ? OFFSET ?""",
+                    [gram_match] + topic_params + [limit, offset]
+                )
+                rows = [(row, self._make_snippet(row[-3:], short_terms, highlight)) for row in cursor.fetchall()]
+
+            diagrams = []
+            for row, snippet in rows:
+                diagram = self._overlay(self._diagram_from_row(row, with_body=False))
+                diagram['snippet'] = snippet
+                diagrams.append(diagram)
         return diagrams
+
+    @staticmethod
+    def _make_snippet(texts, terms, highlight, width: int = 16) -> str:
+        """逐行匹配时生成与FTS5 snippet()类似的摘要：取第一处命中前后的文字并标出命中处"""
+        pattern = re.compile("|".join(re.escape(term) for term in terms), re.IGNORECASE)
+        for text in texts:
+            match = pattern.search(text or "")
+            if match is None:
+                continue
+            start = max(0, match.start() - width // 2)
+            end = min(len(text), max(match.end(), start + width))
+            body = pattern.sub(lambda m: highlight[0] + m.group(0) + highlight[1], text[start:end])
+            return ("…" if start > 0 else "") + body + ("…" if end < len(text) else "")
+        return ""
+
+    def get_diagram_body(self, diagram_id: int) -> Optional[Dict]:
+        """读取单个树状图的输入内容和生成结果，不存在时返回None"""
+        with self._cursor(()) as cursor:
+            cursor.execute("SELECT content, result FROM tree_diagrams WHERE id = ?", (diagram_id,))
+            row = cursor.fetchone()
+            if row is None:
+                return None
+            # 预览中翻页时先自动保存再读取下一个，读取不会让排队的修改提前写入
+            body = {'content': row[0], 'result': row[1]}
+            for column in body:
+                body[column] = self._pending.get(diagram_id, {}).get(column, body[column])
+        return body
     
     def delete_tree_diagram(self, diagram_id: int) -> bool:
         """删除树状图"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute("DELETE FROM tree_diagrams WHERE id = ?", (diagram_id,))
-        deleted = cursor.rowcount > 0
-        conn.commit()
-        conn.close()
-        return deleted
+        with self._cursor() as cursor:
+            cursor.execute("DELETE FROM tree_diagrams WHERE id = ?", (diagram_id,))
+            return cursor.rowcount > 0
     
     def update_tree_diagram(self, diagram_id: int, name: str, content: str, result: str) -> bool:
         """更新树状图"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute(
-            "UPDATE tree_diagrams SET name = ?, content = ?, result = ?, updated_at = CURRENT_TIMESTAMP WHERE id = ?",
-            (name, content, result, diagram_id)
-        )
-        updated = cursor.rowcount > 0
-        conn.commit()
-        conn.close()
-        return updated
+        if self.write_behind:
+            return self._defer(diagram_id, name=name, content=content, result=result,
+                               updated_at=self._timestamp())
+        with self._cursor() as cursor:
+            cursor.execute(
+                "UPDATE tree_diagrams SET name = ?, content = ?, result = ?, updated_at = CURRENT_TIMESTAMP WHERE id = ?",
+                (name, content, result, diagram_id)
+            )
+            return cursor.rowcount > 0
     
     def update_diagram_color(self, diagram_id: int, color_tag: str) -> bool:
         """更新树状图颜色标记"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute(
-            "UPDATE tree_diagrams SET color_tag = ? WHERE id = ?",
-            (color_tag, diagram_id)
-        )
-        updated = cursor.rowcount > 0
-        conn.commit()
-        conn.close()
-        return updated
+        if self.write_behind:
+            return self._defer(diagram_id, color_tag=color_tag)
+        with self._cursor() as cursor:
+            cursor.execute(
+                "UPDATE tree_diagrams SET color_tag = ? WHERE id = ?",
+                (color_tag, diagram_id)
+            )
+            return cursor.rowcount > 0
     
     def update_diagram_sort_order(self, diagram_id: int, sort_order: int) -> bool:
         """更新树状图排序"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute(
-            "UPDATE tree_diagrams SET sort_order = ? WHERE id = ?",
-            (sort_order, diagram_id)
-        )
-        updated = cursor.rowcount > 0
-        conn.commit()
-        conn.close()
-        return updated
+        if self.write_behind:
+            return self._defer(diagram_id, sort_order=sort_order)
+        with self._cursor() as cursor:
+            cursor.execute(
+                "UPDATE tree_diagrams SET sort_order = ? WHERE id = ?",
+                (sort_order, diagram_id)
+            )
+            return cursor.rowcount > 0
     
     def batch_update_sort_orders(self, diagram_orders: List[Tuple[int, int]]) -> bool:
         """批量更新树状图排序"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
+        if self.write_behind:
+            for diagram_id, order in diagram_orders:
+                self._defer(diagram_id, sort_order=order)
+            return True
         try:
-            cursor.executemany(
-                "UPDATE tree_diagrams SET sort_order = ? WHERE id = ?",
-                [(order, diagram_id) for diagram_id, order in diagram_orders]
-            )
-            conn.commit()
+            with self._cursor() as cursor:
+                cursor.executemany(
+                    "UPDATE tree_diagrams SET sort_order = ? WHERE id = ?",
+                    [(order, diagram_id) for diagram_id, order in diagram_orders]
+                )
             return True
         except Exception:
-            conn.rollback()
             return False
-        finally:
-            conn.close()
     
     def update_diagram_content(self, diagram_id: int, content: str, result: str) -> bool:
         """更新图表内容和结果"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute(
-            "UPDATE tree_diagrams SET content = ?, result = ?, updated_at = CURRENT_TIMESTAMP WHERE id = ?",
-            (content, result, diagram_id)
-        )
-        updated = cursor.rowcount > 0
-        conn.commit()
-        conn.close()
-        return updated
+        if self.write_behind:
+            return self._defer(diagram_id, content=content, result=result, updated_at=self._timestamp())
+        with self._cursor() as cursor:
+            cursor.execute(
+                "UPDATE tree_diagrams SET content = ?, result = ?, updated_at = CURRENT_TIMESTAMP WHERE id = ?",
+                (content, result, diagram_id)
+            )
+            return cursor.rowcount > 0
     
     def update_diagram_name(self, diagram_id: int, name: str) -> bool:
         """更新图表名称"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute(
-            "UPDATE tree_diagrams SET name = ?, updated_at = CURRENT_TIMESTAMP WHERE id = ?",
-            (name, diagram_id)
-        )
-        updated = cursor.rowcount > 0
-        conn.commit()
-        conn.close()
-        return updated
+        if self.write_behind:
+            return self._defer(diagram_id, name=name, updated_at=self._timestamp())
+        with self._cursor() as cursor:
+            cursor.execute(
+                "UPDATE tree_diagrams SET name = ?, updated_at = CURRENT_TIMESTAMP WHERE id = ?",
+                (name, diagram_id)
+            )
+            return cursor.rowcount > 0
     
     def update_diagram_topic(self, diagram_id: int, topic_id: Optional[int]) -> bool:
         """更新图表专题"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute(
-            "UPDATE tree_diagrams SET topic_id = ?, updated_at = CURRENT_TIMESTAMP WHERE id = ?",
-            (topic_id, diagram_id)
-        )
-        updated = cursor.rowcount > 0
-        conn.commit()
-        conn.close()
-        return updated
+        if self.write_behind:
+            return self._defer(diagram_id, topic_id=topic_id, updated_at=self._timestamp())
+        with self._cursor() as cursor:
+            cursor.execute(
+                "UPDATE tree_diagrams SET topic_id = ?, updated_at = CURRENT_TIMESTAMP WHERE id = ?",
+                (topic_id, diagram_id)
+            )
+            return cursor.rowcount > 0
     
     def delete_diagram(self, diagram_id: int) -> bool:
         """删除图表（别名方法）"""
@@ -315,24 +1035,16 @@ class DatabaseManager:
     
     def delete_topic(self, topic_id: int) -> bool:
         """删除专题"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
         try:
-            # 首先将该专题下的所有图表的topic_id设为NULL（移动到未分类）
-            cursor.execute(
-                "UPDATE tree_diagrams SET topic_id = NULL WHERE topic_id = ?",
-                (topic_id,)
-            )
-            
-            # 删除专题
-            cursor.execute("DELETE FROM topics WHERE id = ?", (topic_id,))
-            deleted = cursor.rowcount > 0
-            
-            conn.commit()
-            return deleted
+            with self._cursor() as cursor:
+                # 首先将该专题下的所有图表的topic_id设为NULL（移动到未分类）
+                cursor.execute(
+                    "UPDATE tree_diagrams SET topic_id = NULL WHERE topic_id = ?",
+                    (topic_id,)
+                )
+                
+                # 删除专题
+                cursor.execute("DELETE FROM topics WHERE id = ?", (topic_id,))
+                return cursor.rowcount > 0
         except Exception:
-            conn.rollback()
-            return False
-        finally:
-            conn.close()
\ No newline at end of file
+            return False
\ No newline at end of file
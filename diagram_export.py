@@ -0,0 +1,117 @@
+# -*- coding: utf-8 -*-
+"""
+图表库导出 - 把数据库中的树枝图逐个导出为JSON Lines、每图一个Markdown文件或ZIP压缩包
+逐行读取、逐个写出，内存占用与图表数量无关；不依赖PyQt5
+"""
+
+import json
+import os
+import re
+import sys
+import zipfile
+from typing import Dict, Iterable, Optional, TextIO
+
+from database import DatabaseManager
+
+FORMAT_JSONL = "jsonl"
+FORMAT_MARKDOWN = "markdown"
+FORMAT_ZIP = "zip"
+FORMATS = (FORMAT_JSONL, FORMAT_MARKDOWN, FORMAT_ZIP)
+
+# 文件名中不允许出现的字符（按Windows的限制）
+UNSAFE_FILENAME_CHARS = re.compile(r'[\\/:*?"<>|\x00-\x1f]')
+
+
+def diagram_record(diagram: Dict) -> Dict:
+    """导出的字段（JSON Lines每行一个）"""
+    return {
+        'id': diagram['id'],
+        'name': diagram['name'],
+        'topic': diagram['topic_name'],
+        'content': diagram['content'],
+        'result': diagram['result'],
+        'color_tag': diagram['color_tag'],
+        'sort_order': diagram['sort_order'],
+        'created_at': diagram['created_at'],
+        'updated_at': diagram['updated_at'],
+    }
+
+
+def safe_filename(name: str, max_length: int = 80) -> str:
+    name = UNSAFE_FILENAME_CHARS.sub("_", name).strip(" .")
+    return name[:max_length] or "未命名"
+
+
+def markdown_path(diagram: Dict) -> str:
+    """图表在导出目录或压缩包中的相对路径：专题/编号_名称.md（编号保证不重名）"""
+    filename = f"{diagram['id']:06d}_{safe_filename(diagram['name'])}.md"
+    return f"{safe_filename(diagram['topic_name'])}/{filename}"
+
+
+def _fenced(text: str) -> str:
+    # 围栏比正文中最长的连续反引号多一个，正文原样保留
+    longest = max((len(run) for run in re.findall(r"`+", text)), default=0)
+    fence = "`" * max(3, longest + 1)
+    body = text.rstrip("\n")
+    return f"{fence}text\n{body}\n{fence}"
+
+
+def diagram_markdown(diagram: Dict) -> str:
+    return (
+        f"# {diagram['name']}\n\n"
+        f"- 专题：{diagram['topic_name']}\n"
+        f"- 创建时间：{diagram['created_at']}\n"
+        f"- 更新时间：{diagram['updated_at']}\n\n"
+        f"## 内容\n\n{_fenced(diagram['content'])}\n\n"
+        f"## 义脉树枝图\n\n{_fenced(diagram['result'])}\n"
+    )
+
+
+def write_jsonl(diagrams: Iterable[Dict], output: TextIO) -> int:
+    """逐行写出JSON Lines，返回导出的图表数"""
+    count = 0
+    for diagram in diagrams:
+        output.write(json.dumps(diagram_record(diagram), ensure_ascii=False) + "\n")
+        count += 1
+    return count
+
+
+def write_markdown_files(diagrams: Iterable[Dict], directory: str) -> int:
+    """每个图表写一个Markdown文件，按专题分子目录，返回导出的图表数"""
+    count = 0
+    for diagram in diagrams:
+        path = os.path.join(directory, *markdown_path(diagram).split("/"))
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(diagram_markdown(diagram))
+        count += 1
+    return count
+
+
+def write_zip(diagrams: Iterable[Dict], path: str) -> int:
+    """把每个图表的Markdown文件逐个压缩写入ZIP（目录结构与write_markdown_files相同）"""
+    count = 0
+    with zipfile.ZipFile(path, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+        for diagram in diagrams:
+            archive.writestr(markdown_path(diagram), diagram_markdown(diagram))
+            count += 1
+    return count
+
+
+def export_diagrams(db: DatabaseManager, output: str, fmt: str = FORMAT_JSONL,
+                    topic_id: Optional[int] = None, created_from: Optional[str] = None,
+                    created_before: Optional[str] = None) -> int:
+    """按专题和创建时间筛选后导出到output（jsonl为文件，'-'表示标准输出；
+    markdown为目录；zip为压缩包文件），返回导出的图表数"""
+    if fmt not in FORMATS:
+        raise ValueError(f"不支持的导出格式：{fmt}，可选：{', '.join(FORMATS)}")
+
+    diagrams = db.iter_diagrams(topic_id, created_from, created_before)
+    if fmt == FORMAT_MARKDOWN:
+        return write_markdown_files(diagrams, output)
+    if fmt == FORMAT_ZIP:
+        return write_zip(diagrams, output)
+    if output == '-':
+        return write_jsonl(diagrams, sys.stdout)
+    with open(output, 'w', encoding='utf-8') as f:
+        return write_jsonl(diagrams, f)
@@ -0,0 +1,149 @@
+# -*- coding: utf-8 -*-
+"""
+渲染结果缓存 - 以输入内容的哈希为键的LRU缓存，可选持久化到本地SQLite文件
+重新打开已保存的图表、切换主题、撤销重做时，相同输入无需重新生成
+"""
+
+import hashlib
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Optional
+
+from tree_engine import render, split_lines
+
+# 计入缓存键的版本号：tree_engine的输出（排版、字符、格式）有任何变化时加1，
+# 磁盘上按旧版本生成的结果不再命中，之后按最久未用逐渐淘汰
+CACHE_VERSION = 1
+
+
+class RenderCache:
+    def __init__(self, max_entries: int = 256, max_bytes: int = 64 * 1024 * 1024,
+                 db_path: Optional[str] = None, max_disk_entries: int = 10000):
+        """max_entries/max_bytes限制内存中的条目数和结果总字节数；
+        db_path不为None时同时持久化到该SQLite文件，最多保留max_disk_entries条"""
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.max_disk_entries = max_disk_entries
+        self._entries = OrderedDict()     # 键 -> (结果, 字节数)
+        self._bytes = 0
+        # 缓存可能在后台渲染线程中使用
+        self._lock = threading.RLock()
+
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+        self._conn = None
+        if db_path is not None:
+            self._conn = sqlite3.connect(db_path, check_same_thread=False)
+            self._conn.execute('''
+                CREATE TABLE IF NOT EXISTS render_cache (
+                    key TEXT PRIMARY KEY,
+                    result TEXT NOT NULL,
+                    last_used REAL NOT NULL
+                )
+            ''')
+            # 淘汰时按最久未用的顺序删除
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_render_cache_last_used ON render_cache (last_used)"
+            )
+            self._conn.commit()
+            # 磁盘条目数的上限估计：每次写入加1（替换已有的键也算），超过上限时才实际计数并淘汰
+            self._disk_entries = self._conn.execute("SELECT COUNT(*) FROM render_cache").fetchone()[0]
+
+    @staticmethod
+    def make_key(text: str) -> str:
+        """按与render相同的方式规整输入（忽略空行）后，连同CACHE_VERSION取SHA-256"""
+        normalized = "\n".join(split_lines(text))
+        return hashlib.sha256(f"{CACHE_VERSION}\n{normalized}".encode('utf-8')).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+
+            if self._conn is not None:
+                row = self._conn.execute("SELECT result FROM render_cache WHERE key = ?", (key,)).fetchone()
+                if row is not None:
+                    self._conn.execute("UPDATE render_cache SET last_used = ? WHERE key = ?", (time.time(), key))
+                    self._conn.commit()
+                    self._remember(key, row[0])
+                    self.disk_hits += 1
+                    return row[0]
+
+            self.misses += 1
+            return None
+
+    def put(self, key: str, result: str):
+        with self._lock:
+            self._remember(key, result)
+            if self._conn is not None:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO render_cache (key, result, last_used) VALUES (?, ?, ?)",
+                    (key, result, time.time())
+                )
+                self._disk_entries += 1
+                if self._disk_entries > self.max_disk_entries:
+                    self._prune_disk()
+                self._conn.commit()
+
+    def render(self, text: str, render_func: Callable[[str], str] = render) -> str:
+        """命中缓存直接返回，否则调用render_func生成并缓存（出错时不缓存）"""
+        key = self.make_key(text)
+        result = self.get(key)
+        if result is None:
+            result = render_func(text)
+            self.put(key, result)
+        return result
+
+    def stats_text(self) -> str:
+        """供状态栏显示的命中统计"""
+        return f"缓存命中 {self.hits + self.disk_hits} 次（其中磁盘 {self.disk_hits} 次），未命中 {self.misses} 次"
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+            if self._conn is not None:
+                self._conn.execute("DELETE FROM render_cache")
+                self._conn.commit()
+                self._disk_entries = 0
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def _remember(self, key, result):
+        """放入内存LRU，超出条目数或字节数时淘汰最久未用的条目"""
+        size = len(result.encode('utf-8'))
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self._bytes -= old[1]
+        if size > self.max_bytes:
+            return
+
+        self._entries[key] = (result, size)
+        self._bytes += size
+        while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+            _, (_, evicted_size) = self._entries.popitem(last=False)
+            self._bytes -= evicted_size
+
+    def _prune_disk(self):
+        """超出上限时删到上限的九成，之后约十分之一上限次写入内都不必再淘汰"""
+        count = self._conn.execute("SELECT COUNT(*) FROM render_cache").fetchone()[0]
+        if count > self.max_disk_entries:
+            keep = self.max_disk_entries - self.max_disk_entries // 10
+            self._conn.execute(
+                "DELETE FROM render_cache WHERE key IN "
+                "(SELECT key FROM render_cache ORDER BY last_used ASC LIMIT ?)",
+                (count - keep,)
+            )
+            count = keep
+        self._disk_entries = count
@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+"""DatabaseManager：图表列表的查询计划（应直接按索引顺序读取，不额外排序），
+以及其他程序直接写入数据库后检索仍然正确"""
+
+import os
+import sqlite3
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import DatabaseManager
+
+
+@pytest.fixture
+def db(tmp_path):
+    manager = DatabaseManager(str(tmp_path / "ymtree.db"))
+    topic_id = manager.create_topic("专题")
+    for i in range(20):
+        manager.save_tree_diagram(f"图表{i}", topic_id if i % 2 else None, "根\n-枝\n-叶", "根─枝")
+    yield manager
+    manager.close()
+
+
+def test_listing_uses_page_index(db):
+    plan = db.explain_listing()
+    assert any("idx_tree_diagrams_page" in detail for detail in plan), plan
+    assert not any("TEMP B-TREE" in detail for detail in plan), plan
+
+
+def test_topic_listing_uses_topic_page_index(db):
+    topic_id = db.get_topics()[0]['id']
+    plan = db.explain_listing(topic_id)
+    assert any("idx_tree_diagrams_topic_page" in detail for detail in plan), plan
+    assert not any("TEMP B-TREE" in detail for detail in plan), plan
+
+
+def page_plans(db, **kwargs):
+    """读取两页（第二页从第一页末尾接着读），返回其间每条图表查询的EXPLAIN QUERY PLAN明细"""
+    statements = []
+    db._conn.set_trace_callback(statements.append)
+    try:
+        first = db.get_diagram_page(limit=5, **kwargs)
+        db.get_diagram_page(after=first[-1], limit=5, **kwargs)
+    finally:
+        db._conn.set_trace_callback(None)
+    queries = [sql for sql in statements if sql.lstrip().startswith("SELECT") and "tree_diagrams" in sql]
+    assert queries
+    return [[row[-1] for row in db._conn.execute("EXPLAIN QUERY PLAN " + sql)] for sql in queries]
+
+
+@pytest.mark.parametrize("sort_key, descending, by_topic, index", [
+    (None, False, False, "idx_tree_diagrams_page"),
+    (None, False, True, "idx_tree_diagrams_topic_page"),
+    ("created_at", False, False, "idx_tree_diagrams_created"),
+    ("created_at", True, False, "idx_tree_diagrams_created"),
+    ("created_at", False, True, "idx_tree_diagrams_topic_created"),
+    ("created_at", True, True, "idx_tree_diagrams_topic_created"),
+    ("topic_name", False, False, "idx_tree_diagrams_topic_page"),
+    ("topic_name", True, False, "idx_tree_diagrams_topic_page"),
+])
+def test_page_queries_use_index(db, sort_key, descending, by_topic, index):
+    """界面分页读取的每条键集查询（包括按专题名称逐个专题分页）都按索引范围扫描，不额外排序"""
+    topic_id = db.get_topics()[0]['id'] if by_topic else None
+    for plan in page_plans(db, topic_id=topic_id, sort_key=sort_key, descending=descending):
+        assert any(index in detail for detail in plan), plan
+        assert not any("TEMP B-TREE" in detail for detail in plan), plan
+
+
+def test_search_after_writes_from_plain_connection(db):
+    """不经DatabaseManager、用普通连接增删改图表（如sqlite3命令行、备份脚本）不会出错，
+    之后一两个字和多字的检索都反映这些修改"""
+    conn = sqlite3.connect(db.db_path)
+    with conn:
+        new_id = conn.execute(
+            "INSERT INTO tree_diagrams (name, content, result) VALUES ('外部', '乾坤\n-甲\n-乙', '乾坤')"
+        ).lastrowid
+        conn.execute("UPDATE tree_diagrams SET content = '日月星辰', result = '日月星辰' WHERE name = '图表1'")
+        conn.execute("DELETE FROM tree_diagrams WHERE name = '图表2'")
+    conn.close()
+
+    def names(query):
+        return sorted(diagram['name'] for diagram in db.search_diagrams(query, limit=100))
+
+    assert names("乾坤") == ["外部"]
+    assert names("乾") == ["外部"]
+    assert names("星辰") == ["图表1"]
+    assert names("日月星") == ["图表1"]
+    assert names("枝") == sorted(f"图表{i}" for i in range(20) if i not in (1, 2))
+    assert new_id not in {diagram['id'] for diagram in db.search_diagrams("枝", limit=100)}
+
+
+def test_edits_during_deferred_indexes_stay_searchable(db):
+    """批量导入暂缓索引期间界面上的修改和删除照常同步到检索索引"""
+    first, second = [diagram['id'] for diagram in db.get_diagram_summaries()[:2]]
+    with db.deferred_indexes():
+        db.insert_diagrams([("导入", None, "新大纲\n-甲\n-乙", "新大纲")])
+        db.update_diagram_name(first, "改名之后")
+        db.delete_tree_diagram(second)
+
+    assert [d['id'] for d in db.search_diagrams("改名之后")] == [first]
+    assert [d['name'] for d in db.search_diagrams("新大纲")] == ["导入"]
+    assert second not in {d['id'] for d in db.search_diagrams("枝", limit=100)}
+    assert db.search_diagrams("改名") and db.search_diagrams("名")
@@ -275,7 +275,7 @@ def get_vintage_paper_theme(font_size=13):
     }}
     
     /* 表格 */
-    QTableWidget {{
+    QTableView {{
         background-color: #fefcf8;
         border: 2px solid #d4c4a8;
         border-radius: 8px;
@@ -286,18 +286,18 @@ def get_vintage_paper_theme(font_size=13):
         color: #3c2e26;
     }}
     
-    QTableWidget::item {{
+    QTableView::item {{
         background-color: #fefcf8;
         color: #3c2e26;
         padding: 8px;
         border: none;
     }}
     
-    QTableWidget::item:alternate {{
+    QTableView::item:alternate {{
         background-color: #fefcf8;
     }}
     
-    QTableWidget::item:selected {{
+    QTableView::item:selected {{
         background-color: #deb887;
         color: #3c2e26;
     }}
@@ -312,11 +312,11 @@ def get_vintage_paper_theme(font_size=13):
         font-size: {font_size + 2}px;
     }}
     
-    QTableWidget::item:hover:first-child {{
+    QTableView::item:hover:first-child {{
         background-color: inherit !important;
     }}
     
-    QTableWidget::item:selected:first-child {{
+    QTableView::item:selected:first-child {{
         background-color: inherit !important;
     }}
     
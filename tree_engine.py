@@ -0,0 +1,714 @@
+# -*- coding: utf-8 -*-
+"""
+义脉树枝图引擎 - 与界面无关的解析与绘制模块
+不依赖PyQt5，可在无界面环境中批量使用
+"""
+
+import os
+import re
+from array import array
+from bisect import bisect_right
+from functools import lru_cache
+from typing import Callable, Iterable, Iterator, List, Optional, TextIO, Tuple
+
+
+# 行首用于表示层级的符号
+LEVEL_CHARS = "#-_$@*%"
+LEVEL_PREFIX = re.compile('[' + re.escape(LEVEL_CHARS) + ']*')
+
+
+# 半角可见ASCII字符（! 到 ~）与对应全角字符（！ 到 ～）相差固定偏移0xFEE0，空格保持不变
+FULLWIDTH_TABLE = str.maketrans({code: code + 0xFEE0 for code in range(0x21, 0x7F)})
+
+
+@lru_cache(maxsize=65536)
+def convert_to_fullwidth(text: str) -> str:
+    """将半角字符转换为全角字符，确保对齐（重复的标签直接命中缓存）"""
+    return text.translate(FULLWIDTH_TABLE)
+
+
+class TreeParseError(Exception):
+    """义脉树枝图解析失败"""
+    pass
+
+
+class RenderCancelled(Exception):
+    """渲染被取消（已有更新的输入需要渲染）"""
+    pass
+
+
+# 以下三个函数是布局和绘制规则本身（与C#版本一致），
+# TextTreeNode（对象存储）和CompactTree（数组存储）只负责遍历各自的结构并调用它们
+
+def _is_one_line(child_count, first_child_one_line):
+    """叶子，或只有一个子节点且该子节点也是单行的子树，整棵子树位于同一行"""
+    return child_count == 0 or (child_count == 1 and first_child_one_line)
+
+
+def _one_line_row(row, second_of_two):
+    """单行子树的起始行：父节点恰有两个子节点时，第二个与第一个之间空一行。
+    返回(起始行, 下一个可用行)"""
+    if second_of_two:
+        row += 1
+    return row, row + 1
+
+
+def _draw_node(grid, text, node_row, child_rows, min_row, max_row):
+    """把一个有子节点的节点在各行的片段（标签或空白加连接线）追加到grid
+
+    node_row为节点所在行，child_rows为各子节点的起始行（递增），
+    min_row/max_row为子树的最小/最大起始行，均已换算为grid中的下标。
+    """
+    blank = '　' * len(text)
+    padding = blank + '　'
+    first_row = child_rows[0]
+
+    # 在第一个子节点之前
+    for i in range(min_row, first_row):
+        grid[i].append(padding)
+
+    # 在子节点范围内：子节点起始行递增，顺序合并即可得到行与子节点的对应
+    last_index = len(child_rows) - 1
+    prev_row = first_row - 1
+    for j, child_row in enumerate(child_rows):
+        for i in range(prev_row + 1, child_row):
+            grid[i].append(text + "┤" if node_row == i else blank + "│")
+
+        if j == 0 and node_row == child_row and last_index == 0:
+            line_str = text + "─"
+        elif j == 0:
+            line_str = blank + "┌"
+        elif j == last_index:
+            line_str = blank + "└"
+        elif node_row == child_row:
+            line_str = text + "┼"
+        else:
+            line_str = blank + "├"
+        grid[child_row].append(line_str)
+        prev_row = child_row
+
+    # 在最后一个子节点之后
+    for i in range(child_rows[-1] + 1, max_row + 1):
+        grid[i].append(padding)
+
+
+class TextTreeNode:
+    __slots__ = ('text', 'parent', 'children', 'start_row', 'start_column', 'depth',
+                 'width', 'is_one_line', 'min_child_start_row', 'max_child_start_row', 'shape_id')
+
+    def __init__(self, text, parent=None):
+        self.text = self._convert_to_fullwidth(text)
+        self.parent = parent
+        self.children = []
+        self.start_row = 0
+        self.start_column = 0
+        self.depth = 0 if parent is None else parent.depth + 1
+
+        # 布局指标，由compute()一次性计算并缓存
+        self.width = 1
+        self.is_one_line = True
+        self.min_child_start_row = 0
+        self.max_child_start_row = 0
+        # 子树结构编号，仅在使用SubtreeMemo时计算：标签与结构都相同的子树编号相同
+        self.shape_id = -1
+
+        if parent is not None:
+            parent.add_child(self)
+
+    def _convert_to_fullwidth(self, text):
+        """将半角字符转换为全角字符，确保对齐"""
+        return convert_to_fullwidth(text)
+
+    def add_child(self, child):
+        self.children.append(child)
+
+    def iter_preorder(self):
+        """先序遍历子树（显式栈，子节点按原顺序输出）"""
+        stack = [self]
+        while stack:
+            node = stack.pop()
+            yield node
+            stack.extend(reversed(node.children))
+
+    def compute_shape(self, memo=None):
+        """自底向上一次性计算width和is_one_line（逆先序即为后序），
+        传入memo时同时为每个子树分配结构编号"""
+        for node in reversed(list(self.iter_preorder())):
+            children = node.children
+            if not children:
+                node.width = 1
+                node.is_one_line = True
+            else:
+                child_sum = sum(child.width for child in children)
+                node.width = 3 if child_sum == 2 else child_sum
+                node.is_one_line = _is_one_line(len(children), children[0].is_one_line)
+            if memo is not None:
+                node.shape_id = memo.shape_id(node.text, tuple(child.shape_id for child in children))
+
+    def compute_start_row(self, row_ref, memo=None):
+        """计算起始行位置，同时记录子树的最小/最大起始行（显式栈，不受递归深度限制）
+
+        传入memo时，已布局过的相同子树直接按相对位置平移，不再进入其内部；
+        这些子树内部节点的位置不会被计算，绘制时由memo中的整块结果代替。
+        """
+        # 栈中元素为(节点, 进入该子树时的行号；None表示尚未处理子节点)
+        stack = [(self, None)]
+        while stack:
+            node, entry_row = stack.pop()
+            children = node.children
+
+            if entry_row is not None:
+                node.start_row = (children[0].start_row + children[-1].start_row) // 2
+                node.min_child_start_row = children[0].min_child_start_row
+                node.max_child_start_row = children[-1].max_child_start_row
+                if memo is not None:
+                    memo.record_layout(node, entry_row, row_ref[0])
+            elif node.is_one_line:
+                parent = node.parent
+                if parent is None:
+                    raise TreeParseError(f"解析到[{node.text}]时失败")
+                row, row_ref[0] = _one_line_row(row_ref[0], len(parent.children) == 2 and node is parent.children[1])
+
+                # 单行子树上所有节点处于同一行
+                while node is not None:
+                    node.start_row = row
+                    node.min_child_start_row = row
+                    node.max_child_start_row = row
+                    node = node.children[0] if node.children else None
+            elif memo is not None and memo.place_layout(node, row_ref):
+                continue
+            else:
+                stack.append((node, row_ref[0]))
+                stack.extend((child, None) for child in reversed(children))
+
+    def compute_start_column(self, memo=None):
+        """计算起始列位置；传入memo时与起始行一样，不进入重复子树的内部"""
+        stack = [self]
+        while stack:
+            node = stack.pop()
+            if node.parent is None:
+                node.start_column = 0
+            else:
+                node.start_column = node.parent.start_column + len(node.parent.text) + 1
+            if memo is None or not memo.is_shared(node):
+                stack.extend(node.children)
+
+    def compute(self, memo=None):
+        """计算位置；memo为SubtreeMemo时复用相同子树的布局"""
+        self.compute_shape(memo)
+        row_ref = [0]
+        self.compute_start_row(row_ref, memo)
+        self.compute_start_column(memo)
+
+    def print_tree(self, memo=None):
+        """按照C#版本的打印算法，逐行缓冲一次性写出；memo为SubtreeMemo时相同子树整块拼接"""
+        # 每行一个片段列表，按节点深度从左到右依次追加
+        grid = [[] for _ in range(self.max_child_start_row + 1)]
+        self.fill_rows(grid, 0, memo, splice_self=True)
+
+        # 构建最终字符串
+        return '\n'.join(''.join(row) for row in grid).rstrip()
+
+    def fill_rows(self, grid, offset, memo=None, splice_self=False):
+        """将子树的各行片段追加到grid中（grid[0]对应第offset行）
+
+        同一行上不同深度的节点至多各一个，先序遍历即可保证从左到右的顺序。
+        一棵子树在每一行上的片段总是该行的一段后缀，因此重复子树可以整块拼接。
+        """
+        stack = [self]
+        while stack:
+            node = stack.pop()
+            children = node.children
+            text = node.text
+
+            if memo is not None and (splice_self or node is not self) and memo.is_shared(node):
+                # 重复出现的子树：直接拼接缓存的整块结果
+                first = node.min_child_start_row - offset
+                for k, row_str in enumerate(memo.block(node)):
+                    grid[first + k].append(row_str)
+                continue
+
+            if not children:
+                # 叶子节点
+                grid[node.start_row - offset].append(text)
+                continue
+
+            _draw_node(grid, text, node.start_row - offset, [child.start_row - offset for child in children],
+                       node.min_child_start_row - offset, node.max_child_start_row - offset)
+            stack.extend(reversed(children))
+
+
+class SubtreeMemo:
+    """重复子树的布局与绘制缓存
+
+    每个子树按(标签, 各子节点结构编号)分配结构编号，编号相同即标签和结构完全相同。
+    多行子树的行布局与其所在位置无关，只差一个整体偏移，因此：
+    - 布局：同一结构第一次出现时正常计算并记下相对位置，之后出现时直接平移；
+    - 绘制：出现两次以上的结构只绘制一次，得到的各行片段在每个位置整块拼接。
+    单行子树（含叶子）本身开销很小，且起始行受父节点影响，不做缓存。
+    同一个SubtreeMemo可在同一次渲染的多棵根树间共享。
+    """
+
+    def __init__(self):
+        self._shape_ids = {}      # (标签, 子节点结构编号元组) -> 结构编号
+        self.counts = []          # 结构编号 -> 出现次数
+        self.layouts = {}         # 结构编号 -> (代表节点, 起始行, 最小行, 最大行, 占用行数)，均为相对值
+        self.blocks = {}          # 结构编号 -> 各行片段
+        self.layout_hits = 0
+        self.block_hits = 0
+
+    def shape_id(self, text, child_ids):
+        key = (text, child_ids)
+        shape = self._shape_ids.get(key)
+        if shape is None:
+            shape = self._shape_ids[key] = len(self.counts)
+            self.counts.append(0)
+        self.counts[shape] += 1
+        return shape
+
+    def record_layout(self, node, entry_row, exit_row):
+        """记录多行子树第一次出现时的相对布局"""
+        if node.shape_id not in self.layouts:
+            self.layouts[node.shape_id] = (
+                node,
+                node.start_row - entry_row,
+                node.min_child_start_row - entry_row,
+                node.max_child_start_row - entry_row,
+                exit_row - entry_row,
+            )
+
+    def place_layout(self, node, row_ref):
+        """若相同子树已布局过，平移其相对布局并返回True"""
+        layout = self.layouts.get(node.shape_id)
+        if layout is None:
+            return False
+        _, start, min_row, max_row, used_rows = layout
+        entry_row = row_ref[0]
+        node.start_row = entry_row + start
+        node.min_child_start_row = entry_row + min_row
+        node.max_child_start_row = entry_row + max_row
+        row_ref[0] = entry_row + used_rows
+        self.layout_hits += 1
+        return True
+
+    def is_shared(self, node):
+        """多行且出现两次以上的子树整块拼接（只跳过布局的子树必然满足此条件）"""
+        return not node.is_one_line and self.counts[node.shape_id] > 1
+
+    def block(self, node):
+        """返回子树的各行片段；嵌套的重复子树先于外层计算，避免递归"""
+        shape = node.shape_id
+        if shape in self.blocks:
+            self.block_hits += 1
+            return self.blocks[shape]
+
+        stack = [(shape, False)]
+        while stack:
+            current, inner_ready = stack.pop()
+            if current in self.blocks:
+                continue
+            representative = self.layouts[current][0]
+            if inner_ready:
+                offset = representative.min_child_start_row
+                grid = [[] for _ in range(representative.max_child_start_row - offset + 1)]
+                representative.fill_rows(grid, offset, self)
+                self.blocks[current] = [''.join(row) for row in grid]
+            else:
+                stack.append((current, True))
+                stack.extend((inner.shape_id, False) for inner in self._shared_frontier(representative))
+        return self.blocks[shape]
+
+    def _shared_frontier(self, node):
+        """子树内部最外层的重复子树（不含node自身）"""
+        stack = list(node.children)
+        while stack:
+            current = stack.pop()
+            if self.is_shared(current):
+                yield current
+            else:
+                stack.extend(current.children)
+
+
+def _build_tree(lines, new_node, first_index=0):
+    """完全按照C#版本的解析算法建立树结构
+
+    new_node(text, parent)负责创建节点并返回其句柄（根节点的parent为None），
+    因此同一套解析逻辑可用于对象存储和数组存储。返回根节点句柄列表。
+    first_index为lines中第一行在整个输入中的下标，用于错误信息中的行号。
+    """
+    root_nodes = []
+    # 栈中元素为(节点句柄, 深度, 父节点句柄)
+    node_stack = []
+
+    for i, line in enumerate(lines, first_index):
+        if not line.strip():
+            continue
+
+        # 计算层级深度（行首层级符号的个数）
+        j = LEVEL_PREFIX.match(line).end()
+
+        if j >= len(line):
+            continue
+
+        if j == 0:
+            # 根节点
+            root = new_node(line, None)
+            root_nodes.append(root)
+            node_stack.clear()
+            node_stack.append((root, 0, None))
+        else:
+            # 调整栈
+            while node_stack and j <= node_stack[-1][1]:
+                node_stack.pop()
+
+            if not node_stack:
+                raise TreeParseError(f"解析第{i+1}行[{line}]时失败")
+
+            last_node, last_depth, last_parent = node_stack[-1]
+
+            # 判断是子节点还是同级节点
+            if j == last_depth + 1:
+                # 子节点
+                node_stack.append((new_node(line[j:], last_node), j, last_node))
+            elif j == last_depth:
+                # 同级节点
+                node_stack.append((new_node(line[j:], last_parent), j, last_parent))
+            else:
+                raise TreeParseError(f"解析第{i+1}行[{line}]时失败")
+
+    return root_nodes
+
+
+def parse_lines(lines: Iterable[str], memo: Optional[SubtreeMemo] = None) -> List[TextTreeNode]:
+    """解析为TextTreeNode对象树，返回已计算位置的根节点列表
+
+    传入memo时复用重复子树的布局，此时须用同一个memo调用print_tree。
+    """
+    root_nodes = _build_tree(lines, TextTreeNode)
+
+    # 计算所有根节点的位置
+    for root in root_nodes:
+        root.compute(memo)
+
+    return root_nodes
+
+
+class CompactTree:
+    """紧凑的数组存储：每个节点只占各平行数组中的一格，标签去重后集中保存
+
+    节点按输入顺序编号，恰好是先序；每棵根树占据一段连续编号，
+    因此后序遍历只需倒序扫描，无需额外的栈。
+    """
+
+    __slots__ = ('labels', 'label_index', 'label_id', 'parent', 'depth',
+                 'first_child', 'last_child', 'next_sibling', 'child_count',
+                 'is_one_line', 'start_row', 'start_column',
+                 'min_child_start_row', 'max_child_start_row', 'roots')
+
+    def __init__(self):
+        self.labels = []                  # 去重后的全角标签
+        self.label_index = {}             # 标签 -> labels中的下标
+        self.label_id = array('i')
+        self.parent = array('i')
+        self.depth = array('i')
+        self.first_child = array('i')
+        self.last_child = array('i')
+        self.next_sibling = array('i')
+        self.child_count = array('i')
+        self.is_one_line = bytearray()
+        self.start_row = array('i')
+        self.start_column = array('i')
+        self.min_child_start_row = array('i')
+        self.max_child_start_row = array('i')
+        self.roots = array('i')
+
+    def __len__(self):
+        return len(self.parent)
+
+    def add_node(self, text, parent=None):
+        """追加节点并返回其编号，parent为None表示根节点"""
+        text = convert_to_fullwidth(text)
+        label = self.label_index.get(text)
+        if label is None:
+            label = self.label_index[text] = len(self.labels)
+            self.labels.append(text)
+
+        index = len(self.parent)
+        self.label_id.append(label)
+        self.first_child.append(-1)
+        self.last_child.append(-1)
+        self.next_sibling.append(-1)
+        self.child_count.append(0)
+        self.is_one_line.append(1)
+        self.start_row.append(0)
+        self.start_column.append(0)
+        self.min_child_start_row.append(0)
+        self.max_child_start_row.append(0)
+
+        if parent is None:
+            self.parent.append(-1)
+            self.depth.append(0)
+            self.roots.append(index)
+        else:
+            self.parent.append(parent)
+            self.depth.append(self.depth[parent] + 1)
+            if self.last_child[parent] < 0:
+                self.first_child[parent] = index
+            else:
+                self.next_sibling[self.last_child[parent]] = index
+            self.last_child[parent] = index
+            self.child_count[parent] += 1
+        return index
+
+    def text(self, index):
+        return self.labels[self.label_id[index]]
+
+    def subtree_end(self, root):
+        """根树root占据的编号区间为[root, subtree_end(root))"""
+        position = bisect_right(self.roots, root)
+        return self.roots[position] if position < len(self.roots) else len(self.parent)
+
+    def compute(self, root):
+        """计算根树root中所有节点的位置，与TextTreeNode.compute共用同一套规则，结果一致"""
+        end = self.subtree_end(root)
+        first_child = self.first_child
+        child_count = self.child_count
+        is_one_line = self.is_one_line
+        start_row = self.start_row
+        min_row = self.min_child_start_row
+        max_row = self.max_child_start_row
+
+        # 逆先序即为后序
+        for index in range(end - 1, root - 1, -1):
+            count = child_count[index]
+            is_one_line[index] = _is_one_line(count, count and is_one_line[first_child[index]])
+
+        # 起始行：负编号表示子节点已处理完毕
+        row = 0
+        stack = [root]
+        while stack:
+            index = stack.pop()
+            if index < 0:
+                index = ~index
+                first, last = first_child[index], self.last_child[index]
+                start_row[index] = (start_row[first] + start_row[last]) // 2
+                min_row[index] = min_row[first]
+                max_row[index] = max_row[last]
+            elif is_one_line[index]:
+                parent = self.parent[index]
+                if parent < 0:
+                    raise TreeParseError(f"解析到[{self.text(index)}]时失败")
+                node_row, row = _one_line_row(row, child_count[parent] == 2 and index == self.last_child[parent])
+
+                # 单行子树上所有节点处于同一行
+                while index >= 0:
+                    start_row[index] = min_row[index] = max_row[index] = node_row
+                    index = first_child[index]
+            else:
+                stack.append(~index)
+                children = []
+                child = first_child[index]
+                while child >= 0:
+                    children.append(child)
+                    child = self.next_sibling[child]
+                stack.extend(reversed(children))
+
+        # 起始列：先序扫描时父节点总已算好
+        parent = self.parent
+        start_column = self.start_column
+        start_column[root] = 0
+        for index in range(root + 1, end):
+            p = parent[index]
+            start_column[index] = start_column[p] + len(self.text(p)) + 1
+
+    def print_tree(self, root):
+        """与TextTreeNode.print_tree相同的打印算法（共用_draw_node），直接运行在数组上"""
+        end = self.subtree_end(root)
+        labels = self.labels
+        label_id = self.label_id
+        first_child = self.first_child
+        next_sibling = self.next_sibling
+        start_row = self.start_row
+        grid = [[] for _ in range(self.max_child_start_row[root] + 1)]
+
+        for index in range(root, end):
+            text = labels[label_id[index]]
+            child = first_child[index]
+
+            if child < 0:
+                # 叶子节点
+                grid[start_row[index]].append(text)
+                continue
+
+            child_rows = []
+            while child >= 0:
+                child_rows.append(start_row[child])
+                child = next_sibling[child]
+            _draw_node(grid, text, start_row[index], child_rows,
+                       self.min_child_start_row[index], self.max_child_start_row[index])
+
+        return '\n'.join(''.join(row) for row in grid).rstrip()
+
+
+def parse_lines_compact(lines: Iterable[str]) -> CompactTree:
+    """解析为紧凑的数组存储，并计算所有根树的位置"""
+    tree = CompactTree()
+    _build_tree(lines, tree.add_node)
+    for root in tree.roots:
+        tree.compute(root)
+    return tree
+
+
+def split_lines(text: str) -> List[str]:
+    """按行拆分输入，忽略空行"""
+    return [line for line in text.split('\n') if line.strip()]
+
+
+def render(text: str, compact: bool = False, memoize: bool = False) -> str:
+    """将输入文本生成义脉树枝图，多个根节点之间以空行分隔
+
+    compact为True时使用紧凑的数组存储，适合超大输入；
+    memoize为True时重复的子树只布局、绘制一次，适合大量重复分支的输入。输出完全相同。
+    """
+    lines = split_lines(text)
+    if not lines:
+        return ""
+
+    if compact:
+        tree = parse_lines_compact(lines)
+        outputs = (tree.print_tree(root) for root in tree.roots)
+    else:
+        memo = SubtreeMemo() if memoize else None
+        outputs = (root.print_tree(memo) for root in parse_lines(lines, memo))
+
+    final_output = [tree_output for tree_output in outputs if tree_output]
+    return "\n\n".join(final_output)
+
+
+def iter_file_lines(path: str, encoding: str = 'utf-8') -> Iterator[str]:
+    """逐行读取文件（去掉行尾换行符），不一次性载入整个文件"""
+    with open(path, 'r', encoding=encoding) as f:
+        for line in f:
+            yield line.rstrip('\n')
+
+
+def iter_root_groups(lines: Iterable[str]) -> Iterator[Tuple[int, List[str]]]:
+    """将输入按根节点行切分成段，逐段返回(段首行号下标, 段内非空行)
+
+    行号下标与render一致：只计非空行。每段以根节点行开头
+    （输入开头若不是根节点行，第一段解析时会报错）。
+    """
+    group = []
+    group_start = 0
+    index = 0
+
+    for line in lines:
+        if not line.strip():
+            continue
+        if LEVEL_PREFIX.match(line).end() == 0 and group:
+            yield group_start, group
+            group = []
+            group_start = index
+        group.append(line)
+        index += 1
+
+    if group:
+        yield group_start, group
+
+
+def iter_render(lines: Iterable[str]) -> Iterator[str]:
+    """流式生成义脉树枝图：每读到下一个根节点行，就输出上一棵根树的绘制结果
+
+    lines可以是文件或任意行迭代器，内存占用只取决于最大的单棵根树。
+    各块之间应以空行分隔，拼接结果与render相同；若输入中途有错误，
+    之前的根树已经输出，随后抛出TreeParseError。
+    """
+    for first_index, group in iter_root_groups(lines):
+        yield from _render_roots(_build_tree(group, TextTreeNode, first_index))
+
+
+def _render_roots(root_nodes):
+    """计算位置并绘制已解析的根节点，跳过空结果"""
+    for root in root_nodes:
+        root.compute()
+        tree_output = root.print_tree()
+        if tree_output:
+            yield tree_output
+
+
+def render_stream(lines: Iterable[str], output: TextIO) -> int:
+    """将流式绘制结果直接写入output，返回写出的根树数量"""
+    count = 0
+    for tree_output in iter_render(lines):
+        if count:
+            output.write("\n\n")
+        output.write(tree_output)
+        count += 1
+    return count
+
+
+def render_to_file(lines: Iterable[str], output_path: str, encoding: str = 'utf-8') -> int:
+    """将输入行流式渲染到输出文件，返回根树数量
+
+    先写入临时文件，成功后再替换，解析失败时不会留下残缺的结果文件。
+    """
+    temp_path = output_path + ".tmp"
+    try:
+        with open(temp_path, 'w', encoding=encoding) as f:
+            count = render_stream(lines, f)
+            if count:
+                f.write("\n")
+        os.replace(temp_path, output_path)
+        return count
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+
+class IncrementalRenderer:
+    """增量渲染：输入被编辑后只重新解析内容有变化的根树，其余根树复用上次的绘制结果
+
+    以根树为单位、按内容缓存，因此无论编辑发生在哪几行，都只会影响所在的根树；
+    插入、删除或移动整棵根树也能复用其余根树。输出及错误信息与render完全相同。
+    """
+
+    def __init__(self):
+        self._cache = {}          # 段内各行 -> 该段的绘制结果列表
+        self.reused_roots = 0     # 上次调用中复用的段数
+        self.rendered_roots = 0   # 上次调用中重新解析的段数
+
+    def clear(self):
+        self._cache = {}
+
+    def render(self, text: str, is_cancelled: Optional[Callable[[], bool]] = None) -> str:
+        """is_cancelled在每棵根树前被调用，返回True时抛出RenderCancelled，缓存保持不变"""
+        groups = [(first_index, tuple(group)) for first_index, group in iter_root_groups(split_lines(text))]
+
+        # 与render一样，先解析全部变化的段，再依次计算位置，保证报错顺序一致
+        parsed = {}
+        for first_index, key in groups:
+            if key not in self._cache and key not in parsed:
+                if is_cancelled is not None and is_cancelled():
+                    raise RenderCancelled()
+                parsed[key] = _build_tree(key, TextTreeNode, first_index)
+
+        cache = {}
+        final_output = []
+        reused = 0
+        for _, key in groups:
+            if is_cancelled is not None and key in parsed and is_cancelled():
+                raise RenderCancelled()
+            if key in cache:
+                outputs = cache[key]
+            elif key in self._cache:
+                outputs = cache[key] = self._cache[key]
+                reused += 1
+            else:
+                outputs = cache[key] = list(_render_roots(parsed[key]))
+            final_output.extend(outputs)
+
+        # 只保留当前输入用到的段，避免缓存无限增长
+        self._cache = cache
+        self.reused_roots = reused
+        self.rendered_roots = len(parsed)
+        return "\n\n".join(final_output)
@@ -1,18 +1,29 @@
 import sys
 import json
 import os
+from datetime import datetime
+from functools import lru_cache
+
+# 命令行模式（python ymtree.py render ...）在加载PyQt5之前分流，便于无界面环境使用
+if __name__ == "__main__" and len(sys.argv) > 1 and sys.argv[1] == "render":
+    from ymtree_cli import main
+    sys.exit(main(sys.argv[1:]))
+
 from PyQt5.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout, 
                              QHBoxLayout, QTextEdit, QPushButton, QLabel, 
                              QSplitter, QGroupBox, QMessageBox, QComboBox,
                              QToolBar, QAction, QStatusBar, QFrame, QDialog,
-                             QDialogButtonBox, QLineEdit, QTableWidget, 
-                             QTableWidgetItem, QHeaderView, QTabWidget,
+                             QDialogButtonBox, QLineEdit, QHeaderView, QTabWidget,
                              QSpinBox, QTextBrowser, QColorDialog, QButtonGroup,
-                             QScrollArea, QProgressDialog)
-from PyQt5.QtGui import QFont, QColor, QPainter, QBrush, QPixmap
-from PyQt5.QtCore import Qt, pyqtSignal, QSettings, QThread
-from database import DatabaseManager
+                             QScrollArea, QProgressDialog, QTableView,
+                             QStyledItemDelegate, QAbstractItemView)
+from PyQt5.QtGui import QFont, QColor, QPainter, QBrush, QPixmap, QLinearGradient, QGradient, QPen
+from PyQt5.QtCore import (Qt, pyqtSignal, QSettings, QThread, QTimer, QAbstractTableModel,
+                          QModelIndex, QEvent, QRect, QRectF)
+from database import DatabaseManager, PAGE_SIZE
 from theme_manager import get_theme_style, get_theme_list
+from tree_engine import IncrementalRenderer, RenderCancelled, parse_lines
+from render_cache import RenderCache
 
 class SaveDialog(QDialog):
     def __init__(self, parent=None, db_manager=None):
@@ -123,11 +134,14 @@ class TopicDialog(QDialog):
             QMessageBox.critical(self, "错误", f"创建专题失败：{str(e)}")
 
 class PreviewDialog(QDialog):
-    def __init__(self, parent=None, diagram=None, all_diagrams=None):
+    def __init__(self, parent=None, diagram=None, all_diagrams=None, model=None):
+        """model为"我的树枝图"列表的DiagramTableModel时，all_diagrams是它已读取的行，
+        翻到最后一个已读取的图表时继续从数据库读取下一页"""
         super().__init__(parent)
         self.parent_window = parent
         self.diagram = diagram
         self.all_diagrams = all_diagrams or []
+        self.model = model
         self.current_index = self.all_diagrams.index(diagram) if diagram in self.all_diagrams else 0
         self.setWindowTitle(f"预览 - {diagram['name']}")
         self.setModal(True)
@@ -292,8 +306,16 @@ class PreviewDialog(QDialog):
         else:
             self.next_diagram()
     
+    def load_body(self):
+        """列表只包含元数据，首次显示某个图表时再从数据库读取正文"""
+        if 'result' in self.diagram:
+            return
+        body = self.parent_window.db_manager.get_diagram_body(self.diagram['id'])
+        self.diagram.update(body or {'content': '', 'result': ''})
+
     def load_content(self):
         if self.diagram:
+            self.load_body()
             self.result_edit.setPlainText(self.diagram['result'])
             # 说明内容可以从content字段获取，或者设置为空让用户自己编辑
             description_text = self.diagram.get('description', '')
@@ -315,12 +337,17 @@ class PreviewDialog(QDialog):
                 self.description_edit.setPlainText(description_text)
                 
             self.setWindowTitle(f"预览 - {self.diagram['name']}")
-            self.diagram_label.setText(f"{self.current_index + 1} / {len(self.all_diagrams)}")
+            # 列表还有未读取的页时总数未知，显示为"已读取数+"
+            more = "+" if self.can_fetch_more() else ""
+            self.diagram_label.setText(f"{self.current_index + 1} / {len(self.all_diagrams)}{more}")
             self.name_label.setText(self.diagram['name'])
     
+    def can_fetch_more(self):
+        return self.model is not None and self.model.canFetchMore(QModelIndex())
+
     def update_navigation(self):
         self.prev_btn.setEnabled(self.current_index > 0)
-        self.next_btn.setEnabled(self.current_index < len(self.all_diagrams) - 1)
+        self.next_btn.setEnabled(self.current_index < len(self.all_diagrams) - 1 or self.can_fetch_more())
     
     def prev_diagram(self):
         if self.current_index > 0:
@@ -331,6 +358,9 @@ class PreviewDialog(QDialog):
             self.update_navigation()
     
     def next_diagram(self):
+        if self.current_index >= len(self.all_diagrams) - 1 and self.can_fetch_more():
+            # 模型的行列表与all_diagrams是同一个列表，读取下一页后直接可用
+            self.model.fetchMore(QModelIndex())
         if self.current_index < len(self.all_diagrams) - 1:
             self.auto_save()  # 自动保存当前修改
             self.current_index += 1
@@ -534,11 +564,465 @@ class PreviewDialog(QDialog):
         self.settings.setValue("geometry", self.saveGeometry())
     
 
-    def closeEvent(self, event):
-        """关闭时自动保存"""
+    def done(self, result):
+        """关闭时自动保存（点关闭按钮、按Esc或调用reject()最终都经过done）"""
         self.auto_save()
+        # 数据库为延迟写入模式，关闭时立即写入排队的修改
+        self.parent_window.db_manager.flush()
         self.save_settings()
-        super().closeEvent(event)
+        super().done(result)
+
+# "我的树枝图"列表的默认字号（未选择过字号时样式表、名称专题列和操作按钮共用）
+DEFAULT_TABLE_FONT_SIZE = 18
+
+
+@lru_cache(maxsize=None)
+def history_style_sheet(font_size=DEFAULT_TABLE_FONT_SIZE):
+    """"我的树枝图"对话框的整体样式表：在对话框上设置一次，按对象名作用于各控件，
+    只在字号变化时重新生成和解析"""
+    return f"""
+    QLineEdit#historySearchEdit {{
+        background: qlineargradient(x1:0, y1:0, x2:0, y2:1,
+                                  stop:0 #faf6f0, stop:1 #f0ead6);
+        border: 2px solid #d4c4a8;
+        border-radius: 8px;
+        padding: 8px 12px;
+        color: #3c2e26;
+        font-size: 14px;
+        min-width: 200px;
+        margin-left: 10px;
+    }}
+    QLineEdit#historySearchEdit:focus {{
+        border-color: #b8860b;
+    }}
+
+    QPushButton#deleteTopicButton {{
+        background: qlineargradient(x1:0, y1:0, x2:0, y2:1, 
+                                   stop:0 #d2b48c, stop:1 #bc9a6a);
+        color: #2f1b14;
+        border: 2px solid #a0522d;
+        border-radius: 8px;
+        font-size: 14px;
+        font-weight: 600;
+        padding: 10px 18px;
+        margin-left: 10px;
+        min-width: 120px;
+        min-height: 35px;
+    }}
+    QPushButton#deleteTopicButton:hover {{
+        background: qlineargradient(x1:0, y1:0, x2:0, y2:1, 
+                                   stop:0 #deb887, stop:1 #cd853f);
+        border-color: #8b4513;
+    }}
+    QPushButton#deleteTopicButton:pressed {{
+        background: qlineargradient(x1:0, y1:0, x2:0, y2:1, 
+                                   stop:0 #bc9a6a, stop:1 #a0522d);
+        border-color: #654321;
+    }}
+    QPushButton#deleteTopicButton:disabled {{
+        background-color: #e8dcc0;
+        border-color: #d4c4a8;
+        color: #8b7355;
+    }}
+
+    QComboBox#tableFontCombo {{
+        background: qlineargradient(x1:0, y1:0, x2:0, y2:1,
+                                  stop:0 #faf6f0, stop:1 #f0ead6);
+        border: 2px solid #d4c4a8;
+        border-radius: 8px;
+        padding: 8px 12px;
+        color: #3c2e26;
+        font-size: 14px;
+        min-width: 80px;
+        min-height: 20px;
+        font-weight: 500;
+        margin-left: 5px;
+    }}
+    QComboBox#tableFontCombo:hover {{
+        border-color: #b8860b;
+        background: qlineargradient(x1:0, y1:0, x2:0, y2:1,
+                                  stop:0 #fff8f0, stop:1 #f5f0e6);
+    }}
+    QComboBox#tableFontCombo::drop-down {{
+        border: none;
+        width: 25px;
+    }}
+    QComboBox#tableFontCombo::down-arrow {{
+        image: none;
+        border-left: 6px solid transparent;
+        border-right: 6px solid transparent;
+        border-top: 6px solid #5d4e37;
+        margin-right: 8px;
+    }}
+    QComboBox#tableFontCombo QAbstractItemView {{
+        background-color: #faf6f0;
+        border: 2px solid #d4c4a8;
+        border-radius: 8px;
+        selection-background-color: #deb887;
+        color: #3c2e26;
+        padding: 6px;
+        font-size: 14px;
+    }}
+
+    QTableView#historyTable {{
+        background: qlineargradient(x1:0, y1:0, x2:0, y2:1, 
+                                  stop:0 #fefcf8, stop:1 #f8f4f0);
+        alternate-background-color: qlineargradient(x1:0, y1:0, x2:0, y2:1, 
+                                                  stop:0 #faf8f5, stop:1 #f5f0e6);
+        color: #3c2e26;
+        border: 2px solid #d4c4a8;
+        border-radius: 12px;
+        gridline-color: #e8dcc0;
+        font-size: {font_size}px;
+        selection-background-color: #deb887;
+        font-family: "Microsoft YaHei", "SimHei", serif;
+    }}
+    #historyTable::item {{
+        padding: 15px 12px;
+        border-bottom: 1px solid #e8dcc0;
+        color: #3c2e26;
+        background-color: transparent;
+        font-weight: 500;
+    }}
+    #historyTable::item:alternate {{
+        background-color: transparent;
+    }}
+    #historyTable::item:selected {{
+        background: qlineargradient(x1:0, y1:0, x2:0, y2:1, 
+                                  stop:0 #deb887, stop:1 #cd853f);
+        color: #2f1b14;
+        font-weight: 600;
+    }}
+    /* 优化表头样式 - 古朴纸书感 */
+    #historyTable QHeaderView::section {{
+        background: qlineargradient(x1:0, y1:0, x2:0, y2:1,
+                                  stop:0 #f0ead6, stop:1 #e8dcc0);
+        border: 2px solid #d4c4a8;
+        border-radius: 6px;
+        padding: 12px 15px;
+        color: #5d4e37;
+        font-weight: 700;
+        font-size: {font_size + 2}px;
+        font-family: "Microsoft YaHei", "SimHei", serif;
+        text-align: center;
+        margin: 2px;
+    }}
+    #historyTable QHeaderView::section:hover {{
+        background: qlineargradient(x1:0, y1:0, x2:0, y2:1,
+                                  stop:0 #f5f0e6, stop:1 #ede0d0);
+        border-color: #b8860b;
+    }}
+    /* 优化垂直表头（序号）样式 */
+    #historyTable QHeaderView::section:vertical {{
+        background: qlineargradient(x1:0, y1:0, x2:1, y2:0,
+                                  stop:0 #f0ead6, stop:1 #e8dcc0);
+        border: 2px solid #d4c4a8;
+        border-radius: 6px;
+        padding: 8px 12px;
+        color: #5d4e37;
+        font-weight: 600;
+        font-size: {font_size}px;
+        font-family: "Microsoft YaHei", "SimHei", serif;
+        text-align: center;
+        margin: 1px;
+        min-width: 50px;
+    }}
+    #historyTable QHeaderView::section:vertical:hover {{
+        background: qlineargradient(x1:0, y1:0, x2:1, y2:0,
+                                  stop:0 #f5f0e6, stop:1 #ede0d0);
+        border-color: #b8860b;
+    }}
+    #historyTable::item:hover {{
+        background: qlineargradient(x1:0, y1:0, x2:0, y2:1, 
+                                  stop:0 #f0e68c, stop:1 #daa520);
+    }}
+    #historyTable QScrollBar:vertical {{
+        border: 2px solid #daa520;
+        background: #f5f5dc;
+        width: 16px;
+        border-radius: 8px;
+    }}
+    #historyTable QScrollBar::handle:vertical {{
+        background: qlineargradient(x1:0, y1:0, x2:0, y2:1, 
+                                  stop:0 #daa520, stop:1 #b8860b);
+        min-height: 20px;
+        border-radius: 6px;
+        border: 1px solid #b8860b;
+    }}
+    #historyTable QScrollBar::handle:vertical:hover {{
+        background: qlineargradient(x1:0, y1:0, x2:0, y2:1, 
+                                  stop:0 #f0e68c, stop:1 #daa520);
+    }}
+    #historyTable QScrollBar::add-line:vertical, #historyTable QScrollBar::sub-line:vertical {{
+        height: 0px;
+    }}
+    #historyTable QScrollBar::add-page:vertical, #historyTable QScrollBar::sub-page:vertical {{
+        background: none;
+    }}
+    /* 表格右上角空白区域样式 */
+    #historyTable QTableCornerButton::section {{
+        background: qlineargradient(x1:0, y1:0, x2:0, y2:1,
+                                  stop:0 #f0ead6, stop:1 #e8dcc0);
+        border: 2px solid #d4c4a8;
+        border-radius: 6px;
+    }}
+    """
+
+
+@lru_cache(maxsize=None)
+def history_row_style(font_size, parity):
+    """列表行的(字体, 文字画刷, 背景画刷)，按(字号, 奇偶行)缓存，所有单元格共用"""
+    font = QFont()
+    font.setPointSize(font_size)
+    foreground = QBrush(QColor("#8B4513"))  # 深棕色，古朴感
+    # 确保背景为亮色
+    background = QBrush(QColor("#faf0e6" if parity else "#f5f5dc"))
+    return font, foreground, background
+
+
+class DiagramTableModel(QAbstractTableModel):
+    """我的树枝图列表的数据模型：按页从数据库读取图表元数据，滚动到底部时再读取下一页"""
+    HEADERS = ["名称", "专题", "创建时间", "操作"]
+    ACTION_COLUMN = 3
+
+    def __init__(self, db_manager, parent=None):
+        super().__init__(parent)
+        self.db_manager = db_manager
+        self.topic_id = None
+        self.search_text = ""
+        self.sort_key = None        # None为默认顺序，或'topic_name'、'created_at'
+        self.descending = False
+        self.diagrams = []
+        self.exhausted = True
+        self.font_size = DEFAULT_TABLE_FONT_SIZE
+
+    @staticmethod
+    def format_created_at(created_at):
+        """创建时间格式化为 月-日 时:分/年，解析失败时使用原始格式"""
+        try:
+            dt = datetime.strptime(created_at, '%Y-%m-%d %H:%M:%S')
+            return f"{dt.month:02d}-{dt.day:02d} {dt.hour:02d}:{dt.minute:02d}/{dt.year}"
+        except (TypeError, ValueError):
+            return created_at
+
+    def load(self, topic_id=None, search_text=""):
+        """切换专题（None为全部）和检索词（空为不检索）并重新读取第一页"""
+        self.beginResetModel()
+        self.topic_id = topic_id
+        self.search_text = search_text.strip()
+        self.diagrams = []
+        self.exhausted = False
+        self.endResetModel()
+        self.fetchMore(QModelIndex())
+
+    def canFetchMore(self, parent):
+        return not parent.isValid() and not self.exhausted
+
+    def fetchMore(self, parent):
+        if parent.isValid() or self.exhausted:
+            return
+        if self.search_text:
+            # 检索结果（默认按相关度排序）按偏移分页
+            page = self.db_manager.search_diagrams(self.search_text, self.topic_id, PAGE_SIZE,
+                                                   offset=len(self.diagrams), sort_key=self.sort_key,
+                                                   descending=self.descending)
+        else:
+            after = self.diagrams[-1] if self.diagrams else None
+            page = self.db_manager.get_diagram_page(self.topic_id, after, PAGE_SIZE,
+                                                    self.sort_key, self.descending)
+        if len(page) < PAGE_SIZE:
+            self.exhausted = True
+        if not page:
+            return
+        for diagram in page:
+            diagram['created_display'] = self.format_created_at(diagram['created_at'])
+        first = len(self.diagrams)
+        self.beginInsertRows(QModelIndex(), first, first + len(page) - 1)
+        self.diagrams.extend(page)
+        self.endInsertRows()
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.diagrams)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.HEADERS)
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if orientation == Qt.Horizontal and role == Qt.DisplayRole:
+            return self.HEADERS[section]
+        return super().headerData(section, orientation, role)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        row, column = index.row(), index.column()
+        diagram = self.diagrams[row]
+        if role == Qt.DisplayRole:
+            if column == 0:
+                return diagram['name']
+            if column == 1:
+                return diagram['topic_name']
+            if column == 2:
+                return diagram['created_display']
+            return None
+        if role == Qt.TextAlignmentRole:
+            return Qt.AlignCenter
+        if role == Qt.BackgroundRole:
+            return history_row_style(self.font_size, row % 2)[2]
+        if column == self.ACTION_COLUMN:
+            return None
+        if role == Qt.ForegroundRole:
+            return history_row_style(self.font_size, row % 2)[1]
+        if role == Qt.FontRole and column in (0, 1):
+            return history_row_style(self.font_size, row % 2)[0]
+        if role == Qt.ToolTipRole:
+            # 检索时显示命中的文字片段
+            return diagram.get('snippet') or None
+        if role == Qt.UserRole:
+            return diagram
+        return None
+
+    def set_font_size(self, font_size):
+        """名称和专题列使用表格字号"""
+        self.font_size = font_size
+        if self.diagrams:
+            self.dataChanged.emit(self.index(0, 0), self.index(len(self.diagrams) - 1, 1), [Qt.FontRole])
+
+    def diagram_changed(self, row):
+        """某一行的图表信息在外部被修改后通知视图刷新"""
+        self.dataChanged.emit(self.index(row, 0), self.index(row, self.ACTION_COLUMN - 1))
+
+    def remove_diagram(self, row):
+        """移除一行（图表已从数据库删除或不再属于当前筛选），其余行保持不动
+
+        后续分页以已读取的最后一行为起点（检索时以已读取行数为偏移），
+        数据库中也少了这一行，因此不会重复或遗漏。
+        """
+        self.beginRemoveRows(QModelIndex(), row, row)
+        del self.diagrams[row]
+        self.endRemoveRows()
+        # 交替行背景按行号计算，后面各行的背景随之互换
+        if row < len(self.diagrams):
+            self.dataChanged.emit(self.index(row, 0), self.index(len(self.diagrams) - 1, self.ACTION_COLUMN),
+                                  [Qt.BackgroundRole])
+
+    def set_sort(self, sort_key, descending=False):
+        """由数据库按列排序，只重新读取第一页"""
+        self.sort_key = sort_key
+        self.descending = descending
+        self.load(self.topic_id, self.search_text)
+
+
+class DiagramActionDelegate(QStyledItemDelegate):
+    """操作列的委托：直接绘制"查看"和"删除"两个按钮，不为每一行创建按钮控件"""
+    view_clicked = pyqtSignal(int)
+    delete_clicked = pyqtSignal(int)
+
+    # 每个按钮在 普通/悬停/按下 状态下的 (渐变起始色, 渐变结束色, 边框色, 文字色)
+    BUTTONS = (
+        ("查看", {
+            'normal': ("#f5deb3", "#deb887", "#d2b48c", "#3c2e26"),
+            'hover': ("#fff8dc", "#f0e68c", "#daa520", "#2f1b14"),
+            'pressed': ("#deb887", "#cd853f", "#b8860b", "#2f1b14"),
+        }),
+        ("删除", {
+            'normal': ("#f4a460", "#d2b48c", "#cd853f", "#2f1b14"),
+            'hover': ("#daa520", "#b8860b", "#a0522d", "#ffffff"),
+            'pressed': ("#cd853f", "#a0522d", "#8b4513", "#ffffff"),
+        }),
+    )
+    BUTTON_SPACING = 10
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.font_size = DEFAULT_TABLE_FONT_SIZE
+        self.hovered = None    # (行, 按钮序号)
+        self.pressed = None
+        # 每种状态的边框画笔、渐变画刷、文字画笔只创建一次；
+        # 渐变使用相对坐标，同一个画刷适用于任意位置和大小的按钮
+        self.styles = []
+        for _, states in self.BUTTONS:
+            button_styles = {}
+            for state, (start, end, border, text_color) in states.items():
+                gradient = QLinearGradient(0, 0, 0, 1)
+                gradient.setCoordinateMode(QGradient.ObjectBoundingMode)
+                gradient.setColorAt(0, QColor(start))
+                gradient.setColorAt(1, QColor(end))
+                button_styles[state] = (QPen(QColor(border), 1), QBrush(gradient), QPen(QColor(text_color)))
+            self.styles.append(button_styles)
+
+    @staticmethod
+    @lru_cache(maxsize=None)
+    def button_font(font_size):
+        font = QFont()
+        font.setPixelSize(font_size)
+        font.setWeight(QFont.DemiBold)
+        return font
+
+    def button_rects(self, rect):
+        """单元格内两个按钮的位置，尺寸随字号缩放"""
+        scale_factor = self.font_size / 16.0
+        width = int(75 * scale_factor)
+        height = int(35 * scale_factor)
+        left = rect.center().x() - (width * 2 + self.BUTTON_SPACING) // 2
+        top = rect.center().y() - height // 2
+        return [QRect(left, top, width, height),
+                QRect(left + width + self.BUTTON_SPACING, top, width, height)]
+
+    def button_at(self, rect, pos):
+        for number, button_rect in enumerate(self.button_rects(rect)):
+            if button_rect.contains(pos):
+                return number
+        return None
+
+    def paint(self, painter, option, index):
+        super().paint(painter, option, index)
+        painter.save()
+        painter.setRenderHint(QPainter.Antialiasing)
+        painter.setFont(self.button_font(self.font_size))
+        for number, button_rect in enumerate(self.button_rects(option.rect)):
+            state = (index.row(), number)
+            if state == self.pressed:
+                border_pen, brush, text_pen = self.styles[number]['pressed']
+            elif state == self.hovered:
+                border_pen, brush, text_pen = self.styles[number]['hover']
+            else:
+                border_pen, brush, text_pen = self.styles[number]['normal']
+            painter.setPen(border_pen)
+            painter.setBrush(brush)
+            painter.drawRoundedRect(QRectF(button_rect).adjusted(0.5, 0.5, -0.5, -0.5), 6, 6)
+            painter.setPen(text_pen)
+            painter.drawText(button_rect, Qt.AlignCenter, self.BUTTONS[number][0])
+        painter.restore()
+
+    def editorEvent(self, event, model, option, index):
+        if event.type() not in (QEvent.MouseMove, QEvent.MouseButtonPress, QEvent.MouseButtonRelease):
+            return super().editorEvent(event, model, option, index)
+
+        number = self.button_at(option.rect, event.pos())
+        state = None if number is None else (index.row(), number)
+        if event.type() == QEvent.MouseMove:
+            if state != self.hovered:
+                self.hovered = state
+                self.parent().viewport().update()
+            return False
+        if event.button() != Qt.LeftButton:
+            return False
+        if event.type() == QEvent.MouseButtonPress:
+            self.pressed = state
+            self.parent().viewport().update()
+            return state is not None
+
+        pressed, self.pressed = self.pressed, None
+        self.parent().viewport().update()
+        if state is None or state != pressed:
+            return False
+        if number == 0:
+            self.view_clicked.emit(index.row())
+        else:
+            self.delete_clicked.emit(index.row())
+        return True
+
 
 class HistoryDialog(QDialog):
     def __init__(self, parent=None, db_manager=None):
@@ -578,38 +1062,21 @@ class HistoryDialog(QDialog):
         self.filter_combo.currentIndexChanged.connect(self.filter_diagrams)
         filter_layout.addWidget(self.filter_combo)
         
+        # 全文检索：输入停顿片刻后查询名称、大纲和生成结果
+        self.search_edit = QLineEdit()
+        self.search_edit.setObjectName("historySearchEdit")
+        self.search_edit.setPlaceholderText("搜索名称、大纲或内容")
+        self.search_edit.setClearButtonEnabled(True)
+        self.search_timer = QTimer(self)
+        self.search_timer.setSingleShot(True)
+        self.search_timer.setInterval(250)
+        self.search_timer.timeout.connect(self.filter_diagrams)
+        self.search_edit.textChanged.connect(self.search_timer.start)
+        filter_layout.addWidget(self.search_edit)
+        
         # 添加删除主题按钮 - 古朴纸书感设计（增大尺寸）
         self.delete_topic_btn = QPushButton("删除当前主题")
-        self.delete_topic_btn.setStyleSheet("""
-            QPushButton {
-                background: qlineargradient(x1:0, y1:0, x2:0, y2:1, 
-                                           stop:0 #d2b48c, stop:1 #bc9a6a);
-                color: #2f1b14;
-                border: 2px solid #a0522d;
-                border-radius: 8px;
-                font-size: 14px;
-                font-weight: 600;
-                padding: 10px 18px;
-                margin-left: 10px;
-                min-width: 120px;
-                min-height: 35px;
-            }
-            QPushButton:hover {
-                background: qlineargradient(x1:0, y1:0, x2:0, y2:1, 
-                                           stop:0 #deb887, stop:1 #cd853f);
-                border-color: #8b4513;
-            }
-            QPushButton:pressed {
-                background: qlineargradient(x1:0, y1:0, x2:0, y2:1, 
-                                           stop:0 #bc9a6a, stop:1 #a0522d);
-                border-color: #654321;
-            }
-            QPushButton:disabled {
-                background-color: #e8dcc0;
-                border-color: #d4c4a8;
-                color: #8b7355;
-            }
-        """)
+        self.delete_topic_btn.setObjectName("deleteTopicButton")
         self.delete_topic_btn.clicked.connect(self.delete_current_topic)
         self.delete_topic_btn.setEnabled(False)  # 默认禁用
         filter_layout.addWidget(self.delete_topic_btn)
@@ -617,6 +1084,7 @@ class HistoryDialog(QDialog):
         # 添加字号下拉框
         filter_layout.addWidget(QLabel("字号:"))
         self.table_font_combo = QComboBox()
+        self.table_font_combo.setObjectName("tableFontCombo")
         table_font_sizes = [18, 20, 22, 24, 26, 28, 30]
         for size in table_font_sizes:
             self.table_font_combo.addItem(f"{size}px", size)
@@ -625,46 +1093,6 @@ class HistoryDialog(QDialog):
         if default_index >= 0:
             self.table_font_combo.setCurrentIndex(default_index)
         self.table_font_combo.currentIndexChanged.connect(self.change_table_font_size_direct)
-        self.table_font_combo.setStyleSheet("""
-            QComboBox {
-                background: qlineargradient(x1:0, y1:0, x2:0, y2:1,
-                                          stop:0 #faf6f0, stop:1 #f0ead6);
-                border: 2px solid #d4c4a8;
-                border-radius: 8px;
-                padding: 8px 12px;
-                color: #3c2e26;
-                font-size: 14px;
-                min-width: 80px;
-                min-height: 20px;
-                font-weight: 500;
-                margin-left: 5px;
-            }
-            QComboBox:hover {
-                border-color: #b8860b;
-                background: qlineargradient(x1:0, y1:0, x2:0, y2:1,
-                                          stop:0 #fff8f0, stop:1 #f5f0e6);
-            }
-            QComboBox::drop-down {
-                border: none;
-                width: 25px;
-            }
-            QComboBox::down-arrow {
-                image: none;
-                border-left: 6px solid transparent;
-                border-right: 6px solid transparent;
-                border-top: 6px solid #5d4e37;
-                margin-right: 8px;
-            }
-            QComboBox QAbstractItemView {
-                background-color: #faf6f0;
-                border: 2px solid #d4c4a8;
-                border-radius: 8px;
-                selection-background-color: #deb887;
-                color: #3c2e26;
-                padding: 6px;
-                font-size: 14px;
-            }
-        """)
         filter_layout.addWidget(self.table_font_combo)
         
 
@@ -672,11 +1100,18 @@ class HistoryDialog(QDialog):
         filter_layout.addStretch()
         layout.addLayout(filter_layout)
 
-        # 表格
-        self.table = QTableWidget()
+        # 表格：数据按页从数据库读取，操作列的按钮由委托绘制
+        self.model = DiagramTableModel(self.db_manager, self)
+        self.table = QTableView()
+        self.table.setObjectName("historyTable")
+        self.table.setModel(self.model)
+        self.action_delegate = DiagramActionDelegate(self.table)
+        self.action_delegate.view_clicked.connect(self.preview_diagram)
+        self.action_delegate.delete_clicked.connect(self.delete_diagram)
+        self.table.setItemDelegateForColumn(DiagramTableModel.ACTION_COLUMN, self.action_delegate)
+        self.table.setMouseTracking(True)  # 按钮悬停效果
+        self.table.setEditTriggers(QAbstractItemView.NoEditTriggers)
         layout.addWidget(self.table)
-        self.table.setColumnCount(4)
-        self.table.setHorizontalHeaderLabels(["名称", "专题", "创建时间", "操作"])
         # 现代化表格布局设计 - 基于UI设计最佳实践
         self.table.horizontalHeader().setStretchLastSection(True)  # 最后一列自适应
         
@@ -689,7 +1124,7 @@ class HistoryDialog(QDialog):
         # 现代化表格样式设计
         self.table.setAlternatingRowColors(True)  # 交替行颜色提升可读性
         self.table.setShowGrid(False)  # 隐藏网格线，使用更简洁的设计
-        self.table.setSelectionBehavior(QTableWidget.SelectRows)  # 整行选择
+        self.table.setSelectionBehavior(QAbstractItemView.SelectRows)  # 整行选择
         
         # 设置表格头部样式
         header = self.table.horizontalHeader()
@@ -707,124 +1142,8 @@ class HistoryDialog(QDialog):
         # 设置古朴纸书感表格样式
         self.update_table_style()
         
-    def update_table_style(self):
-        """更新表格样式，使用表格字号"""
-        # 获取表格字号
-        font_size = getattr(self, 'table_font_size', 16)
-        
-        self.table.setStyleSheet(f"""
-            QTableWidget {{
-                background: qlineargradient(x1:0, y1:0, x2:0, y2:1, 
-                                          stop:0 #fefcf8, stop:1 #f8f4f0);
-                alternate-background-color: qlineargradient(x1:0, y1:0, x2:0, y2:1, 
-                                                          stop:0 #faf8f5, stop:1 #f5f0e6);
-                color: #3c2e26;
-                border: 2px solid #d4c4a8;
-                border-radius: 12px;
-                gridline-color: #e8dcc0;
-                font-size: {font_size}px;
-                selection-background-color: #deb887;
-                font-family: "Microsoft YaHei", "SimHei", serif;
-            }}
-            QTableWidget::item {{
-                padding: 15px 12px;
-                border-bottom: 1px solid #e8dcc0;
-                color: #3c2e26;
-                background-color: transparent;
-                font-weight: 500;
-            }}
-            QTableWidget::item:alternate {{
-                background-color: transparent;
-            }}
-            QTableWidget::item:selected {{
-                background: qlineargradient(x1:0, y1:0, x2:0, y2:1, 
-                                          stop:0 #deb887, stop:1 #cd853f);
-                color: #2f1b14;
-                font-weight: 600;
-            }}
-            /* 优化表头样式 - 古朴纸书感 */
-            QHeaderView::section {{
-                background: qlineargradient(x1:0, y1:0, x2:0, y2:1,
-                                          stop:0 #f0ead6, stop:1 #e8dcc0);
-                border: 2px solid #d4c4a8;
-                border-radius: 6px;
-                padding: 12px 15px;
-                color: #5d4e37;
-                font-weight: 700;
-                font-size: {font_size + 2}px;
-                font-family: "Microsoft YaHei", "SimHei", serif;
-                text-align: center;
-                margin: 2px;
-            }}
-            QHeaderView::section:hover {{
-                background: qlineargradient(x1:0, y1:0, x2:0, y2:1,
-                                          stop:0 #f5f0e6, stop:1 #ede0d0);
-                border-color: #b8860b;
-            }}
-            /* 优化垂直表头（序号）样式 */
-            QHeaderView::section:vertical {{
-                background: qlineargradient(x1:0, y1:0, x2:1, y2:0,
-                                          stop:0 #f0ead6, stop:1 #e8dcc0);
-                border: 2px solid #d4c4a8;
-                border-radius: 6px;
-                padding: 8px 12px;
-                color: #5d4e37;
-                font-weight: 600;
-                font-size: {font_size}px;
-                font-family: "Microsoft YaHei", "SimHei", serif;
-                text-align: center;
-                margin: 1px;
-                min-width: 50px;
-            }}
-            QHeaderView::section:vertical:hover {{
-                background: qlineargradient(x1:0, y1:0, x2:1, y2:0,
-                                          stop:0 #f5f0e6, stop:1 #ede0d0);
-                border-color: #b8860b;
-            }}
-            QTableWidget::item:hover {{
-                background: qlineargradient(x1:0, y1:0, x2:0, y2:1, 
-                                          stop:0 #f0e68c, stop:1 #daa520);
-            }}
-            QScrollBar:vertical {{
-                border: 2px solid #daa520;
-                background: #f5f5dc;
-                width: 16px;
-                border-radius: 8px;
-            }}
-            QScrollBar::handle:vertical {{
-                background: qlineargradient(x1:0, y1:0, x2:0, y2:1, 
-                                          stop:0 #daa520, stop:1 #b8860b);
-                min-height: 20px;
-                border-radius: 6px;
-                border: 1px solid #b8860b;
-            }}
-            QScrollBar::handle:vertical:hover {{
-                background: qlineargradient(x1:0, y1:0, x2:0, y2:1, 
-                                          stop:0 #f0e68c, stop:1 #daa520);
-            }}
-            QScrollBar::add-line:vertical, QScrollBar::sub-line:vertical {{
-                height: 0px;
-            }}
-            QScrollBar::add-page:vertical, QScrollBar::sub-page:vertical {{
-                background: none;
-            }}
-            /* 表格右上角空白区域样式 */
-            QTableWidget QTableCornerButton::section {{
-                background: qlineargradient(x1:0, y1:0, x2:0, y2:1,
-                                          stop:0 #f0ead6, stop:1 #e8dcc0);
-                border: 2px solid #d4c4a8;
-                border-radius: 6px;
-            }}
-        """)
-
-        # 加载图表数据
-        self.load_diagrams()
-        self.init_table()
-        self.populate_table()
-        
         # 连接事件
-        self.table.cellClicked.connect(self.on_cell_clicked)
-        self.table.cellDoubleClicked.connect(self.on_cell_double_clicked)
+        self.table.doubleClicked.connect(lambda index: self.on_cell_double_clicked(index.row(), index.column()))
         self.table.horizontalHeader().sectionClicked.connect(self.on_header_clicked)
         
         # 初始化排序状态
@@ -832,6 +1151,18 @@ class HistoryDialog(QDialog):
         
         # 恢复列宽设置
         self.restore_column_widths()
+        
+    def update_table_style(self):
+        """更新表格样式，使用表格字号"""
+        # 获取表格字号
+        font_size = getattr(self, 'table_font_size', DEFAULT_TABLE_FONT_SIZE)
+        
+        self.setStyleSheet(history_style_sheet(font_size))
+
+        # 名称、专题列的字体和操作列按钮随表格字号变化
+        self.model.set_font_size(font_size)
+        self.action_delegate.font_size = font_size
+        self.table.viewport().update()
 
     def load_settings(self):
         """加载窗口设置"""
@@ -843,7 +1174,7 @@ class HistoryDialog(QDialog):
             self.resize(900, 700)
         
         # 恢复字号设置
-        font_size = self.settings.value("font_size", 18, type=int)
+        font_size = self.settings.value("font_size", DEFAULT_TABLE_FONT_SIZE, type=int)
         # 确保字号在18-30范围内
         if font_size < 18:
             font_size = 18
@@ -864,20 +1195,25 @@ class HistoryDialog(QDialog):
     
     def save_column_widths(self):
         """保存表格列宽"""
-        for i in range(self.table.columnCount()):
+        for i in range(self.model.columnCount()):
             width = self.table.columnWidth(i)
             self.settings.setValue(f"column_{i}_width", width)
     
     def restore_column_widths(self):
         """恢复表格列宽"""
-        for i in range(self.table.columnCount()):
+        for i in range(self.model.columnCount()):
             width = self.settings.value(f"column_{i}_width", type=int)
             if width:
                 self.table.setColumnWidth(i, width)
 
-    def load_diagrams(self, topic_id=None):
-        """从数据库加载图表"""
-        self.current_diagrams = self.db_manager.get_tree_diagrams(topic_id)
+    @property
+    def current_diagrams(self):
+        """已读取到表格中的图表（按当前顺序）"""
+        return self.model.diagrams
+
+    def load_diagrams(self, topic_id=None, search_text=""):
+        """从数据库加载图表（按页读取列表显示的元数据，正文在预览时按需读取）"""
+        self.model.load(topic_id, search_text)
 
     def filter_diagrams(self):
         """根据选择的专题筛选图表"""
@@ -891,172 +1227,8 @@ class HistoryDialog(QDialog):
             # 禁用删除主题按钮（当选择"全部"时）
             self.delete_topic_btn.setEnabled(False)
         
-        self.load_diagrams(topic_id)
-        self.update_table()
-
-    def update_table(self):
-        """更新表格视图"""
-        self.init_table()
-        self.populate_table()
-        
-        # 移除自动预览功能，只在用户主动操作时才预览
-    
-    def init_table(self):
-        """初始化表格"""
-        self.table.setRowCount(len(self.current_diagrams))
-        self.table.setColumnCount(4)
-        self.table.setHorizontalHeaderLabels(["名称", "专题", "创建时间", "操作"])
-        
-        # 设置列宽
-        self.table.setColumnWidth(0, 200)  # 名称列
-        self.table.setColumnWidth(1, 150)  # 专题列
-        self.table.setColumnWidth(2, 200)  # 创建时间列
-        self.table.setColumnWidth(3, 200)  # 操作列
-        
-        # 启用交替行颜色
-        self.table.setAlternatingRowColors(True)
-    
-    def populate_table(self):
-        """填充表格数据"""
-        for i, diagram in enumerate(self.current_diagrams):
-            # 名称
-            name_item = QTableWidgetItem(diagram['name'])
-            name_item.setTextAlignment(Qt.AlignCenter)
-            name_item.setData(Qt.UserRole, i)  # 存储行索引用于预览
-            # 设置古朴纸书感字体颜色和背景色
-            name_item.setForeground(QColor("#8B4513"))  # 深棕色，古朴感
-            # 根据表格字号设置字体大小
-            table_font_size = getattr(self, 'table_font_size', 20)
-            name_font = QFont()
-            name_font.setPointSize(table_font_size)
-            name_item.setFont(name_font)
-            # 确保背景为亮色
-            if i % 2 == 0:
-                name_item.setBackground(QColor("#f5f5dc"))
-            else:
-                name_item.setBackground(QColor("#faf0e6"))
-            self.table.setItem(i, 0, name_item)
-            
-            # 专题
-            topic_item = QTableWidgetItem(diagram['topic_name'])
-            topic_item.setTextAlignment(Qt.AlignCenter)
-            # 设置古朴纸书感字体颜色和背景色
-            topic_item.setForeground(QColor("#8B4513"))  # 深棕色，古朴感
-            # 根据表格字号设置字体大小
-            table_font_size = getattr(self, 'table_font_size', 20)
-            topic_font = QFont()
-            topic_font.setPointSize(table_font_size)
-            topic_item.setFont(topic_font)
-            # 确保背景为亮色
-            if i % 2 == 0:
-                topic_item.setBackground(QColor("#f5f5dc"))
-            else:
-                topic_item.setBackground(QColor("#faf0e6"))
-            self.table.setItem(i, 1, topic_item)
-            
-            # 创建时间 - 格式化为月-日-时-分/年
-            created_at = diagram['created_at']
-            try:
-                # 解析数据库中的时间格式
-                from datetime import datetime
-                dt = datetime.strptime(created_at, '%Y-%m-%d %H:%M:%S')
-                # 格式化为月-日 时:分/年
-                formatted_time = f"{dt.month:02d}-{dt.day:02d} {dt.hour:02d}:{dt.minute:02d}/{dt.year}"
-            except:
-                # 如果解析失败，使用原始格式
-                formatted_time = created_at
-            
-            created_item = QTableWidgetItem(formatted_time)
-            created_item.setTextAlignment(Qt.AlignCenter)
-            # 设置古朴纸书感字体颜色和背景色
-            created_item.setForeground(QColor("#8B4513"))  # 深棕色，古朴感
-            # 确保背景为亮色
-            if i % 2 == 0:
-                created_item.setBackground(QColor("#f5f5dc"))
-            else:
-                created_item.setBackground(QColor("#faf0e6"))
-            self.table.setItem(i, 2, created_item)
-            
-            # 操作列 - 现代化按钮设计
-            btn_widget = QWidget()
-            # 设置操作列容器为透明背景，避免多层框效果
-            btn_widget.setStyleSheet("background-color: transparent; border: none;")
-            btn_layout = QHBoxLayout(btn_widget)
-            btn_layout.setContentsMargins(8, 8, 8, 8)  # 减少边距
-            btn_layout.setSpacing(10)  # 减少按钮间距
-            btn_layout.setAlignment(Qt.AlignCenter)  # 水平居中对齐
-            
-            # 查看按钮 - 优化设计，避免多层框效果
-            view_btn = QPushButton("查看")
-            # 获取表格字号
-            button_font_size = getattr(self, 'table_font_size', 16)
-            # 根据字号调整按钮尺寸
-            scale_factor = button_font_size / 16.0
-            btn_width = int(75 * scale_factor)
-            btn_height = int(35 * scale_factor)
-            view_btn.setFixedSize(btn_width, btn_height)
-            # 使用渐变背景和阴影效果，提升视觉层次
-            view_btn.setStyleSheet(f"""
-                QPushButton {{
-                    background: qlineargradient(x1:0, y1:0, x2:0, y2:1,
-                                              stop:0 #f5deb3, stop:1 #deb887);
-                    color: #3c2e26;
-                    border: 1px solid #d2b48c;
-                    border-radius: 6px;
-                    font-size: {button_font_size}px;
-                    font-weight: 600;
-                    padding: 2px 6px;
-                }}
-                QPushButton:hover {{
-                    background: qlineargradient(x1:0, y1:0, x2:0, y2:1,
-                                              stop:0 #fff8dc, stop:1 #f0e68c);
-                    border-color: #daa520;
-                    color: #2f1b14;
-                }}
-                QPushButton:pressed {{
-                    background: qlineargradient(x1:0, y1:0, x2:0, y2:1,
-                                              stop:0 #deb887, stop:1 #cd853f);
-                    border-color: #b8860b;
-                }}
-            """)
-            view_btn.clicked.connect(lambda checked, row=i: self.preview_diagram(row))
-            btn_layout.addWidget(view_btn)
-            
-            # 删除按钮 - 优化设计，避免多层框效果
-            delete_btn = QPushButton("删除")
-            delete_btn.setFixedSize(btn_width, btn_height)  # 与查看按钮保持一致的尺寸
-            delete_btn.setStyleSheet(f"""
-                QPushButton {{
-                    background: qlineargradient(x1:0, y1:0, x2:0, y2:1,
-                                              stop:0 #f4a460, stop:1 #d2b48c);
-                    color: #2f1b14;
-                    border: 1px solid #cd853f;
-                    border-radius: 6px;
-                    font-size: {button_font_size}px;
-                    font-weight: 600;
-                    padding: 2px 6px;
-                }}
-                QPushButton:hover {{
-                    background: qlineargradient(x1:0, y1:0, x2:0, y2:1,
-                                              stop:0 #daa520, stop:1 #b8860b);
-                    border-color: #a0522d;
-                    color: #ffffff;
-                }}
-                QPushButton:pressed {{
-                    background: qlineargradient(x1:0, y1:0, x2:0, y2:1,
-                                              stop:0 #cd853f, stop:1 #a0522d);
-                    border-color: #8b4513;
-                }}
-            """)
-            delete_btn.clicked.connect(lambda checked, row=i: self.delete_diagram(row))
-            btn_layout.addWidget(delete_btn)
-            
-            self.table.setCellWidget(i, 3, btn_widget)
-    
-    def on_cell_clicked(self, row, column):
-        """处理单元格点击事件"""
-        # 移除单击预览功能，只通过查看按钮触发预览
-        pass
+        self.search_timer.stop()
+        self.load_diagrams(topic_id, self.search_edit.text())
     
     def on_header_clicked(self, logical_index):
         """处理表头点击事件"""
@@ -1077,19 +1249,17 @@ class HistoryDialog(QDialog):
             if i != logical_index:
                 self.sort_orders[i] = None
         
-        # 执行排序
+        # 由数据库排序并从第一页重新读取
         if logical_index == 1:  # 专题列
-            self.current_diagrams.sort(key=lambda x: x['topic_name'], reverse=reverse)
+            self.model.set_sort('topic_name', reverse)
         elif logical_index == 2:  # 创建时间列
-            self.current_diagrams.sort(key=lambda x: x['created_at'], reverse=reverse)
-            
-        self.update_table()
+            self.model.set_sort('created_at', reverse)
     
     def preview_diagram(self, index):
         """预览树枝图"""
         if 0 <= index < len(self.current_diagrams):
             diagram = self.current_diagrams[index]
-            dialog = PreviewDialog(self, diagram, self.current_diagrams)
+            dialog = PreviewDialog(self, diagram, self.current_diagrams, self.model)
             dialog.exec_()
     
     def on_cell_double_clicked(self, row, column):
@@ -1113,7 +1283,7 @@ class HistoryDialog(QDialog):
             try:
                 self.db_manager.update_diagram_name(diagram['id'], new_name.strip())
                 diagram['name'] = new_name.strip()
-                self.table.item(row, 0).setText(new_name.strip())
+                self.model.diagram_changed(row)
                 QMessageBox.information(self, "成功", "名称修改成功！")
             except Exception as e:
                 QMessageBox.warning(self, "错误", f"修改失败：{str(e)}")
@@ -1151,18 +1321,27 @@ class HistoryDialog(QDialog):
                             new_topic_data = updated_topics[-1]
                             self.db_manager.update_diagram_topic(diagram['id'], new_topic_data['id'])
                             diagram['topic_id'] = new_topic_data['id']
-                            self.table.item(row, 1).setText(new_topic_data['name'])
+                            diagram['topic_name'] = new_topic_data['name']
+                            self.on_diagram_topic_changed(row, diagram)
                             QMessageBox.information(self, "成功", "专题创建并修改成功！")
                 else:
                     # 选择现有专题
                     new_topic_id = topic_ids[topic_names.index(new_topic)]
                     self.db_manager.update_diagram_topic(diagram['id'], new_topic_id)
                     diagram['topic_id'] = new_topic_id
-                    self.table.item(row, 1).setText(new_topic)
+                    diagram['topic_name'] = new_topic
+                    self.on_diagram_topic_changed(row, diagram)
                     QMessageBox.information(self, "成功", "专题修改成功！")
             except Exception as e:
                 QMessageBox.warning(self, "错误", f"修改失败：{str(e)}")
     
+    def on_diagram_topic_changed(self, row, diagram):
+        """筛选某个专题时，移到其他专题的图表从列表中移除，否则只刷新这一行"""
+        if self.model.topic_id and diagram['topic_id'] != self.model.topic_id:
+            self.model.remove_diagram(row)
+        else:
+            self.model.diagram_changed(row)
+    
     def delete_diagram(self, row):
         """删除图表"""
         if row >= len(self.current_diagrams):
@@ -1208,8 +1387,7 @@ class HistoryDialog(QDialog):
         # 执行删除
         try:
             self.db_manager.delete_diagram(diagram['id'])
-            self.current_diagrams.remove(diagram)
-            self.update_table()
+            self.model.remove_diagram(row)
             QMessageBox.information(self, "成功", "删除成功！")
         except Exception as e:
             QMessageBox.warning(self, "错误", f"删除失败：{str(e)}")
@@ -1229,7 +1407,7 @@ class HistoryDialog(QDialog):
         current_topic_name = self.filter_combo.currentText()
         
         # 检查该主题下是否有树枝图
-        diagrams_in_topic = self.db_manager.get_tree_diagrams(current_topic_id)
+        diagrams_in_topic = self.db_manager.get_diagram_summaries(current_topic_id)
         
         if diagrams_in_topic:
             reply = QMessageBox.question(
@@ -1257,7 +1435,7 @@ class HistoryDialog(QDialog):
                 self.reload_filter_combo()
                 
                 # 重新加载图表数据
-                self.load_diagrams()
+                self.filter_diagrams()
                 
                 QMessageBox.information(self, "成功", f"主题 '{current_topic_name}' 删除成功！")
                 
@@ -1321,25 +1499,84 @@ class HistoryDialog(QDialog):
             # 更新表格样式
             if hasattr(self, 'table'):
                 self.update_table_style()
-                self.populate_table()
             
         except Exception as e:
             from PyQt5.QtWidgets import QMessageBox
             QMessageBox.warning(self, "错误", f"应用字号设置失败：{str(e)}")
     
 
-    def closeEvent(self, event):
-        """窗口关闭时保存设置"""
+    def done(self, result):
+        """关闭时保存设置，并写入排队的数据库修改（点关闭按钮、按Esc或调用reject()最终都经过done）"""
         self.save_settings()
-        super().closeEvent(event)
+        self.db_manager.flush()
+        super().done(result)
     
 
 
+class RenderWorker(QThread):
+    """后台渲染线程：在工作线程中生成义脉树枝图，结果通过信号送回界面线程
+
+    每次渲染带有一个序号；界面线程更新latest_generation后，
+    正在进行的旧渲染会在下一棵根树之前放弃。
+    """
+    rendered = pyqtSignal(int, str)
+    failed = pyqtSignal(int, str)
+
+    def __init__(self, renderer, cache=None, parent=None):
+        super().__init__(parent)
+        self.renderer = renderer
+        self.cache = cache
+        self.generation = 0
+        self.latest_generation = 0
+        self.text = ""
+
+    def is_superseded(self):
+        return self.generation != self.latest_generation
+
+    def run(self):
+        generation = self.generation
+        try:
+            if self.cache is not None:
+                output = self.cache.render(self.text, lambda text: self.renderer.render(text, self.is_superseded))
+            else:
+                output = self.renderer.render(self.text, self.is_superseded)
+        except RenderCancelled:
+            return
+        except Exception:
+            import traceback
+            self.failed.emit(generation, traceback.format_exc())
+            return
+        self.rendered.emit(generation, output)
+
+
 class YMTreeGenerator(QMainWindow):
     def __init__(self):
         super().__init__()
-        self.db_manager = DatabaseManager()
+        # 预览窗口的自动保存、重命名等修改先排队合并，定时或窗口关闭时一次写入
+        self.db_manager = DatabaseManager(write_behind=True)
         self.settings = QSettings("YMTree", "YMTreeGenerator")
+        # 增量渲染：再次生成时只重新解析有改动的根树；渲染在后台线程中进行
+        self.tree_renderer = IncrementalRenderer()
+        # 相同输入（忽略空行）的结果缓存，并持久化供下次启动使用；
+        # 缓存中含有大纲内容，与图表数据库放在同一目录，而不是启动时的当前目录
+        cache_dir = os.path.dirname(os.path.abspath(self.db_manager.db_path))
+        self.render_cache = RenderCache(db_path=os.path.join(cache_dir, "ymtree_cache.db"))
+        self.render_worker = RenderWorker(self.tree_renderer, self.render_cache, self)
+        self.render_worker.rendered.connect(self.on_tree_rendered)
+        self.render_worker.failed.connect(self.on_tree_render_failed)
+        self.render_worker.finished.connect(self.on_render_worker_finished)
+        self.render_generation = 0
+        self.render_pending = False
+        self.render_show_errors = False
+        # 窗口关闭后不再启动渲染（已排队的定时器和信号可能在等待线程结束之后才到达）
+        self.render_stopped = False
+        self.live_preview_enabled = False
+
+        # 实时预览：停止输入一段时间后再渲染
+        self.live_preview_timer = QTimer(self)
+        self.live_preview_timer.setSingleShot(True)
+        self.live_preview_timer.setInterval(400)
+        self.live_preview_timer.timeout.connect(self.start_render)
         
         # 初始化自定义颜色设置
         self.custom_colors = {
@@ -1398,6 +1635,14 @@ class YMTreeGenerator(QMainWindow):
         toolbar.addWidget(self.font_size_combo)
         toolbar.addSeparator()
         
+        # 实时预览开关
+        self.live_preview_btn = QPushButton("实时预览")
+        self.live_preview_btn.setCheckable(True)
+        self.live_preview_btn.setToolTip("输入时自动在后台生成义脉树枝图")
+        self.live_preview_btn.toggled.connect(self.toggle_live_preview)
+        toolbar.addWidget(self.live_preview_btn)
+        toolbar.addSeparator()
+        
         # 设置主界面字号
         self.main_font_size = 18
         self.current_font_size = 18
@@ -1460,6 +1705,7 @@ class YMTreeGenerator(QMainWindow):
         self.input_text.setFont(QFont("Consolas", 12))  # 使用等宽字体
         self.input_text.setLineWrapMode(QTextEdit.NoWrap)  # 禁用自动换行
         self.input_text.setPlaceholderText("在此输入树状结构内容...")
+        self.input_text.textChanged.connect(self.on_input_changed)
         left_layout.addWidget(self.input_text)
         
         # 中间按钮区
@@ -1784,6 +2030,11 @@ class YMTreeGenerator(QMainWindow):
             if theme_index >= 0:
                 self.theme_combo.setCurrentIndex(theme_index)
         
+        # 同步实时预览开关
+        if hasattr(self, 'live_preview_btn'):
+            live_preview = self.settings.value("live_preview", False, type=bool)
+            self.live_preview_btn.setChecked(live_preview)
+        
         # 同步主界面字号下拉框
         if hasattr(self, 'font_size_combo'):
             font_index = self.font_size_combo.findData(self.main_font_size)
@@ -1814,6 +2065,9 @@ class YMTreeGenerator(QMainWindow):
             for key, value in self.custom_colors.items():
                 self.settings.setValue(f"color_{key}", value)
         
+        # 保存实时预览开关
+        self.settings.setValue("live_preview", getattr(self, 'live_preview_enabled', False))
+        
         # 保存窗口大小和位置
         self.settings.setValue("geometry", self.saveGeometry())
         
@@ -2061,7 +2315,7 @@ class YMTreeGenerator(QMainWindow):
             color: {colors['text_color']};
         }}
         
-        QTableWidget {{
+        QTableView {{
             background-color: {colors['table_background']};
             alternate-background-color: {colors['table_alternate']};
             border: 2px solid {colors['border_color']};
@@ -2133,6 +2387,14 @@ class YMTreeGenerator(QMainWindow):
     def closeEvent(self, event):
         """窗口关闭时保存设置"""
         self.save_settings()
+        # 先阻止再启动渲染，再放弃正在进行的后台渲染并等待线程结束
+        self.render_stopped = True
+        self.render_pending = False
+        self.live_preview_timer.stop()
+        self.request_render()
+        self.render_worker.wait()
+        self.render_cache.close()
+        self.db_manager.close()
         event.accept()
     def clear_all(self):
         self.input_text.clear()
@@ -2152,256 +2414,74 @@ class YMTreeGenerator(QMainWindow):
             self.preview_text.clear()
             return
 
-        try:
-            lines = [line for line in input_text.split('\n') if line.strip()]
-            if not lines:
-                self.preview_text.setPlainText("")
-                return
+        # 立即在后台生成，出错时在预览区显示详细信息
+        self.live_preview_timer.stop()
+        self.render_show_errors = True
+        self.request_render()
+        self.start_render()
 
-            root_nodes = self._parse_to_tree(lines)
+    def request_render(self):
+        """记录新的渲染请求，正在进行的旧渲染随即作废"""
+        self.render_generation += 1
+        self.render_worker.latest_generation = self.render_generation
 
-            # 按照C#版本的逻辑，遍历所有根节点并打印
-            final_output = []
-            for root in root_nodes:
-                tree_output = root.print_tree()
-                if tree_output:
-                    final_output.append(tree_output)
+    def start_render(self):
+        """在后台线程中渲染当前输入；若线程忙，等它结束后再渲染最新内容"""
+        if self.render_stopped:
+            return
+        if self.render_worker.isRunning():
+            self.render_pending = True
+            return
 
-            # 直接显示结果
-            self.preview_text.setPlainText("\n\n".join(final_output))
-            self.statusBar().showMessage("义脉树枝图已生成！", 5000)
+        input_text = self.input_text.toPlainText()
+        if not input_text.strip():
+            self.preview_text.clear()
+            return
 
-        except Exception as e:
-            import traceback
-            self.preview_text.setText(f"生成失败：\n{traceback.format_exc()}")
-            self.statusBar().showMessage("生成过程中出现错误", 5000)
-
-    def _get_display_width(self, s):
-        """计算字符串的显示宽度，考虑中英文字符的实际显示宽度"""
-        width = 0
-        for char in s:
-            # 中文字符、全角符号等宽字符
-            if ('\u4e00' <= char <= '\u9fff' or  # 中日韩统一表意文字
-                '\u3000' <= char <= '\u303f' or  # 中日韩符号和标点
-                '\uff00' <= char <= '\uffef' or  # 全角ASCII、全角标点
-                '\u2e80' <= char <= '\u2eff' or  # 中日韩部首补充
-                '\u2f00' <= char <= '\u2fdf' or  # 康熙部首
-                '\u3040' <= char <= '\u309f' or  # 平假名
-                '\u30a0' <= char <= '\u30ff'):   # 片假名
-                width += 2
-            else:
-                # 英文字符、数字、半角符号
-                width += 1
-        return width
+        self.render_pending = False
+        self.render_worker.generation = self.render_generation
+        self.render_worker.text = input_text
+        self.render_worker.start()
+
+    def on_render_worker_finished(self):
+        if self.render_pending:
+            self.start_render()
+
+    def on_tree_rendered(self, generation, output):
+        # 输入已再次变化的结果直接丢弃
+        if generation != self.render_generation:
+            return
+        self.preview_text.setPlainText(output)
+        self.render_show_errors = False
+        self.statusBar().showMessage(f"义脉树枝图已生成！（{self.render_cache.stats_text()}）", 5000)
+
+    def on_tree_render_failed(self, generation, error_text):
+        if generation != self.render_generation:
+            return
+        if self.render_show_errors:
+            self.preview_text.setText(f"生成失败：\n{error_text}")
+            self.render_show_errors = False
+        # 实时预览时输入常处于未完成状态，保留上次结果，只在状态栏提示
+        self.statusBar().showMessage("生成过程中出现错误", 5000)
+
+    def on_input_changed(self):
+        if not self.live_preview_enabled:
+            return
+        self.request_render()
+        self.live_preview_timer.start()
+
+    def toggle_live_preview(self, checked):
+        """切换实时预览"""
+        self.live_preview_enabled = checked
+        if checked:
+            self.request_render()
+            self.live_preview_timer.start()
+        else:
+            self.live_preview_timer.stop()
 
     def _parse_to_tree(self, lines):
-        """完全按照C#版本的解析算法"""
-        class TextTreeNode:
-            def __init__(self, text, parent=None):
-                self.text = self._convert_to_fullwidth(text)
-                self.parent = parent
-                self.children = []
-                self.start_row = 0
-                self.start_column = 0
-                self.depth = 0 if parent is None else parent.depth + 1
-                
-                if parent is not None:
-                    parent.add_child(self)
-            
-            def _convert_to_fullwidth(self, text):
-                """将半角字符转换为全角字符，确保对齐"""
-                conversion_map = {
-                    '0': '０', '1': '１', '2': '２', '3': '３', '4': '４', '5': '５', '6': '６', '7': '７', '8': '８', '9': '９',
-                    'A': 'Ａ', 'B': 'Ｂ', 'C': 'Ｃ', 'D': 'Ｄ', 'E': 'Ｅ', 'F': 'Ｆ', 'G': 'Ｇ', 'H': 'Ｈ', 'I': 'Ｉ', 'J': 'Ｊ',
-                    'K': 'Ｋ', 'L': 'Ｌ', 'M': 'Ｍ', 'N': 'Ｎ', 'O': 'Ｏ', 'P': 'Ｐ', 'Q': 'Ｑ', 'R': 'Ｒ', 'S': 'Ｓ', 'T': 'Ｔ',
-                    'U': 'Ｕ', 'V': 'Ｖ', 'W': 'Ｗ', 'X': 'Ｘ', 'Y': 'Ｙ', 'Z': 'Ｚ',
-                    'a': 'ａ', 'b': 'ｂ', 'c': 'ｃ', 'd': 'ｄ', 'e': 'ｅ', 'f': 'ｆ', 'g': 'ｇ', 'h': 'ｈ', 'i': 'ｉ', 'j': 'ｊ',
-                    'k': 'ｋ', 'l': 'ｌ', 'm': 'ｍ', 'n': 'ｎ', 'o': 'ｏ', 'p': 'ｐ', 'q': 'ｑ', 'r': 'ｒ', 's': 'ｓ', 't': 'ｔ',
-                    'u': 'ｕ', 'v': 'ｖ', 'w': 'ｗ', 'x': 'ｘ', 'y': 'ｙ', 'z': 'ｚ',
-                    '`': '｀', '~': '～', '!': '！', '@': '＠', '#': '＃', '$': '＄', '%': '％', '^': '＾', '&': '＆', '*': '＊',
-                    '(': '（', ')': '）', '-': '－', '_': '＿', '+': '＋', '=': '＝', '[': '［', '{': '｛', ']': '］', '}': '｝',
-                    '|': '｜', '\\': '＼', ';': '；', ':': '：', "'": '＇', '"': '＂', ',': '，', '<': '＜', '.': '．',
-                    '>': '＞', '/': '／', '?': '？'
-                }
-                
-                result = []
-                for char in text:
-                    result.append(conversion_map.get(char, char))
-                return ''.join(result)
-            
-            def add_child(self, child):
-                self.children.append(child)
-            
-            @property
-            def width(self):
-                if not self.children:
-                    return 1
-                child_sum = sum(child.width for child in self.children)
-                return 3 if child_sum == 2 else child_sum
-            
-            @property
-            def is_one_line(self):
-                return len(self.children) == 0 or (len(self.children) == 1 and self.children[0].is_one_line)
-            
-            @property
-            def min_child_start_row(self):
-                if not self.children:
-                    return self.start_row
-                return self.children[0].min_child_start_row
-            
-            @property
-            def max_child_start_row(self):
-                if not self.children:
-                    return self.start_row
-                return self.children[-1].max_child_start_row
-            
-            def compute_start_row(self, row_ref):
-                """计算起始行位置"""
-                if self.is_one_line:
-                    if self.parent is None:
-                        raise Exception(f"解析到[{self.text}]时失败")
-                    if len(self.parent.children) == 2 and self == self.parent.children[1]:
-                        row_ref[0] += 1
-                        self.start_row = row_ref[0]
-                        row_ref[0] += 1
-                    else:
-                        self.start_row = row_ref[0]
-                        row_ref[0] += 1
-                    
-                    if self.children:
-                        node = self.children[0]
-                        while node is not None:
-                            node.start_row = self.start_row
-                            node = node.children[0] if node.children else None
-                else:
-                    for child in self.children:
-                        child.compute_start_row(row_ref)
-                    self.start_row = (self.children[0].start_row + self.children[-1].start_row) // 2
-            
-            def compute_start_column(self):
-                """计算起始列位置"""
-                if self.parent is None:
-                    self.start_column = 0
-                else:
-                    self.start_column = self.parent.start_column + len(self.parent.text) + 1
-                
-                for child in self.children:
-                    child.compute_start_column()
-            
-            def compute(self):
-                """计算位置"""
-                row_ref = [0]
-                self.compute_start_row(row_ref)
-                self.compute_start_column()
-            
-            def print_tree(self):
-                """按照C#版本的打印算法"""
-                # 创建二维字符串列表
-                max_row = self.max_child_start_row + 1
-                grid = [[] for _ in range(max_row)]
-                
-                # 使用队列遍历所有节点
-                from collections import deque
-                queue = deque([self])
-                
-                while queue:
-                    node = queue.popleft()
-                    
-                    for i in range(node.min_child_start_row, node.max_child_start_row + 1):
-                        if not node.children:
-                            # 叶子节点
-                            grid[i].append(node.text)
-                        elif i < node.children[0].start_row:
-                            # 在第一个子节点之前
-                            grid[i].append('　' * (len(node.text) + 1))
-                        elif i <= node.children[-1].start_row:
-                            # 在子节点范围内
-                            line_str = ""
-                            for j, child in enumerate(node.children):
-                                if i == child.start_row:
-                                    if j == 0 and node.start_row == child.start_row and len(node.children) == 1:
-                                        line_str = node.text + "─"
-                                    elif j == 0:
-                                        line_str = '　' * len(node.text) + "┌"
-                                    elif j == len(node.children) - 1:
-                                        line_str = '　' * len(node.text) + "└"
-                                    elif node.start_row == child.start_row:
-                                        line_str = node.text + "┼"
-                                    else:
-                                        line_str = '　' * len(node.text) + "├"
-                                    break
-                            
-                            if not line_str:
-                                if node.start_row == i:
-                                    line_str = node.text + "┤"
-                                else:
-                                    line_str = '　' * len(node.text) + "│"
-                            
-                            grid[i].append(line_str)
-                        else:
-                            # 在最后一个子节点之后
-                            grid[i].append('　' * (len(node.text) + 1))
-                    
-                    # 将子节点加入队列
-                    for child in node.children:
-                        queue.append(child)
-                
-                # 构建最终字符串
-                result_lines = []
-                for row in grid:
-                    result_lines.append(''.join(row))
-                
-                return '\n'.join(result_lines).rstrip()
-        
-        # 解析逻辑 - 完全按照C#版本
-        root_nodes = []
-        node_stack = []
-        
-        for i, line in enumerate(lines):
-            if not line.strip():
-                continue
-            
-            # 计算层级深度
-            j = 0
-            while j < len(line) and line[j] in "#-_$@*%":
-                j += 1
-            
-            if j >= len(line):
-                continue
-            
-            if j == 0:
-                # 根节点
-                root = TextTreeNode(line)
-                root_nodes.append(root)
-                node_stack.clear()
-                node_stack.append(root)
-            else:
-                # 调整栈
-                while node_stack and j <= node_stack[-1].depth:
-                    node_stack.pop()
-                
-                if not node_stack:
-                    raise Exception(f"解析第{i+1}行[{line}]时失败")
-                
-                last_node = node_stack[-1]
-                
-                # 判断是子节点还是同级节点
-                if j == last_node.depth + 1:
-                    # 子节点
-                    new_node = TextTreeNode(line[j:], last_node)
-                    node_stack.append(new_node)
-                elif j == last_node.depth:
-                    # 同级节点
-                    new_node = TextTreeNode(line[j:], last_node.parent)
-                    node_stack.append(new_node)
-                else:
-                    raise Exception(f"解析第{i+1}行[{line}]时失败")
-        
-        # 计算所有根节点的位置
-        for root in root_nodes:
-            root.compute()
-        
-        return root_nodes
+        """完全按照C#版本的解析算法（实现见tree_engine模块）"""
+        return parse_lines(lines)
 
     # 旧的绘制方法已被C#版本的算法替代，保留以防兼容性问题
     def _draw_tree_to_grid(self, root):
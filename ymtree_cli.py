@@ -0,0 +1,356 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+义脉树枝图命令行工具 - 无界面批量生成，不加载PyQt5
+
+用法：
+    python ymtree_cli.py render 大纲.txt                # 输出到标准输出
+    python ymtree_cli.py render "大纲/*.txt" --sibling  # 写到同目录的 *.tree.txt
+    python ymtree_cli.py render a.txt b.txt -o 输出目录
+    python ymtree_cli.py batch 大纲目录 -o 输出目录 -j 8   # 多进程批量渲染并写出清单
+    python ymtree_cli.py import 大纲目录 -j 8 --checkpoint 归档  # 批量导入数据库，中断后可继续
+    python ymtree_cli.py export 图表库.zip --topic 专题 --since 2024-01-01  # 导出数据库中的图表
+    type 大纲.txt | python ymtree_cli.py render -        # 从标准输入读取
+
+也可以通过主程序调用：python ymtree.py render ...
+"""
+
+import argparse
+import glob
+import os
+import sys
+import time
+from datetime import date, timedelta
+
+from batch_render import STATUS_IO_ERROR, STATUS_OK, STATUS_PARSE_ERROR, iter_batch, write_manifest
+from bulk_import import BATCH_SIZE, import_outlines, iter_outline_files
+from database import DatabaseManager
+from diagram_export import FORMAT_JSONL, FORMAT_MARKDOWN, FORMAT_ZIP, FORMATS, export_diagrams
+from tree_engine import TreeParseError, iter_file_lines, render_stream, render_to_file
+
+# 退出码
+EXIT_OK = 0
+EXIT_PARSE_ERROR = 1     # 至少一个文件解析失败
+EXIT_USAGE_ERROR = 2     # 参数错误、文件不存在或无法读写
+
+OUTPUT_SUFFIX = ".tree.txt"
+
+
+def _glob_files(pattern):
+    # 通配符不匹配本工具生成的结果文件，避免重复运行时把结果当作输入
+    return sorted(path for path in glob.glob(pattern, recursive=True)
+                  if os.path.isfile(path) and not path.endswith(OUTPUT_SUFFIX))
+
+
+def expand_inputs(patterns):
+    """展开文件名、目录和通配符，返回(文件列表, 未匹配的模式列表)；'-'表示标准输入
+
+    文件列表中每项为(文件, 相对目录)：目录输入中的文件为其相对该目录的子目录，
+    输出到-o目录时保留这层结构；其他输入为空字符串。同一文件只出现一次。
+    """
+    files = []
+    missing = []
+    seen = set()
+
+    def add(path, subdir=""):
+        key = os.path.normcase(os.path.abspath(path))
+        if path == '-' or key not in seen:
+            seen.add(key)
+            files.append((path, subdir))
+
+    for pattern in patterns:
+        if pattern == '-':
+            add(pattern)
+        elif os.path.isdir(pattern):
+            # 目录：递归匹配其中所有.txt文件
+            for path in _glob_files(os.path.join(pattern, "**", "*.txt")):
+                subdir = os.path.relpath(os.path.dirname(path), pattern)
+                add(path, "" if subdir == os.curdir else subdir)
+        elif glob.has_magic(pattern):
+            matched = _glob_files(pattern)
+            if matched:
+                for path in matched:
+                    add(path)
+            else:
+                missing.append(pattern)
+        elif os.path.isfile(pattern):
+            add(pattern)
+        else:
+            missing.append(pattern)
+    return files, missing
+
+
+def output_path_for(path, output_dir=None, subdir=""):
+    """计算输入文件对应的输出文件路径；subdir为输出目录下保留的相对目录"""
+    stem = os.path.splitext(os.path.basename(path))[0]
+    directory = os.path.join(output_dir, subdir) if output_dir is not None else os.path.dirname(path)
+    return os.path.join(directory, stem + OUTPUT_SUFFIX)
+
+
+def report_conflicts(pairs):
+    """检查是否有多个输入写到同一个输出文件（如不同目录下的同名文件用通配符输出到同一目录），
+    有冲突时输出到标准错误并返回True"""
+    inputs_by_output = {}
+    for input_path, output_path in pairs:
+        key = os.path.normcase(os.path.abspath(output_path))
+        inputs_by_output.setdefault(key, (output_path, []))[1].append(input_path)
+    conflicts = [(output_path, inputs) for output_path, inputs in inputs_by_output.values() if len(inputs) > 1]
+    for output_path, inputs in conflicts:
+        print(f"{output_path}: 多个输入会写到同一个输出文件：{'、'.join(inputs)}", file=sys.stderr)
+    return bool(conflicts)
+
+
+def iter_input_lines(path, encoding):
+    if path == '-':
+        return (line.rstrip('\n') for line in sys.stdin)
+    return iter_file_lines(path, encoding)
+
+
+def render_to_stdout(path, encoding='utf-8'):
+    """渲染单个输入到标准输出"""
+    count = render_stream(iter_input_lines(path, encoding), sys.stdout)
+    if count:
+        sys.stdout.write("\n")
+    return count
+
+
+def cmd_render(args):
+    files, missing = expand_inputs(args.inputs or ['-'])
+    exit_code = EXIT_OK
+
+    for pattern in missing:
+        print(f"{pattern}: 找不到文件", file=sys.stderr)
+        exit_code = EXIT_USAGE_ERROR
+
+    outputs = []
+    for path, subdir in files:
+        if args.output_dir:
+            outputs.append(output_path_for("stdin" if path == '-' else path, args.output_dir, subdir))
+        elif args.sibling and path != '-':
+            outputs.append(output_path_for(path))
+        else:
+            outputs.append(None)
+    if report_conflicts((path, output_path) for (path, _), output_path in zip(files, outputs)
+                        if output_path is not None):
+        return EXIT_USAGE_ERROR
+
+    for index, ((path, _), output_path) in enumerate(zip(files, outputs)):
+        label = "<stdin>" if path == '-' else path
+        try:
+            if output_path is None:
+                if index:
+                    sys.stdout.write("\n")
+                render_to_stdout(path, args.encoding)
+            else:
+                os.makedirs(os.path.dirname(output_path) or os.curdir, exist_ok=True)
+                render_to_file(iter_input_lines(path, args.encoding), output_path, args.encoding)
+        except TreeParseError as e:
+            print(f"{label}: {e}", file=sys.stderr)
+            exit_code = max(exit_code, EXIT_PARSE_ERROR)
+            continue
+        except (OSError, UnicodeDecodeError) as e:
+            print(f"{label}: 读写失败：{e}", file=sys.stderr)
+            exit_code = EXIT_USAGE_ERROR
+            continue
+
+        if output_path is not None and not args.quiet:
+            print(f"{label} -> {output_path}", file=sys.stderr)
+
+    return exit_code
+
+
+def cmd_batch(args):
+    files, missing = expand_inputs(args.inputs)
+    files = [(path, subdir) for path, subdir in files if path != '-']
+    exit_code = EXIT_OK
+
+    for pattern in missing:
+        print(f"{pattern}: 找不到文件", file=sys.stderr)
+        exit_code = EXIT_USAGE_ERROR
+
+    jobs = [(path, output_path_for(path, args.output_dir, subdir), args.encoding) for path, subdir in files]
+    # 工作进程各自写临时文件再改名，多个任务写同一输出会互相覆盖，必须在分发前发现
+    if report_conflicts((path, output_path) for path, output_path, _ in jobs):
+        return EXIT_USAGE_ERROR
+    if args.output_dir:
+        os.makedirs(args.output_dir, exist_ok=True)
+    for directory in {os.path.dirname(output_path) for _, output_path, _ in jobs}:
+        os.makedirs(directory or os.curdir, exist_ok=True)
+
+    manifest_path = args.manifest or os.path.join(args.output_dir or ".", "manifest.jsonl")
+    start = time.perf_counter()
+    with open(manifest_path, 'w', encoding='utf-8') as manifest:
+        results = iter_batch(jobs, args.workers, args.chunksize, ordered=not args.unordered)
+        counts = write_manifest(results, manifest)
+    elapsed = time.perf_counter() - start
+
+    if not args.quiet:
+        print(f"完成 {len(jobs)} 个文件，成功 {counts[STATUS_OK]}，解析失败 {counts[STATUS_PARSE_ERROR]}，"
+              f"读写失败 {counts[STATUS_IO_ERROR]}，耗时 {elapsed:.2f}s，清单：{manifest_path}", file=sys.stderr)
+
+    if counts[STATUS_IO_ERROR]:
+        exit_code = EXIT_USAGE_ERROR
+    elif counts[STATUS_PARSE_ERROR]:
+        exit_code = max(exit_code, EXIT_PARSE_ERROR)
+    return exit_code
+
+
+def cmd_import(args):
+    if not os.path.isdir(args.directory):
+        print(f"{args.directory}: 不是目录", file=sys.stderr)
+        return EXIT_USAGE_ERROR
+
+    def report(stats):
+        print(f"已导入 {stats['imported']} 行，{stats['rows_per_second']:.0f} 行/秒", file=sys.stderr)
+
+    db = DatabaseManager(args.db)
+    try:
+        if args.restart and args.checkpoint:
+            db.clear_import_checkpoint(args.checkpoint)
+        stats = import_outlines(db, iter_outline_files(args.directory, args.encoding), args.workers,
+                                args.batch_size, args.checkpoint, not args.no_defer_indexes,
+                                None if args.quiet else report)
+    except (OSError, UnicodeDecodeError) as e:
+        print(f"读取失败：{e}", file=sys.stderr)
+        return EXIT_USAGE_ERROR
+    finally:
+        db.close()
+
+    for failure in stats['failed']:
+        print(f"{failure['name']}: {failure['error']}", file=sys.stderr)
+    if not args.quiet:
+        print(f"完成：导入 {stats['imported']} 行，断点前跳过 {stats['skipped']} 条，"
+              f"解析失败 {len(stats['failed'])} 条，耗时 {stats['seconds']:.2f}s"
+              f"（含重建索引），{stats['rows_per_second']:.0f} 行/秒", file=sys.stderr)
+    return EXIT_PARSE_ERROR if stats['failed'] else EXIT_OK
+
+
+def parse_date(text):
+    try:
+        return date.fromisoformat(text)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"日期格式应为YYYY-MM-DD：{text}")
+
+
+def parse_workers(text):
+    """-j的取值：非负整数，0表示在当前进程中渲染"""
+    try:
+        workers = int(text)
+    except ValueError:
+        workers = -1
+    if workers < 0:
+        raise argparse.ArgumentTypeError(f"进程数应为非负整数：{text}")
+    return workers
+
+
+def export_format_for(output):
+    """未指定格式时按输出路径推断：.jsonl或'-'为JSON Lines，.zip为压缩包，其他视为Markdown目录"""
+    if output == '-' or output.endswith(".jsonl"):
+        return FORMAT_JSONL
+    if output.endswith(".zip"):
+        return FORMAT_ZIP
+    return FORMAT_MARKDOWN
+
+
+def cmd_export(args):
+    fmt = args.format or export_format_for(args.output)
+    if args.output == '-' and fmt != FORMAT_JSONL:
+        print("只有jsonl格式可以输出到标准输出", file=sys.stderr)
+        return EXIT_USAGE_ERROR
+    if not os.path.exists(args.db):
+        print(f"{args.db}: 找不到数据库", file=sys.stderr)
+        return EXIT_USAGE_ERROR
+
+    db = DatabaseManager(args.db)
+    try:
+        topic_id = None
+        if args.topic is not None:
+            topic_id = next((topic['id'] for topic in db.get_topics() if topic['name'] == args.topic), None)
+            if topic_id is None:
+                print(f"{args.topic}: 找不到专题", file=sys.stderr)
+                return EXIT_USAGE_ERROR
+        # 结束日期包含当天
+        created_from = args.since.isoformat() if args.since else None
+        created_before = (args.until + timedelta(days=1)).isoformat() if args.until else None
+
+        start = time.perf_counter()
+        count = export_diagrams(db, args.output, fmt, topic_id, created_from, created_before)
+        elapsed = time.perf_counter() - start
+    except OSError as e:
+        print(f"{args.output}: 写入失败：{e}", file=sys.stderr)
+        return EXIT_USAGE_ERROR
+    finally:
+        db.close()
+
+    if not args.quiet:
+        print(f"导出 {count} 个图表到 {args.output}（{fmt}），耗时 {elapsed:.2f}s", file=sys.stderr)
+    return EXIT_OK
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="ymtree", description="义脉树枝图命令行工具（无需图形界面）")
+    subparsers = parser.add_subparsers(dest="command")
+    subparsers.required = True
+
+    render_parser = subparsers.add_parser("render", help="将大纲文本生成义脉树枝图")
+    render_parser.add_argument("inputs", nargs="*", help="输入文件或通配符，'-'或省略表示标准输入")
+    target = render_parser.add_mutually_exclusive_group()
+    target.add_argument("-o", "--output-dir",
+                        help=f"将结果写入该目录，文件名为<原名>{OUTPUT_SUFFIX}；目录输入保留其子目录结构")
+    target.add_argument("-s", "--sibling", action="store_true",
+                        help=f"将结果写到输入文件旁边的<原名>{OUTPUT_SUFFIX}")
+    render_parser.add_argument("--encoding", default="utf-8", help="输入输出文件编码（默认utf-8）")
+    render_parser.add_argument("-q", "--quiet", action="store_true", help="不输出写入文件的提示")
+    render_parser.set_defaults(func=cmd_render)
+
+    batch_parser = subparsers.add_parser("batch", help="用多进程批量渲染大量大纲文件，并写出清单")
+    batch_parser.add_argument("inputs", nargs="+", help="输入文件、目录（递归匹配*.txt）或通配符")
+    target = batch_parser.add_mutually_exclusive_group(required=True)
+    target.add_argument("-o", "--output-dir",
+                        help=f"将结果写入该目录，文件名为<原名>{OUTPUT_SUFFIX}；目录输入保留其子目录结构")
+    target.add_argument("-s", "--sibling", action="store_true",
+                        help=f"将结果写到输入文件旁边的<原名>{OUTPUT_SUFFIX}")
+    batch_parser.add_argument("-j", "--workers", type=parse_workers, default=None,
+                              help="工作进程数（默认CPU核数，0表示在当前进程中渲染）")
+    batch_parser.add_argument("--chunksize", type=int, default=16, help="每次分发给工作进程的文件数（默认16）")
+    batch_parser.add_argument("--unordered", action="store_true", help="按完成顺序而不是输入顺序写清单")
+    batch_parser.add_argument("--manifest", help="清单文件路径（JSON Lines，默认在输出目录或当前目录下的manifest.jsonl）")
+    batch_parser.add_argument("--encoding", default="utf-8", help="输入输出文件编码（默认utf-8）")
+    batch_parser.add_argument("-q", "--quiet", action="store_true", help="不输出汇总信息")
+    batch_parser.set_defaults(func=cmd_batch)
+
+    import_parser = subparsers.add_parser("import", help="把目录中的大纲生成树枝图后批量导入数据库")
+    import_parser.add_argument("directory", help="大纲目录：递归读取*.txt，第一级子目录名作为专题")
+    import_parser.add_argument("--db", default="ymtree.db", help="数据库文件（默认ymtree.db）")
+    import_parser.add_argument("-j", "--workers", type=parse_workers, default=None,
+                               help="渲染进程数（默认CPU核数，0表示在当前进程中渲染）")
+    import_parser.add_argument("--batch-size", type=int, default=BATCH_SIZE,
+                               help=f"每个事务插入的行数（默认{BATCH_SIZE}）")
+    import_parser.add_argument("--checkpoint", help="断点名：中断后用相同的断点名再次运行会从断点继续")
+    import_parser.add_argument("--restart", action="store_true", help="忽略已有断点，从头导入")
+    import_parser.add_argument("--no-defer-indexes", action="store_true",
+                               help="逐行维护索引，不在导入结束后重建（数据库很大而导入很少时使用）")
+    import_parser.add_argument("--encoding", default="utf-8", help="大纲文件编码（默认utf-8）")
+    import_parser.add_argument("-q", "--quiet", action="store_true", help="不输出进度和汇总信息")
+    import_parser.set_defaults(func=cmd_import)
+
+    export_parser = subparsers.add_parser("export", help="把数据库中的图表导出为JSON Lines、Markdown文件或ZIP")
+    export_parser.add_argument("output", help="输出：*.jsonl文件或'-'（标准输出）、*.zip文件，或Markdown目录")
+    export_parser.add_argument("-f", "--format", choices=FORMATS, help="导出格式（默认按输出路径推断）")
+    export_parser.add_argument("--db", default="ymtree.db", help="数据库文件（默认ymtree.db）")
+    export_parser.add_argument("--topic", help="只导出该专题的图表")
+    export_parser.add_argument("--since", type=parse_date, help="只导出该日期（含）之后创建的图表，格式YYYY-MM-DD")
+    export_parser.add_argument("--until", type=parse_date, help="只导出该日期（含）之前创建的图表，格式YYYY-MM-DD")
+    export_parser.add_argument("-q", "--quiet", action="store_true", help="不输出汇总信息")
+    export_parser.set_defaults(func=cmd_export)
+
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())